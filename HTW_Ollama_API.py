@@ -1,7 +1,15 @@
 import requests
+import hashlib
 import json
+import os
 import re
+import statistics
+import threading
+import time
 import ftfy
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 class OllamaApi:
 
@@ -9,12 +17,61 @@ class OllamaApi:
     PORT = 11435
 
     TIMEOUT = 120
-    STREAM_RESPONSE = False # Only for debug purposes. !! Result will be null !!
+    STREAM_RESPONSE = False # Default for chat()/completion(), streaming adds time_first_token, itl_* and jitter
 
     THINKING = False
 
+    KEEP_ALIVE = "5m"       # How long the server keeps a model loaded after a request
+
+    # Pool of Ollama servers, e.g. ["https://host-a:11435", "http://host-b:11434"].
+    # None = only HOST:PORT. Requests go to the least-loaded healthy endpoint that has the model.
+    ENDPOINTS = None
+    EJECT_AFTER_FAILURES = 2    # Consecutive failures (connection errors, 5xx) until an endpoint is ejected
+    EJECT_SECONDS = 60          # Ejected endpoints are probed again after this time
+    MODEL_LIST_TTL = 300        # Seconds the /api/tags model list of an endpoint is trusted
+
+    _endpoint_state = {}
+    _endpoint_lock = threading.Lock()
+
+    # Connection pool (keep-alive). Shared by all threads, see session()/close()
+    USE_SESSION = True      # False = every request opens a new connection (old behaviour)
+    POOL_SIZE = 10          # Max. open connections to the server
+    MAX_RETRIES = 2         # Retries on connection errors and 502/503/504
+    RETRY_BACKOFF = 0.5     # Backoff factor between retries in seconds
+
+    _session = None
+    _session_lock = threading.Lock()
+
+    # Persistent response cache (opt-in). Entries are keyed on model, messages/prompt,
+    # merged options, schema, think and stream flag, see cache_key()
+    CACHE_ENABLED = False
+    CACHE_DIR = ".ollama_cache"
+    CACHE_MAX_ENTRIES = 10000   # Least recently used entries are removed beyond this
+    CACHE_REFRESH = False       # True = ignore stored entries, but store the fresh answers
+
+    cache_hits = 0
+    cache_misses = 0
+
+    _cache_index = None         # OrderedDict key -> path, oldest first
+    _cache_lock = threading.Lock()
+
     FALSE_RETURN = {"result": None, "time": 0, "token": 0, "info": {}}
 
+    # Text ftfy returns unchanged: printable ASCII without "&" (HTML entities), tab, newline and German umlauts.
+    # Everything else (other non-ASCII, control characters, "\r") still goes through ftfy.fix_text
+    CLEAN_TEXT = re.compile(r"[\t\n\x20-\x25\x27-\x7eäöüÄÖÜß]*")
+    # Leading <think> block and ```json fence, the fence search continues behind the think block
+    THINK_BLOCK = re.compile(r"\s*<think>.*?</think>", re.DOTALL)
+    JSON_FENCE = re.compile(r"```json(.*?)```", re.DOTALL)
+
+    # Client-side phases measured in api_request (seconds), returned next to the server timings:
+    # queue = before sending (cache lookup, endpoint selection), request = send until headers
+    # (incl. connection setup, cannot be separated with requests), transfer = reading the body/stream,
+    # parse = JSON decoding, fix_text = ftfy, regex = think/markdown extraction,
+    # total = whole call, gap = total minus the server's total_duration
+    CLIENT_TIMINGS = ["client_queue", "client_request", "client_transfer", "client_parse",
+                      "client_fix_text", "client_regex", "client_total", "client_gap"]
+
     DEFAULT_OPTIONS = {
         "num_ctx": 2048,        # Default: 2048
         "repeat_last_n": 64,    # Default: 64, 0 = disabled, -1 = num_ctx
@@ -28,11 +85,265 @@ class OllamaApi:
         "min_p": 0.0            # Default: 0.0
     }
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @classmethod
+    def session(cls):
+        # Lazily create one pooled session that all threads share.
+        # requests.Session itself is not locked, but the urllib3 pool behind it is thread-safe
+        # as long as the session is not reconfigured while requests are running.
+        if cls._session is None:
+            with cls._session_lock:
+                if cls._session is None:
+                    retry = Retry(
+                        total=cls.MAX_RETRIES,
+                        connect=cls.MAX_RETRIES,
+                        read=0,
+                        status=cls.MAX_RETRIES,
+                        backoff_factor=cls.RETRY_BACKOFF,
+                        status_forcelist=(502, 503, 504),
+                        allowed_methods=frozenset({"GET", "POST"}),
+                        raise_on_status=False
+                    )
+                    adapter = HTTPAdapter(pool_connections=cls.POOL_SIZE, pool_maxsize=cls.POOL_SIZE, max_retries=retry)
+                    session = requests.Session()
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    cls._session = session
+        return cls._session
+
+    @classmethod
+    def configure_pool(cls, pool_size=None, max_retries=None, retry_backoff=None):
+        # Changes the pool settings. The current session is closed and rebuilt on the next request.
+        if pool_size is not None:
+            cls.POOL_SIZE = pool_size
+        if max_retries is not None:
+            cls.MAX_RETRIES = max_retries
+        if retry_backoff is not None:
+            cls.RETRY_BACKOFF = retry_backoff
+        cls.close()
+
+    @classmethod
+    def close(cls):
+        with cls._session_lock:
+            if cls._session is not None:
+                cls._session.close()
+                cls._session = None
+
+    @classmethod
+    def _http(cls):
+        return cls.session() if cls.USE_SESSION else requests
+
+    @staticmethod
+    def cache_key(payload):
+        relevant = {name: payload.get(name) for name in ("model", "messages", "prompt", "options", "format", "think", "stream")}
+        raw = json.dumps(relevant, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def _load_cache_index(cls):
+        # Must be called with _cache_lock held. Oldest file modification time = least recently used
+        if cls._cache_index is None:
+            entries = []
+            if os.path.isdir(cls.CACHE_DIR):
+                for folder in os.scandir(cls.CACHE_DIR):
+                    if folder.is_dir():
+                        for file in os.scandir(folder.path):
+                            if file.name.endswith(".json"):
+                                entries.append((file.stat().st_mtime, file.name[:-5], file.path))
+            entries.sort()
+            cls._cache_index = OrderedDict((key, path) for _, key, path in entries)
+        return cls._cache_index
+
+    @classmethod
+    def cache_get(cls, key):
+        with cls._cache_lock:
+            index = cls._load_cache_index()
+            path = index.get(key)
+            if path is None:
+                cls.cache_misses += 1
+                return None
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                os.utime(path)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"WARN: Dropping unreadable cache entry {path}: {e}")
+                index.pop(key, None)
+                cls.cache_misses += 1
+                return None
+            index.move_to_end(key)
+            cls.cache_hits += 1
+
+        # Original server timings are kept, the flag marks the row as not freshly measured
+        return {**entry["response"], "cached": True, "cached_at": entry.get("stored")}
+
+    @classmethod
+    def cache_put(cls, key, response):
+        folder = os.path.join(cls.CACHE_DIR, key[:2])
+        path = os.path.join(folder, f"{key}.json")
+        # Client timings belong to the original call, not to later cache hits
+        response = {name: value for name, value in response.items() if name not in cls.CLIENT_TIMINGS}
+        entry = {"stored": time.strftime("%Y-%m-%d %H:%M:%S"), "response": response}
+        with cls._cache_lock:
+            index = cls._load_cache_index()
+            try:
+                os.makedirs(folder, exist_ok=True)
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(entry, f, ensure_ascii=False)
+            except (OSError, TypeError) as e:
+                print(f"WARN: Failed to write cache entry: {e}")
+                return
+            index[key] = path
+            index.move_to_end(key)
+            while len(index) > cls.CACHE_MAX_ENTRIES:
+                _, old_path = index.popitem(last=False)
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+
+    @classmethod
+    def cache_stats(cls):
+        with cls._cache_lock:
+            entries = len(cls._load_cache_index())
+        return {"hits": cls.cache_hits, "misses": cls.cache_misses, "entries": entries}
+
+    @classmethod
+    def clear_cache(cls):
+        with cls._cache_lock:
+            for path in cls._load_cache_index().values():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            cls._cache_index = OrderedDict()
+            cls.cache_hits = 0
+            cls.cache_misses = 0
+
+    @classmethod
+    def endpoints(cls):
+        return list(cls.ENDPOINTS) if cls.ENDPOINTS else [f"{cls.HOST}:{cls.PORT}"]
+
+    @classmethod
+    def _state(cls, endpoint):
+        # Must be called with _endpoint_lock held
+        if endpoint not in cls._endpoint_state:
+            cls._endpoint_state[endpoint] = {
+                "in_flight": 0,
+                "failures": 0,
+                "ejected_until": 0.0,
+                "models": None,
+                "models_checked": 0.0,
+                "requests": 0
+            }
+        return cls._endpoint_state[endpoint]
+
+    @classmethod
+    def _refresh_models(cls, endpoint):
+        # Reads the model list of one endpoint. Returns False if the endpoint did not answer
+        model_list = cls.models(endpoint=endpoint)
+        with cls._endpoint_lock:
+            state = cls._state(endpoint)
+            if model_list is False:
+                return False
+            state["models"] = {m.get("name") or m.get("model") for m in model_list}
+            state["models_checked"] = time.monotonic()
+        return True
+
+    @classmethod
+    def health_check(cls):
+        # Probes every endpoint, re-admits the ones that answer and ejects the others
+        status = {}
+        for endpoint in cls.endpoints():
+            ok = cls._refresh_models(endpoint)
+            with cls._endpoint_lock:
+                state = cls._state(endpoint)
+                if ok:
+                    state["failures"] = 0
+                    state["ejected_until"] = 0.0
+                else:
+                    state["failures"] = max(state["failures"], cls.EJECT_AFTER_FAILURES)
+                    state["ejected_until"] = time.monotonic() + cls.EJECT_SECONDS
+            status[endpoint] = ok
+        return status
+
+    @classmethod
+    def select_endpoint(cls, model=None):
+        endpoints = cls.endpoints()
+        if len(endpoints) == 1:
+            with cls._endpoint_lock:
+                state = cls._state(endpoints[0])
+                state["in_flight"] += 1
+                state["requests"] += 1
+            return endpoints[0]
+
+        now = time.monotonic()
+        with cls._endpoint_lock:
+            states = {endpoint: cls._state(endpoint) for endpoint in endpoints}
+            due_probe = [e for e, st in states.items() if st["ejected_until"] and st["ejected_until"] <= now]
+            stale = [e for e, st in states.items()
+                     if not st["ejected_until"] and now - st["models_checked"] > cls.MODEL_LIST_TTL]
+
+        # Ejected endpoints are re-admitted only after a successful probe
+        for endpoint in due_probe:
+            ok = cls._refresh_models(endpoint)
+            with cls._endpoint_lock:
+                state = cls._state(endpoint)
+                if ok:
+                    print(f"INFO: Endpoint {endpoint} is healthy again")
+                    state["ejected_until"] = 0.0
+                    # One more failure ejects it again
+                    state["failures"] = cls.EJECT_AFTER_FAILURES - 1
+                else:
+                    state["ejected_until"] = time.monotonic() + cls.EJECT_SECONDS
+        for endpoint in stale:
+            cls._refresh_models(endpoint)
+
+        with cls._endpoint_lock:
+            healthy = [e for e in endpoints if not states[e]["ejected_until"]]
+            if not healthy:
+                # Everything is down: try the endpoint that was ejected first
+                healthy = [min(endpoints, key=lambda e: states[e]["ejected_until"])]
+            with_model = [e for e in healthy if model is None or states[e]["models"] is None or model in states[e]["models"]]
+            candidates = with_model or healthy
+            endpoint = min(candidates, key=lambda e: (states[e]["in_flight"], states[e]["requests"]))
+            states[endpoint]["in_flight"] += 1
+            states[endpoint]["requests"] += 1
+        return endpoint
+
+    @classmethod
+    def release_endpoint(cls, endpoint, ok:bool):
+        with cls._endpoint_lock:
+            state = cls._state(endpoint)
+            state["in_flight"] = max(0, state["in_flight"] - 1)
+            if ok:
+                state["failures"] = 0
+                return
+            state["failures"] += 1
+            if len(cls.endpoints()) > 1 and state["failures"] >= cls.EJECT_AFTER_FAILURES and not state["ejected_until"]:
+                print(f"WARN: Ejecting endpoint {endpoint} for {cls.EJECT_SECONDS}s after {state['failures']} failures")
+                state["ejected_until"] = time.monotonic() + cls.EJECT_SECONDS
+
+    @classmethod
+    def endpoint_stats(cls):
+        with cls._endpoint_lock:
+            return {endpoint: {name: state[name] for name in ("in_flight", "failures", "requests")} | {"ejected": bool(state["ejected_until"])}
+                    for endpoint, state in cls._endpoint_state.items()}
+
     @staticmethod
     def fix_invalid_escapes(s):
         if not isinstance(s, str):
             return s
 
+        # Fast path: nothing ftfy could repair
+        if OllamaApi.CLEAN_TEXT.fullmatch(s):
+            return s
+
         try:
             s_re = ftfy.fix_text(s)
             if s_re != s:
@@ -43,12 +354,16 @@ class OllamaApi:
         return s
 
     @classmethod
-    def models(cls):
-        url = f"{cls.HOST}:{cls.PORT}/api/tags"
+    def models(cls, endpoint=None):
+        url = f"{endpoint or cls.endpoints()[0]}/api/tags"
         headers = {
             "accept": "application/json",
         }
-        response = requests.get(url, headers=headers)
+        try:
+            response = cls._http().get(url, headers=headers, timeout=cls.TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            print(f"Request failed: {e}")
+            return False
         if response.status_code != 200:
             print(f"Request failed with status {response.status_code}: {response.text}")
             return False
@@ -62,8 +377,67 @@ class OllamaApi:
                 return False
 
     @classmethod
-    def pull_model(cls, name:str, tag:str):
-        url = f"{cls.HOST}:{cls.PORT}/api/pull"
+    def running_models(cls, endpoint=None):
+        # Models currently loaded on the server (/api/ps), incl. size_vram in bytes
+        url = f"{endpoint or cls.endpoints()[0]}/api/ps"
+        headers = {
+            "accept": "application/json",
+        }
+        try:
+            response = cls._http().get(url, headers=headers, timeout=cls.TIMEOUT)
+            if response.status_code != 200:
+                print(f"Request failed with status {response.status_code}: {response.text}")
+                return False
+            return response.json().get("models", [])
+        except Exception as e:
+            print(f"Failed to list running models: {e}")
+            return False
+
+    @classmethod
+    def load_model(cls, model:str, keep_alive=None, endpoint=None, options=None):
+        # A generate request without prompt only loads the model into memory.
+        # Pass the options of the following chats: a different num_ctx makes Ollama load the model again.
+        # Returns the client wall time and the server's load_duration in seconds, or None on failure
+        return cls._set_model_residency(model, cls.KEEP_ALIVE if keep_alive is None else keep_alive, endpoint, options)
+
+    @classmethod
+    def unload_model(cls, model:str, endpoint=None):
+        return cls._set_model_residency(model, 0, endpoint)
+
+    @classmethod
+    def _set_model_residency(cls, model, keep_alive, endpoint=None, options=None):
+        url = f"{endpoint or cls.endpoints()[0]}/api/generate"
+        headers = {
+            "Content-Type": "application/json",
+            "accept": "application/json"
+        }
+        payload = {
+            "model": model,
+            "keep_alive": keep_alive,
+            "stream": False
+        }
+        if options is not None:
+            payload["options"] = {**cls.DEFAULT_OPTIONS, **options}
+        try:
+            start = time.perf_counter()
+            response = cls._http().post(url, headers=headers, json=payload, timeout=cls.TIMEOUT)
+            wall_time = time.perf_counter() - start
+            if response.status_code != 200:
+                print(f"Request failed with status {response.status_code}: {response.text}")
+                return None
+            parsed_json = response.json()
+            return {
+                "time": float(wall_time),
+                "time_load": parsed_json.get('load_duration', 0) / 1_000_000_000,
+                "done_reason": parsed_json.get('done_reason')
+            }
+        except Exception as e:
+            print(f"Failed to change residency of model {model}: {e}")
+            return None
+
+    @classmethod
+    def pull_model(cls, name:str, tag:str, endpoint=None):
+        url = f"{endpoint or cls.endpoints()[0]}/api/pull"
         headers = {
             "Content-Type": "application/json",
             "accept": "application/json"
@@ -72,7 +446,7 @@ class OllamaApi:
             "model": f"{name}:{tag}"
         }
         try:
-            response = requests.post(url, headers=headers, json=payload, stream=True, timeout=cls.TIMEOUT)
+            response = cls._http().post(url, headers=headers, json=payload, stream=True, timeout=cls.TIMEOUT)
             if response.status_code != 200:
                 print(f"Pull request failed with status {response.status_code}: {response.text}")
                 return False
@@ -94,7 +468,7 @@ class OllamaApi:
             return False
 
     @classmethod
-    def completion(cls, prompt:str, model="phi4:latest", schema=None, options=None):
+    def completion(cls, prompt:str, model="phi4:latest", schema=None, options=None, stream=None, cache=None):
         payload = {
             "model": model,
             "prompt" : prompt,
@@ -106,10 +480,10 @@ class OllamaApi:
         if schema is not None:
             payload["format"] = schema
 
-        return cls.api_request(payload, force_json=False if schema is None else True)
+        return cls.api_request(payload, force_json=False if schema is None else True, stream=stream, cache=cache)
 
     @classmethod
-    def chat(cls, chat, model="phi4:latest", schema=None, options=None):
+    def chat(cls, chat, model="phi4:latest", schema=None, options=None, stream=None, cache=None):
         payload = {
             "model": model,
             "messages": chat,
@@ -121,16 +495,22 @@ class OllamaApi:
         if schema is not None:
             payload["format"] = schema
 
-        return cls.api_request(payload, force_json=False if schema is None else True)
+        return cls.api_request(payload, force_json=False if schema is None else True, stream=stream, cache=cache)
 
     @classmethod
-    def api_request(cls, payload, force_json:bool):
+    def api_request(cls, payload, force_json:bool, stream=None, cache=None):
+        call_start = time.perf_counter()
+        if stream is None:
+            stream = cls.STREAM_RESPONSE
+        if cache is None:
+            cache = cls.CACHE_ENABLED
+
         if "messages" in payload:
             # Chat Request
-            url = f"{cls.HOST}:{cls.PORT}/api/chat"
+            path = "/api/chat"
         else:
             # Completion Request
-            url = f"{cls.HOST}:{cls.PORT}/api/generate"
+            path = "/api/generate"
 
         headers = {
             "Content-Type": "application/json",
@@ -140,62 +520,87 @@ class OllamaApi:
         payload = {
             **payload,
             "think": cls.THINKING,
-            "stream": cls.STREAM_RESPONSE,
-            "keep_alive": "5m"
+            "stream": stream,
+            "keep_alive": cls.KEEP_ALIVE
         }
 
-        try:
-            response = requests.post(url, headers=headers, json=payload, stream=cls.STREAM_RESPONSE, timeout=cls.TIMEOUT)
-
-            if cls.STREAM_RESPONSE:
-                for line in response.iter_lines(decode_unicode=True):
-                    try:
-                        chunk = json.loads(line)
+        key = None
+        if cache:
+            key = cls.cache_key(payload)
+            if not cls.CACHE_REFRESH:
+                cached = cls.cache_get(key)
+                if cached is not None:
+                    return cached
 
-                        if 'message' in chunk and 'content' in chunk['message']:
-                            content = chunk['message']['content']
-                            print(content, end='', flush=True)
+        endpoint = cls.select_endpoint(payload.get("model"))
+        endpoint_ok = False
 
-                        if 'done' in chunk and chunk['done']:
-                            break  # Exit the loop if done is True
-                    except json.JSONDecodeError as e:
-                        print(f"ERROR: Failed to decode JSON during streaming: {e}")
-                return {**cls.FALSE_RETURN, "info": {"error": 'Streaming mode does not retreive a value'}}
+        try:
+            request_start = time.perf_counter()
+            # Always stream on the HTTP level, so the body transfer can be timed separately from the headers
+            response = cls._http().post(f"{endpoint}{path}", headers=headers, json=payload, stream=True, timeout=cls.TIMEOUT)
+            headers_received = time.perf_counter()
+            # Model errors (4xx) are not the node's fault, only server errors count as failure
+            endpoint_ok = response.status_code < 500
+
+            if stream:
+                text_response = cls.stream_text_response(response, request_start, json_check=force_json)
+                result = cls.extract_json(text_response) if force_json else text_response
+                # The stream is read and parsed chunk by chunk, parse time is part of the loop
+                transfer = time.perf_counter() - headers_received - text_response.get("client_parse", 0.0)
             else:
-                return cls.secure_json_response(response) if force_json else cls.secure_text_response(response)
+                response.content
+                transfer = time.perf_counter() - headers_received
+                result = cls.secure_json_response(response) if force_json else cls.secure_text_response(response)
+
+            result["endpoint"] = endpoint
+
+            client_total = time.perf_counter() - call_start
+            result.update({
+                "client_queue": request_start - call_start,
+                "client_request": headers_received - request_start,
+                "client_transfer": max(0.0, transfer),
+                "client_parse": result.get("client_parse", 0.0),
+                "client_fix_text": result.get("client_fix_text", 0.0),
+                "client_regex": result.get("client_regex", 0.0),
+                "client_total": client_total,
+                "client_gap": client_total - result.get("time", 0)
+            })
+
+            # Only complete answers are cached, errors are retried on the next run
+            if key is not None and result.get("result") is not None:
+                cls.cache_put(key, result)
+            return result
 
         except requests.exceptions.Timeout:
             print(f"ERROR: The request took to long. Adjust the timeout ({cls.TIMEOUT}) as needed")
-            return {**cls.FALSE_RETURN, "info": {"error": f"Request timeout ({cls.TIMEOUT}) reached"}}
+            return {**cls.FALSE_RETURN, "endpoint": endpoint, "info": {"error": f"Request timeout ({cls.TIMEOUT}) reached"}}
         except Exception as e:
             print(f"ERROR: Request exception: {e}")
-            return {**cls.FALSE_RETURN, "info": {"error": f"Request exception: {e}"}}
+            return {**cls.FALSE_RETURN, "endpoint": endpoint, "info": {"error": f"Request exception: {e}"}}
+
+        finally:
+            cls.release_endpoint(endpoint, endpoint_ok)
 
 
     @classmethod
     def secure_json_response(cls, response):
+        return cls.extract_json(cls.secure_text_response(response))
 
-        text_response = cls.secure_text_response(response)
+    @classmethod
+    def extract_json(cls, text_response):
 
         if text_response.get("result") is None:
             return text_response
 
-        message = str(text_response.get("result"))
-
-        markdown_response = False
-        thinking_block = False
+        regex_start = time.perf_counter()
+        message, thinking_block, markdown_response = cls.strip_json_wrappers(str(text_response.get("result")))
+        regex_time = time.perf_counter() - regex_start
 
-        if message.strip().startswith("<think>"):
+        if thinking_block:
             print('WARN: Model returned <think> reasoning block before JSON')
-            message = re.sub(r"^\s*<think>.*?</think>\s*", "", message, flags=re.DOTALL).strip()
-            thinking_block = True
-
-        match = re.search(r'```json(.*?)```', message, re.DOTALL)
-        if match:
-            # Remove everything except the content in "```json" to "```"
+        if markdown_response:
             print('WARN: Model returned markdown instead of only JSON')
-            message = match.group(1).strip()
-            markdown_response = True
 
         try:
             # Try to parse To json
@@ -207,6 +612,7 @@ class OllamaApi:
                 "thinking": thinking_block,
                 "markdown": markdown_response
             }
+            text_response["client_regex"] = regex_time
             return text_response
 
         except json.JSONDecodeError as e:
@@ -217,11 +623,31 @@ class OllamaApi:
             print(f"ERROR: Failed to parse JSON: {e}")
             return {**cls.FALSE_RETURN, "info": {"error": str(e)}}
 
+    @classmethod
+    def strip_json_wrappers(cls, message):
+        # Removes a leading <think> block and keeps only the content of a ```json fence.
+        # Single scan over the message: the fence search starts where the think block ends,
+        # plain JSON (the normal case with a schema) fails both patterns on the first characters.
+        think = cls.THINK_BLOCK.match(message)
+        start = think.end() if think is not None else 0
+        # An unclosed think block is still reported, like before
+        thinking_block = think is not None or message[:64].lstrip().startswith("<think>")
+
+        fence = cls.JSON_FENCE.search(message, start)
+        if fence is not None:
+            # Remove everything except the content in "```json" to "```"
+            return fence.group(1).strip(), thinking_block, True
+        if think is not None:
+            return message[start:].strip(), thinking_block, False
+        return message, thinking_block, False
+
     @classmethod
     def secure_text_response(cls, response):
 
         try:
+            parse_start = time.perf_counter()
             parsed_json = response.json()
+            parse_time = time.perf_counter() - parse_start
 
             if response.status_code != 200:
                 err_msg = parsed_json.get('error', 'Unknown error')
@@ -235,33 +661,9 @@ class OllamaApi:
             # LLM Chat return as string
             message = parsed_json.get('message').get('content') if "message" in parsed_json else parsed_json.get('response')
 
-            # --- ZEITEN (in Sekunden umrechnen) ---
-            # 1. Gesamte Wartezeit
-            total_duration = parsed_json.get('total_duration', 0) / 1_000_000_000
-
-            # 2. Ladezeit
-            load_duration = parsed_json.get('load_duration', 0) / 1_000_000_000
-
-            # 3. Lese-Zeit
-            prompt_eval_duration = parsed_json.get('prompt_eval_duration', 0) / 1_000_000_000
-
-            # 4. Schreib-Zeit
-            eval_duration = parsed_json.get('eval_duration', 0) / 1_000_000_000
-
-            # --- TOKENS ---
-            token_count_output = parsed_json.get('eval_count', 0)
-            token_count_input = parsed_json.get('prompt_eval_count', 0)
-
-            return {
-                "result": cls.fix_invalid_escapes(message),
-                "time": float(total_duration),          # User Wartezeit
-                "time_load": float(load_duration),      # Hardware Ladezeit
-                "time_read": float(prompt_eval_duration),# Kontext Verarbeitungszeit
-                "time_write": float(eval_duration),     # Generierungszeit
-                "token": int(token_count_output),
-                "input_token": int(token_count_input),
-                "info": {}
-            }
+            result = cls.build_result(parsed_json, message)
+            result["client_parse"] = parse_time
+            return result
         # Bis hierhin
         except json.JSONDecodeError as e:
             print(f"ERROR: Failed to decode JSON: {e}")
@@ -271,3 +673,193 @@ class OllamaApi:
             print(f"ERROR: Failed to parse JSON: {e}")
             return {**cls.FALSE_RETURN, "info": {"error": str(e)}}
 
+    @classmethod
+    def stream_text_response(cls, response, request_start, json_check=False):
+        # Reads the NDJSON stream, joins the answer and measures the latency the user would perceive.
+        # Ollama sends one chunk per generated token, so the chunk gaps are the inter-token latencies.
+        try:
+            if response.status_code != 200:
+                try:
+                    err_msg = response.json().get('error', 'Unknown error')
+                except (json.JSONDecodeError, ValueError):
+                    err_msg = response.text or 'Unknown error'
+                print(f"ERROR: Request failed with status {response.status_code}: {err_msg}")
+                return {**cls.FALSE_RETURN, "info": {"error": err_msg}}
+
+            parts = []
+            gaps = []
+            first_token = None
+            last_token = None
+            final_chunk = None
+            parse_time = 0.0
+            checker = JsonStreamChecker() if json_check else None
+
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                parse_start = time.perf_counter()
+                chunk = json.loads(line)
+                parse_time += time.perf_counter() - parse_start
+
+                if 'error' in chunk:
+                    print(f"ERROR: Server aborted the stream: {chunk['error']}")
+                    return {**cls.FALSE_RETURN, "info": {"error": chunk['error']}}
+
+                piece = chunk.get('message', {}).get('content') if "message" in chunk else chunk.get('response')
+                if piece:
+                    now = time.perf_counter()
+                    if first_token is None:
+                        first_token = now - request_start
+                    else:
+                        gaps.append(now - last_token)
+                    last_token = now
+                    parts.append(piece)
+
+                    if checker is not None and not checker.feed(piece):
+                        # Closing the connection makes the server stop generating
+                        print(f"ERROR: Malformed JSON rejected after {len(parts)} tokens: {checker.error}")
+                        return {**cls.FALSE_RETURN, "info": {"error": f"Malformed JSON stream: {checker.error}", "rejected_after_tokens": len(parts)}}
+
+                if chunk.get('done'):
+                    final_chunk = chunk
+                    break
+
+            if final_chunk is None:
+                print("ERROR: Stream ended but Model didn't complete the answer")
+                return {**cls.FALSE_RETURN, "info": {"error": 'Incomplete answer'}}
+
+            result = cls.build_result(final_chunk, "".join(parts))
+            result.update({
+                "time_first_token": float(first_token or 0),
+                "itl_p50": cls.percentile(gaps, 50),
+                "itl_p95": cls.percentile(gaps, 95),
+                "itl_p99": cls.percentile(gaps, 99),
+                "jitter": float(statistics.pstdev(gaps)) if len(gaps) > 1 else 0.0,
+                "client_parse": parse_time
+            })
+            return result
+
+        except json.JSONDecodeError as e:
+            print(f"ERROR: Failed to decode JSON during streaming: {e}")
+            return {**cls.FALSE_RETURN, "info": {"error": 'JSON decode error on the ollama server\'s stream'}}
+
+        except Exception as e:
+            print(f"ERROR: Failed to read stream: {e}")
+            return {**cls.FALSE_RETURN, "info": {"error": str(e)}}
+
+        finally:
+            response.close()
+
+    @classmethod
+    def build_result(cls, parsed_json, message):
+        # --- ZEITEN (in Sekunden umrechnen) ---
+        # 1. Gesamte Wartezeit
+        total_duration = parsed_json.get('total_duration', 0) / 1_000_000_000
+
+        # 2. Ladezeit
+        load_duration = parsed_json.get('load_duration', 0) / 1_000_000_000
+
+        # 3. Lese-Zeit
+        prompt_eval_duration = parsed_json.get('prompt_eval_duration', 0) / 1_000_000_000
+
+        # 4. Schreib-Zeit
+        eval_duration = parsed_json.get('eval_duration', 0) / 1_000_000_000
+
+        # --- TOKENS ---
+        token_count_output = parsed_json.get('eval_count', 0)
+        token_count_input = parsed_json.get('prompt_eval_count', 0)
+
+        fix_start = time.perf_counter()
+        message = cls.fix_invalid_escapes(message)
+        fix_time = time.perf_counter() - fix_start
+
+        return {
+            "result": message,
+            "time": float(total_duration),          # User Wartezeit
+            "time_load": float(load_duration),      # Hardware Ladezeit
+            "time_read": float(prompt_eval_duration),# Kontext Verarbeitungszeit
+            "time_write": float(eval_duration),     # Generierungszeit
+            "token": int(token_count_output),
+            "input_token": int(token_count_input),
+            "info": {},
+            "client_fix_text": fix_time
+        }
+
+    @staticmethod
+    def percentile(values, q):
+        # Linear interpolation between the closest ranks, 0.0 for empty input
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        pos = (len(ordered) - 1) * q / 100
+        lower = int(pos)
+        upper = min(lower + 1, len(ordered) - 1)
+        return float(ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower))
+
+
+class JsonStreamChecker:
+    # Checks structured output while it streams in and rejects it as soon as json.loads/extract_json
+    # would fail anyway: mismatched brackets, raw control characters in strings, characters that cannot
+    # appear in JSON, or content after the top-level object/array.
+    # Answers that do not start with { or [ (<think> block, markdown fence, prose before a fence)
+    # are left to extract_json.
+    LITERAL_CHARS = frozenset("0123456789+-.eEtrufalsn")
+    CLOSING = {"}": "{", "]": "["}
+
+    def __init__(self):
+        self.active = True
+        self.started = False
+        self.finished = False
+        self.in_string = False
+        self.escape = False
+        self.stack = []
+        self.error = None
+
+    def feed(self, piece):
+        # Returns False as soon as the answer can no longer become valid JSON
+        if not self.active or self.error is not None:
+            return self.error is None
+
+        for char in piece:
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                elif char < " ":
+                    return self.fail("control character in string")
+                continue
+
+            if char in " \t\n\r":
+                continue
+
+            if not self.started:
+                if char not in "{[":
+                    # <think> block, markdown fence or prose before a fence: extract_json decides
+                    self.active = False
+                    return True
+                self.started = True
+                self.stack.append(char)
+                continue
+
+            if self.finished:
+                return self.fail("content after the JSON value")
+
+            if char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.stack.append(char)
+            elif char in self.CLOSING:
+                if not self.stack or self.stack.pop() != self.CLOSING[char]:
+                    return self.fail(f"unexpected {char!r}")
+                self.finished = not self.stack
+            elif char not in ",:" and char not in self.LITERAL_CHARS:
+                return self.fail(f"unexpected character {char!r}")
+
+        return True
+
+    def fail(self, reason):
+        self.error = reason
+        return False
@@ -0,0 +1,314 @@
+import csv
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+
+from resume_index import is_valid_answer
+
+# --- KONFIGURATION ---
+INPUT_FILE = "evaluation_completed.csv"
+REPORT_FILE = "statistics_report.json"      # Alle Kennzahlen maschinenlesbar
+SUMMARY_FILE = "statistics_summary.csv"     # Kennzahlen mit Konfidenzintervall je Modell und (Modell, Kategorie)
+PAIRS_FILE = "statistics_pairs.csv"         # Paarweise Modellvergleiche auf denselben Fragen
+
+# Kennzahl je Spalte: Scores als Mittelwert, Zeiten und Geschwindigkeit als Median (robust gegen Ausreißer)
+METRICS = {
+    "score": "mean",
+    "time_total": "median",
+    "tps_write": "median",
+}
+
+N_RESAMPLES = 10000         # Bootstrap-Stichproben (und Vorzeichen-Permutationen für die Tests)
+CHUNK_SIZE = 1000           # Stichproben pro Arbeitspaket; Ergebnis hängt nur von SEED ab, nicht von MAX_WORKERS
+CONFIDENCE = 0.95
+ALPHA = 0.05                # Signifikanzniveau nach Holm-Korrektur
+SEED = 42
+MAX_WORKERS = None          # Prozesse, None = Anzahl CPU-Kerne
+
+# Zeit-Kennzahlen aus dem Parquet-Speicher (result_store.py, benötigt pyarrow) statt aus INPUT_FILE.
+# Gelesen werden nur die Spalten aus METRICS und die Partitionen aus STORE_RUNS/STORE_MODELS (None = alle).
+# Fehlerzeilen zählen nicht, bei mehreren gültigen Messungen gilt die neueste.
+# score gibt es nur in der bewerteten CSV und kommt immer aus INPUT_FILE.
+USE_RESULT_STORE = False
+STORE_RUNS = None
+STORE_MODELS = None
+
+
+def to_float(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+def load_values(filename=INPUT_FILE):
+    """Liest die Kennzahl-Spalten als {Spalte: {(id, model): Wert}} sowie die Kategorie je ID."""
+    values = {metric: {} for metric in METRICS}
+    categories = {}
+    duplicates = 0
+
+    with open(filename, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f, delimiter=';'):
+            key = (row.get("id", "").strip(), row.get("model", "").strip())
+            categories[key[0]] = row.get("category", "")
+            for metric in METRICS:
+                value = to_float(row.get(metric))
+                if value is None:
+                    continue
+                if key in values[metric]:
+                    duplicates += 1
+                    continue
+                values[metric][key] = value
+
+    if duplicates:
+        print(f"[WARNUNG] {duplicates} doppelte (id, model)-Werte ignoriert (erster Wert zählt).")
+    return values, categories
+
+
+def load_store_values(values):
+    """
+    Ersetzt die Kennzahlen, die der Parquet-Speicher hat, für alle Modelle im Speicher durch dessen Werte.
+    Zeilen mit Fehlerantwort werden übersprungen, bei mehreren gültigen Werten je (id, model) zählt der neueste.
+    Modelle, die nur in der CSV stehen, behalten ihre Werte.
+    Gibt die ersetzten Kennzahlen zurück, leer ohne Speicher oder ohne pyarrow.
+    """
+    try:
+        from result_store import load_results, RESULTS_DIR, RESULT_SCHEMA
+    except ImportError:
+        print("[INFO] pyarrow nicht installiert, alle Kennzahlen aus der CSV.")
+        return []
+    if not os.path.isdir(RESULTS_DIR):
+        return []
+
+    metrics = [metric for metric in METRICS if metric in RESULT_SCHEMA.names]
+    if not metrics:
+        return []
+    df = load_results(columns=["id", "seq", "written_at", "model_answer", *metrics], runs=STORE_RUNS, models=STORE_MODELS)
+    # Älteste zuerst, spätere Messungen überschreiben frühere
+    df = df.sort_values(by=["written_at", "run", "seq"], kind="stable")
+    df = df[[isinstance(answer, str) and is_valid_answer(answer) for answer in df["model_answer"]]]
+
+    store_models = {str(model).strip() for model in df["model"].unique()}
+    replaced = 0
+    for metric in metrics:
+        values[metric] = {key: value for key, value in values[metric].items() if key[1] not in store_models}
+        for question_id, model, value in zip(df["id"], df["model"], df[metric]):
+            value = to_float(value)
+            if value is None:
+                continue
+            key = (str(question_id).strip(), str(model).strip())
+            if key in values[metric]:
+                replaced += 1
+            values[metric][key] = value
+
+    if replaced:
+        print(f"[INFO] {replaced} (id, model)-Werte mehrfach im Ergebnis-Speicher, der neueste Lauf zählt.")
+    return metrics
+
+
+def build_jobs(values, categories):
+    """
+    Stellt alle Resampling-Aufgaben zusammen: Gruppen (Kennzahl je Modell und je (Modell, Kategorie))
+    und Paare (Differenzen zweier Modelle auf denselben IDs, mit der Kennzahl aus METRICS).
+    """
+    groups = []
+    pairs = []
+
+    for metric, statistic in METRICS.items():
+        by_model = {}
+        for (question_id, model), value in values[metric].items():
+            by_model.setdefault(model, {})[question_id] = value
+
+        for model, model_values in sorted(by_model.items()):
+            groups.append({"metric": metric, "statistic": statistic, "model": model, "category": None,
+                           "values": np.array(list(model_values.values()))})
+            by_category = {}
+            for question_id, value in model_values.items():
+                by_category.setdefault(categories.get(question_id, ""), []).append(value)
+            for category, category_values in sorted(by_category.items()):
+                groups.append({"metric": metric, "statistic": statistic, "model": model, "category": category,
+                               "values": np.array(category_values)})
+
+        # Gepaart: nur IDs, die beide Modelle beantwortet haben
+        for model_a, model_b in combinations(sorted(by_model), 2):
+            shared = sorted(set(by_model[model_a]) & set(by_model[model_b]))
+            diffs = np.array([by_model[model_a][i] - by_model[model_b][i] for i in shared])
+            pairs.append({"metric": metric, "statistic": statistic, "model_a": model_a, "model_b": model_b,
+                          "values": diffs})
+
+    return groups, pairs
+
+
+def statistic_of(values, statistic, axis=None):
+    return values.mean(axis=axis) if statistic == "mean" else np.median(values, axis=axis)
+
+
+def resample_chunk(groups, pairs, count, seed):
+    """
+    Ein Arbeitspaket: count Bootstrap-Stichproben für jede Gruppe und jedes Paar, dazu count zufällige
+    Vorzeichenwechsel der Paar-Differenzen (Permutationstest). Alles als Matrix-Operationen (count x n).
+    Paare verwenden dieselbe Kennzahl wie die Gruppen (Mittelwert bzw. Median der Differenzen).
+    """
+    rng = np.random.default_rng(seed)
+    group_stats = []
+    for group in groups:
+        values = group["values"]
+        if len(values) < 2:
+            group_stats.append(None)
+            continue
+        sample = values[rng.integers(0, len(values), size=(count, len(values)))]
+        group_stats.append(statistic_of(sample, group["statistic"], axis=1))
+
+    pair_stats = []
+    for pair in pairs:
+        diffs = pair["values"]
+        if len(diffs) < 2:
+            pair_stats.append(None)
+            continue
+        boot = statistic_of(diffs[rng.integers(0, len(diffs), size=(count, len(diffs)))], pair["statistic"], axis=1)
+        signs = rng.choice(np.array([-1.0, 1.0]), size=(count, len(diffs)))
+        pair_stats.append((boot, statistic_of(signs * diffs, pair["statistic"], axis=1)))
+    return group_stats, pair_stats
+
+
+def run_resampling(groups, pairs):
+    """Verteilt die Stichproben in Paketen von CHUNK_SIZE auf mehrere Prozesse, jedes Paket mit eigenem Seed."""
+    counts = [CHUNK_SIZE] * (N_RESAMPLES // CHUNK_SIZE)
+    if N_RESAMPLES % CHUNK_SIZE:
+        counts.append(N_RESAMPLES % CHUNK_SIZE)
+    seeds = np.random.SeedSequence(SEED).spawn(len(counts))
+
+    workers = max(1, min(len(counts), MAX_WORKERS or os.cpu_count() or 1))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = list(executor.map(resample_chunk, [groups] * len(counts), [pairs] * len(counts), counts, seeds))
+
+    group_stats = [None if chunks[0][0][i] is None else np.concatenate([c[0][i] for c in chunks])
+                   for i in range(len(groups))]
+    pair_stats = [None if chunks[0][1][i] is None else
+                  (np.concatenate([c[1][i][0] for c in chunks]), np.concatenate([c[1][i][1] for c in chunks]))
+                  for i in range(len(pairs))]
+    return group_stats, pair_stats, workers
+
+
+def holm(p_values):
+    """Holm-Bonferroni-Korrektur für mehrere Vergleiche."""
+    order = sorted(range(len(p_values)), key=lambda i: p_values[i])
+    adjusted = [1.0] * len(p_values)
+    running = 0.0
+    for rank, i in enumerate(order):
+        running = max(running, min(1.0, (len(p_values) - rank) * p_values[i]))
+        adjusted[i] = running
+    return adjusted
+
+
+def summarize(groups, pairs, group_stats, pair_stats):
+    tail = (1 - CONFIDENCE) / 2 * 100
+    summary = []
+    for group, boot in zip(groups, group_stats):
+        values = group["values"]
+        estimate = statistic_of(values, group["statistic"]) if len(values) else None
+        low, high = np.percentile(boot, [tail, 100 - tail]) if boot is not None else (None, None)
+        summary.append({"metric": group["metric"], "statistic": group["statistic"], "model": group["model"],
+                        "category": group["category"], "n": len(values), "estimate": to_float(estimate),
+                        "ci_low": to_float(low), "ci_high": to_float(high)})
+
+    comparisons = []
+    for pair, stats in zip(pairs, pair_stats):
+        diffs = pair["values"]
+        observed = statistic_of(diffs, pair["statistic"]) if len(diffs) else None
+        entry = {"metric": pair["metric"], "statistic": pair["statistic"], "model_a": pair["model_a"],
+                 "model_b": pair["model_b"], "n": len(diffs), "diff": to_float(observed),
+                 "ci_low": None, "ci_high": None, "p_value": None}
+        if stats is not None:
+            boot, permuted = stats
+            entry["ci_low"], entry["ci_high"] = (float(v) for v in np.percentile(boot, [tail, 100 - tail]))
+            # Zweiseitig, +1 damit p nie exakt 0 wird
+            extreme = np.count_nonzero(np.abs(permuted) >= abs(observed) - 1e-12)
+            entry["p_value"] = float((extreme + 1) / (len(permuted) + 1))
+        comparisons.append(entry)
+
+    # Korrektur je Kennzahl über alle Modellpaare
+    for metric in METRICS:
+        tested = [c for c in comparisons if c["metric"] == metric and c["p_value"] is not None]
+        for entry, adjusted in zip(tested, holm([c["p_value"] for c in tested])):
+            entry["p_holm"] = adjusted
+            entry["significant"] = bool(adjusted < ALPHA)
+    return summary, comparisons
+
+
+def write_csv(filename, rows, fieldnames):
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL,
+                                extrasaction="ignore", restval="")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({key: f"{value:.4f}" if isinstance(value, float) else value for key, value in row.items()})
+
+
+def fmt(value, digits=3):
+    return "-" if value is None else f"{value:.{digits}f}"
+
+
+def print_report(summary, comparisons):
+    level = int(CONFIDENCE * 100)
+    for metric, statistic in METRICS.items():
+        print(f"\n {metric} ({statistic}, {level}%-KI):")
+        for s in summary:
+            if s["metric"] == metric and s["category"] is None:
+                print(f"   -> {s['model']:<26} {fmt(s['estimate']):>9}  [{fmt(s['ci_low'])}, {fmt(s['ci_high'])}]  n={s['n']}")
+        for c in comparisons:
+            if c["metric"] == metric:
+                mark = "*" if c.get("significant") else " "
+                print(f"      {c['model_a']} - {c['model_b']}: {fmt(c['diff'])} "
+                      f"[{fmt(c['ci_low'])}, {fmt(c['ci_high'])}]  p={fmt(c['p_value'], 4)} "
+                      f"p_holm={fmt(c.get('p_holm'), 4)} {mark} (n={c['n']})")
+
+
+def run_analysis():
+    if not os.path.exists(INPUT_FILE):
+        print(f"[FEHLER] Datei '{INPUT_FILE}' fehlt.")
+        return None
+
+    values, categories = load_values()
+    store_metrics = load_store_values(values) if USE_RESULT_STORE else []
+    if store_metrics:
+        print(f"[INFO] {', '.join(store_metrics)} aus dem Ergebnis-Speicher (Läufe: {STORE_RUNS or 'alle'}).")
+    groups, pairs = build_jobs(values, categories)
+
+    start = time.perf_counter()
+    group_stats, pair_stats, workers = run_resampling(groups, pairs)
+    seconds = time.perf_counter() - start
+    summary, comparisons = summarize(groups, pairs, group_stats, pair_stats)
+
+    print(f"[INFO] {len(groups)} Gruppen, {len(pairs)} Modellpaare, {N_RESAMPLES} Stichproben "
+          f"in {seconds:.2f}s ({workers} Prozesse)")
+    print_report(summary, comparisons)
+    print(f"\n   * = signifikant nach Holm-Korrektur (alpha {ALPHA}); Differenz = model_a - model_b")
+
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "input_file": INPUT_FILE,
+        "store_metrics": store_metrics,
+        "settings": {"metrics": METRICS, "n_resamples": N_RESAMPLES, "confidence": CONFIDENCE, "alpha": ALPHA,
+                     "seed": SEED, "chunk_size": CHUNK_SIZE},
+        "seconds": round(seconds, 3),
+        "groups": summary,
+        "pairs": comparisons
+    }
+    with open(REPORT_FILE, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    write_csv(SUMMARY_FILE, summary, ["metric", "statistic", "model", "category", "n", "estimate", "ci_low", "ci_high"])
+    write_csv(PAIRS_FILE, comparisons, ["metric", "statistic", "model_a", "model_b", "n", "diff", "ci_low", "ci_high",
+                                        "p_value", "p_holm", "significant"])
+    print(f"[INFO] Ergebnisse gespeichert in: {REPORT_FILE}, {SUMMARY_FILE}, {PAIRS_FILE}")
+    return report
+
+
+if __name__ == "__main__":
+    run_analysis()
@@ -0,0 +1,269 @@
+import csv
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from HTW_Ollama_API import OllamaApi
+
+# --- KONFIGURATION ---
+INPUT_FILE = "benchmark_results_merged.csv"
+OUTPUT_FILE = "evaluation_auto.csv"         # Gleiche Spalten wie evaluation_completed.csv, plus judge_*-Spalten
+HUMAN_FILE = "evaluation_completed.csv"     # Manuelle Bewertungen, nur für den Vergleich
+VERDICT_CACHE_FILE = "judge_verdicts.jsonl"
+
+JUDGE_MODEL = "llama3.3:70b"
+JUDGE_OPTIONS = {
+    "num_ctx": 8192,
+    "temperature": 0.0,
+    "seed": 42
+}
+BATCH_SIZE = 5                  # Antworten pro Judge-Anfrage
+MAX_CONCURRENCY = 4             # Gleichzeitige Judge-Anfragen (OLLAMA_NUM_PARALLEL des Servers beachten)
+LOW_CONFIDENCE = 0.7            # Darunter landet eine Bewertung im Review von rate_answers.py
+
+SCORES = [0.0, 0.5, 1.0]
+JUDGE_FIELDNAMES = ["judge_confidence", "judge_reasoning", "judge_model"]
+
+# Rubrik-Definitionen, gemeinsam für die manuelle Bewertung (rate_answers.py) und den Judge
+RUBRIC_TEXT = (
+    "BEWERTUNGS-LEITFADEN:\n"
+    "---------------------------------------------------------\n"
+    "🔴 0.0 Pkt (Falsch/Halluzination):\n"
+    "   - Antwort widerspricht dem Kontext.\n"
+    "   - Erfindet Fakten (Halluzination).\n"
+    "   - Bei Kat 4 (Rejection): Modell gibt eine Antwort statt zu verweigern.\n\n"
+    "🟡 0.5 Pkt (Teilweise/Ungenau):\n"
+    "   - Im Kern richtig, aber wichtige Details fehlen.\n"
+    "   - Zu viel irrelevantes Geschwafel (Low Precision).\n\n"
+    "🟢 1.0 Pkt (Korrekt & Vollständig):\n"
+    "   - Faktisch korrekt laut Kontext.\n"
+    "   - Vollständig (alle Bedingungen genannt).\n"
+    "   - Bei Kat 4: Korrekte Verweigerung ('Dazu habe ich keine Infos')."
+)
+
+JUDGE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "ratings": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "index": {"type": "integer"},
+                    "score": {"type": "number", "enum": SCORES},
+                    "confidence": {"type": "number"},
+                    "reasoning": {"type": "string"}
+                },
+                "required": ["index", "score", "confidence", "reasoning"]
+            }
+        }
+    },
+    "required": ["ratings"]
+}
+
+
+def build_judge_prompt():
+    return (
+        "Du bewertest Antworten von Sprachmodellen auf Fragen zum NFL-Regelwerk.\n"
+        "Vergleiche jede Modell-Antwort mit der Musterlösung (Ground Truth) und vergib genau eine Punktzahl "
+        "nach dem folgenden Leitfaden:\n\n"
+        f"{RUBRIC_TEXT}\n\n"
+        "Gib für jede Antwort den Index, die Punktzahl (0.0, 0.5 oder 1.0), deine Sicherheit zwischen 0 und 1 "
+        "und eine kurze Begründung (ein Satz) zurück. Antworte ausschließlich als JSON."
+    )
+
+
+def build_batch_message(batch):
+    parts = []
+    for index, row in enumerate(batch):
+        parts.append(
+            f"### Antwort {index}\n"
+            f"Kategorie: {row.get('category', '')}\n"
+            f"Frage: {row.get('question', '')}\n"
+            f"Musterlösung: {row.get('ground_truth', '')}\n"
+            f"Modell-Antwort: {row.get('model_answer', '')}"
+        )
+    return "\n\n".join(parts)
+
+
+def verdict_key(row):
+    """Schlüssel eines Urteils: Judge-Modell, Rubrik und die bewerteten Texte (ohne Modellname, blind)."""
+    data = json.dumps([JUDGE_MODEL, RUBRIC_TEXT, row.get("question", ""), row.get("ground_truth", ""),
+                       row.get("model_answer", "")], ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def load_verdict_cache():
+    cache = {}
+    if not os.path.exists(VERDICT_CACHE_FILE):
+        return cache
+    with open(VERDICT_CACHE_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Abgebrochener Schreibvorgang am Dateiende
+                continue
+            cache[entry["key"]] = entry["verdict"]
+    return cache
+
+
+def normalize_verdict(rating):
+    """Rundet auf die nächste erlaubte Punktzahl und begrenzt die Sicherheit auf 0..1."""
+    try:
+        score = float(rating.get("score"))
+        confidence = float(rating.get("confidence", 0))
+    except (TypeError, ValueError):
+        return None
+    return {
+        "score": min(SCORES, key=lambda s: abs(s - score)),
+        "confidence": round(min(1.0, max(0.0, confidence)), 3),
+        "reasoning": str(rating.get("reasoning", "")).strip()
+    }
+
+
+def judge_batch(batch):
+    """Bewertet eine Liste von Zeilen mit einer Judge-Anfrage. Gibt {Index: Urteil} zurück."""
+    messages = [
+        {"role": "system", "content": build_judge_prompt()},
+        {"role": "user", "content": build_batch_message(batch)}
+    ]
+    response = OllamaApi.chat(messages, model=JUDGE_MODEL, schema=JUDGE_SCHEMA, options=JUDGE_OPTIONS)
+    if not response or not isinstance(response.get("result"), dict):
+        return {}
+
+    verdicts = {}
+    for rating in response["result"].get("ratings", []):
+        index = rating.get("index")
+        if isinstance(index, int) and 0 <= index < len(batch):
+            verdict = normalize_verdict(rating)
+            if verdict is not None:
+                verdicts[index] = verdict
+    return verdicts
+
+
+def grade_rows(rows, cache):
+    """
+    Bewertet alle Zeilen ohne Urteil im Cache, BATCH_SIZE Antworten pro Anfrage und MAX_CONCURRENCY Anfragen gleichzeitig.
+    Fehlt eine Antwort im Ergebnis eines Batches, wird sie einzeln nachbewertet.
+    """
+    open_rows = []
+    seen = set()
+    for row in rows:
+        key = verdict_key(row)
+        if key not in cache and key not in seen:
+            seen.add(key)
+            open_rows.append(row)
+
+    print(f"[INFO] {len(rows) - len(open_rows)} Urteile aus dem Cache, {len(open_rows)} werden neu bewertet.")
+    if not open_rows:
+        return
+
+    batches = [open_rows[i:i + BATCH_SIZE] for i in range(0, len(open_rows), BATCH_SIZE)]
+    cache_lock = threading.Lock()
+    done = {"rows": 0}
+
+    def store(row, verdict, cache_file):
+        key = verdict_key(row)
+        with cache_lock:
+            cache[key] = verdict
+            cache_file.write(json.dumps({"key": key, "verdict": verdict}, ensure_ascii=False) + "\n")
+            cache_file.flush()
+
+    def work(batch, cache_file):
+        verdicts = judge_batch(batch)
+        missing = [row for index, row in enumerate(batch) if index not in verdicts]
+        for index, verdict in verdicts.items():
+            store(batch[index], verdict, cache_file)
+
+        # Einzeln nachbewerten, wenn der Judge Antworten im Batch ausgelassen hat
+        if len(batch) > 1:
+            for row in missing:
+                single = judge_batch([row])
+                if 0 in single:
+                    store(row, single[0], cache_file)
+
+        with cache_lock:
+            done["rows"] += len(batch)
+            print(f"\r   [STATUS] {done['rows']}/{len(open_rows)} Antworten bewertet...", end="", flush=True)
+
+    start = time.perf_counter()
+    with open(VERDICT_CACHE_FILE, "a", encoding="utf-8") as cache_file:
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+            futures = [executor.submit(work, batch, cache_file) for batch in batches]
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"\n   [FEHLER] Judge-Anfrage fehlgeschlagen: {e}")
+    print(f"\n[INFO] Bewertung in {time.perf_counter() - start:.1f}s ({len(batches)} Anfragen).")
+
+
+def load_human_scores(filename=HUMAN_FILE):
+    scores = {}
+    if not os.path.exists(filename):
+        return scores
+    with open(filename, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f, delimiter=';'):
+            try:
+                scores[(row["id"], row["model"])] = float(row["score"])
+            except (KeyError, TypeError, ValueError):
+                continue
+    return scores
+
+
+def print_agreement(graded, human):
+    pairs = [(float(row["score"]), human[(row["id"], row["model"])]) for row in graded
+             if (row["id"], row["model"]) in human]
+    if not pairs:
+        return
+    agree = sum(1 for judge, person in pairs if judge == person)
+    mean_diff = sum(abs(judge - person) for judge, person in pairs) / len(pairs)
+    print(f"[INFO] Vergleich mit {HUMAN_FILE}: {agree}/{len(pairs)} gleich ({100 * agree / len(pairs):.1f}%), "
+          f"mittlere Abweichung {mean_diff:.3f} Punkte")
+
+
+def run_grader():
+    if not os.path.exists(INPUT_FILE):
+        print(f"[FEHLER] Datei {INPUT_FILE} nicht gefunden!")
+        return
+
+    with open(INPUT_FILE, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f, delimiter=';')
+        input_fields = list(reader.fieldnames)
+        rows = list(reader)
+
+    cache = load_verdict_cache()
+    grade_rows(rows, cache)
+
+    graded = []
+    missing = 0
+    for row in rows:
+        verdict = cache.get(verdict_key(row))
+        if verdict is None:
+            missing += 1
+            continue
+        graded.append({
+            **row,
+            "score": verdict["score"],
+            "judge_confidence": verdict["confidence"],
+            "judge_reasoning": verdict["reasoning"],
+            "judge_model": JUDGE_MODEL
+        })
+
+    fieldnames = input_fields + ["score"] + JUDGE_FIELDNAMES
+    with open(OUTPUT_FILE, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        writer.writeheader()
+        writer.writerows(graded)
+
+    low = sum(1 for row in graded if row["judge_confidence"] < LOW_CONFIDENCE)
+    print(f"[INFO] {len(graded)} Bewertungen gespeichert in: {OUTPUT_FILE}")
+    print(f"[INFO] Unsicher (< {LOW_CONFIDENCE}): {low}, ohne Urteil: {missing}")
+    print_agreement(graded, load_human_scores())
+
+
+if __name__ == "__main__":
+    run_grader()
@@ -0,0 +1,413 @@
+import csv
+import time
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from HTW_Ollama_API import OllamaApi
+from rate_limiter import RateLimiter, call_with_backoff, estimate_tokens
+from resume_index import repair_partial_write, load_completed_pairs, pending_questions
+from check_data import check_row
+
+# --- KONFIGURATION ---
+INPUT_FILE = "promptset.json"
+OUTPUT_FILE = "benchmark_results_engine.csv"
+
+# Welche Backends gleichzeitig laufen ("ollama", "openai", "gemini", "fake")
+BACKENDS = ["ollama", "openai", "gemini"]
+
+# Gleichzeitige Anfragen pro Backend
+OLLAMA_CONCURRENCY = 2
+OPENAI_CONCURRENCY = 4
+GEMINI_CONCURRENCY = 4
+FAKE_CONCURRENCY = 8
+
+OLLAMA_MODELS = [
+    "llama3.1:8b",
+    "llama3.3:70b"
+]
+OLLAMA_OPTIONS = {
+    "temperature": 0.0,
+    "num_ctx": 8192,
+    "seed": 42
+}
+
+OPENAI_MODEL = "gpt-5-mini"
+OPENAI_PARAMS = {
+    # Es werden nur die Defaultwerte für "temperature" und "top_p" unterstützt.
+    "seed": 42,
+    "reasoning_effort": "minimal"
+}
+
+GEMINI_MODEL = "gemini-3-flash-preview"
+GEMINI_PARAMS = {
+    "temperature": 0.0,
+    "top_p": 0.9
+}
+
+# Rate Limits der Cloud-Backends (an das eigene Kontingent anpassen)
+OPENAI_RPM = 500
+OPENAI_TPM = 200000
+GEMINI_RPM = 60
+GEMINI_TPM = 250000
+EXPECTED_OUTPUT_TOKENS = 300    # Für die Token-Schätzung vor der Anfrage
+
+# Ergebnisse zusätzlich im Parquet-Speicher ablegen (result_store.py, benötigt pyarrow), Partition run=RUN_ID
+RESULT_STORE = False
+RUN_ID = None                   # None = Startzeitpunkt des Laufs
+
+# Gemeinsames Ergebnis-Schema aller Runner
+FIELDNAMES = [
+    "id",
+    "category",
+    "model",
+    "time_total", "time_read", "time_write", # Detaillierte Zeiten
+    "input_tokens", "output_tokens",
+    "tps_read", "tps_write",
+    "question",
+    "model_answer",
+    "ground_truth",
+    "context_snippet"
+]
+
+# --- HILFSFUNKTIONEN ---
+
+def build_system_prompt(context_text):
+    """
+    Erstellt den System-Prompt.
+    Definiert die Rolle, Rejection-Logik und Sprache.
+    """
+    return (
+        "Du bist ein strikter Regel-Analyst für die National Football League (NFL). "
+        "Deine Aufgabe ist es, Fragen ausschließlich basierend auf dem untenstehenden Kontext zu beantworten.\n\n"
+        "Befolge strikt diese Anweisungen:\n"
+        "1. **Wissensbegrenzung:** Nutze NUR Informationen aus dem Abschnitt 'KONTEXT'. Greife NICHT auf dein internes Trainingswissen zurück.\n"
+        "2. **Rejection:** Wenn die Antwort auf die Frage nicht eindeutig im Kontext steht, antworte exakt mit: 'Dazu habe ich keine Informationen.' (Erfinde nichts!).\n"
+        "3. **Sprache:** Antworte in deutscher Sprache. Behalte englische Fachbegriffe (z.B. 'Touchdown', 'Fumble', 'Line of Scrimmage') bei, da diese im deutschen American Football Standard sind.\n"
+        "4. **Präzision:** Antworte direkt und faktenbasiert. Vermeide Einleitungen wie 'Laut dem Text...'.\n\n"
+        f"KONTEXT:\n{context_text}"
+    )
+
+def system_prompt_for(entry):
+    """System-Prompt einer Frage: aus dem übersetzten Promptset (promptset_store.py), sonst neu gebaut."""
+    return entry.get("system_prompt") or build_system_prompt(entry.get("context_text", ""))
+
+def build_row(entry, model_name, result):
+    """
+    Baut eine CSV-Zeile im gemeinsamen Schema aus dem Ergebnis eines Backends.
+    Ohne Server-Zeiten (Cloud-APIs) wird tps_write wie bisher über die Gesamtdauer berechnet.
+    """
+    t_total = float(result.get("time_total", 0))
+    t_read = float(result.get("time_read", 0))
+    t_write = float(result.get("time_write", 0))
+    in_tok = int(result.get("input_tokens", 0))
+    out_tok = int(result.get("output_tokens", 0))
+
+    speed_read = in_tok / t_read if t_read > 0 else 0
+    write_time = t_write if t_write > 0 else t_total
+    speed_write = out_tok / write_time if write_time > 0 else 0
+
+    context_text = entry.get("context_text", "")
+
+    return {
+        "id": entry.get("id"),
+        "category": entry.get("category"),
+        "model": model_name,
+        "time_total": f"{t_total:.3f}",
+        "time_read": f"{t_read:.3f}",
+        "time_write": f"{t_write:.3f}",
+        "input_tokens": in_tok,
+        "output_tokens": out_tok,
+        "tps_read": f"{speed_read:.2f}",
+        "tps_write": f"{speed_write:.2f}",
+        "question": entry.get("question"),
+        "model_answer": result.get("answer"),
+        "ground_truth": entry.get("ground_truth", ""),
+        "context_snippet": context_text[:50] + "..." if context_text else "EMPTY"
+    }
+
+# --- BACKENDS ---
+# Jedes Backend liefert für eine Frage ein Dict mit answer, time_total, time_read,
+# time_write, input_tokens und output_tokens. Fehler werden als Exception gemeldet.
+
+class OllamaBackend:
+    name = "ollama"
+
+    def __init__(self, models=None, options=None, max_concurrency=OLLAMA_CONCURRENCY):
+        self.models = models or OLLAMA_MODELS
+        self.options = options or OLLAMA_OPTIONS
+        self.max_concurrency = max_concurrency
+
+    def ask(self, system_prompt, question, model_name):
+        response = OllamaApi.chat(
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": question}
+            ],
+            model=model_name,
+            options=self.options
+        )
+        if response.get("result") is None:
+            raise RuntimeError(response.get("info", {}).get("error", "Keine Antwort"))
+
+        return {
+            "answer": response["result"],
+            "time_total": response.get("time", 0),
+            "time_read": response.get("time_read", 0),
+            "time_write": response.get("time_write", 0),
+            "input_tokens": response.get("input_token", 0),
+            "output_tokens": response.get("token", 0)
+        }
+
+class OpenAIBackend:
+    name = "openai"
+
+    def __init__(self, model=OPENAI_MODEL, params=None, max_concurrency=OPENAI_CONCURRENCY):
+        # Optionale Abhängigkeiten erst hier laden, damit die anderen Backends ohne sie laufen
+        from dotenv import load_dotenv
+        from openai import OpenAI
+
+        load_dotenv()
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.models = [model]
+        self.params = params or OPENAI_PARAMS
+        self.max_concurrency = max_concurrency
+        self.limiter = RateLimiter(rpm=OPENAI_RPM, tpm=OPENAI_TPM)
+
+    def ask(self, system_prompt, question, model_name):
+        def request():
+            start_time = time.time()
+            response = self.client.chat.completions.create(
+                model=model_name,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": question}
+                ],
+                **self.params
+            )
+            return response, time.time() - start_time
+
+        estimated = estimate_tokens(system_prompt, question) + EXPECTED_OUTPUT_TOKENS
+        response, duration = call_with_backoff(request, self.limiter, tokens=estimated)
+        self.limiter.record_usage(estimated, response.usage.prompt_tokens + response.usage.completion_tokens)
+
+        return {
+            "answer": response.choices[0].message.content,
+            "time_total": duration,
+            "input_tokens": response.usage.prompt_tokens,
+            "output_tokens": response.usage.completion_tokens
+        }
+
+class GeminiBackend:
+    name = "gemini"
+
+    def __init__(self, model=GEMINI_MODEL, params=None, max_concurrency=GEMINI_CONCURRENCY):
+        from dotenv import load_dotenv
+        from google import genai
+        from google.genai import types
+
+        load_dotenv()
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise RuntimeError("Kein GOOGLE_API_KEY in der .env gefunden!")
+
+        self.client = genai.Client(api_key=api_key)
+        self.config = types.GenerateContentConfig(**(params or GEMINI_PARAMS))
+        self.models = [model]
+        self.max_concurrency = max_concurrency
+        self.limiter = RateLimiter(rpm=GEMINI_RPM, tpm=GEMINI_TPM)
+
+    def ask(self, system_prompt, question, model_name):
+        full_prompt = system_prompt + "\n\nFRAGE:\n" + question
+
+        def request():
+            start_time = time.time()
+            response = self.client.models.generate_content(
+                model=model_name,
+                contents=full_prompt,
+                config=self.config
+            )
+            return response, time.time() - start_time
+
+        estimated = estimate_tokens(full_prompt) + EXPECTED_OUTPUT_TOKENS
+        response, duration = call_with_backoff(request, self.limiter, tokens=estimated)
+
+        content = ""
+        if response.text:
+            content = response.text
+        elif response.candidates and response.candidates[0].content.parts:
+            content = response.candidates[0].content.parts[0].text
+        else:
+            content = "[EMPTY RESPONSE]"
+
+        in_tok = 0
+        out_tok = 0
+        if response.usage_metadata:
+            in_tok = response.usage_metadata.prompt_token_count or 0
+            out_tok = response.usage_metadata.candidates_token_count or 0
+        self.limiter.record_usage(estimated, in_tok + out_tok)
+
+        return {
+            "answer": content,
+            "time_total": duration,
+            "input_tokens": in_tok,
+            "output_tokens": out_tok
+        }
+
+class FakeBackend:
+    """Lokales Backend ohne Netzwerk zum Testen der Engine. Antwortet nach fester Wartezeit."""
+    name = "fake"
+
+    def __init__(self, models=None, latency=0.05, max_concurrency=FAKE_CONCURRENCY):
+        self.models = models or ["fake-model"]
+        self.latency = latency
+        self.max_concurrency = max_concurrency
+
+    def ask(self, system_prompt, question, model_name):
+        time.sleep(self.latency)
+        answer = "Dazu habe ich keine Informationen."
+        return {
+            "answer": answer,
+            "time_total": self.latency,
+            "time_read": self.latency / 4,
+            "time_write": self.latency * 3 / 4,
+            # Grobe Schätzung: ca. 4 Zeichen pro Token
+            "input_tokens": (len(system_prompt) + len(question)) // 4,
+            "output_tokens": len(answer) // 4
+        }
+
+BACKEND_TYPES = {
+    "ollama": OllamaBackend,
+    "openai": OpenAIBackend,
+    "gemini": GeminiBackend,
+    "fake": FakeBackend
+}
+
+def create_backends(names):
+    backends = []
+    for name in names:
+        if name not in BACKEND_TYPES:
+            print(f"[FEHLER] Unbekanntes Backend '{name}'.")
+            continue
+        try:
+            backends.append(BACKEND_TYPES[name]())
+        except Exception as e:
+            print(f"[FEHLER] Backend '{name}' konnte nicht gestartet werden: {e}")
+    return backends
+
+# --- ENGINE ---
+
+def run_backend(backend, questions, completed, writer, csvfile, write_lock, written_rows=None):
+    """Arbeitet alle offenen Fragen eines Backends mit dessen eigenem Worker-Pool ab."""
+    tasks = []
+    for model_name in backend.models:
+        for entry in pending_questions(questions, model_name, completed):
+            tasks.append((entry, model_name))
+
+    stats = {"backend": backend.name, "requests": len(tasks), "written": 0, "errors": 0, "check_issues": 0}
+
+    def work(entry, model_name):
+        system_prompt = system_prompt_for(entry)
+        try:
+            result = backend.ask(system_prompt, entry.get("question"), model_name)
+        except Exception as e:
+            print(f"\n   [FEHLER] {backend.name}/{model_name} ID {entry.get('id')}: {e}")
+            with write_lock:
+                stats["errors"] += 1
+            return
+
+        row = build_row(entry, model_name, result)
+        issues = check_row(row)
+        with write_lock:
+            writer.writerow(row)
+            csvfile.flush()
+            stats["written"] += 1
+            if issues:
+                # Gleiche Regeln wie check_data.py, direkt beim Schreiben
+                stats["check_issues"] += 1
+                print(f"\n   [PRÜFUNG] {backend.name}/{model_name} ID {entry.get('id')}: {', '.join(issues)}")
+            if written_rows is not None:
+                written_rows.append(row)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=backend.max_concurrency) as executor:
+        # Modell für Modell einreihen, damit ein lokaler Server nicht ständig zwischen Modellen wechselt
+        futures = [executor.submit(work, entry, model_name) for entry, model_name in tasks]
+    stats["wall_time"] = round(time.perf_counter() - start, 3)
+
+    # Fehler außerhalb von backend.ask (z.B. beim Schreiben der Zeile) nicht verschlucken
+    for (entry, model_name), future in zip(tasks, futures):
+        error = future.exception()
+        if error is not None:
+            print(f"\n   [FEHLER] {backend.name}/{model_name} ID {entry.get('id')}: {error!r}")
+            stats["errors"] += 1
+
+    print(f"\n[INFO] Backend '{backend.name}' fertig: {stats['written']}/{stats['requests']} Antworten in {stats['wall_time']:.1f}s")
+    return stats
+
+def run_engine(backends, input_file=INPUT_FILE, output_file=OUTPUT_FILE):
+    """
+    Führt alle Backends gleichzeitig aus und schreibt in eine gemeinsame CSV.
+    Die Gesamtdauer entspricht damit etwa der des langsamsten Backends.
+    """
+    if not os.path.exists(input_file):
+        print(f"[FEHLER] Datei '{input_file}' nicht gefunden.")
+        return None
+
+    if not backends:
+        print("[FEHLER] Keine Backends konfiguriert.")
+        return None
+
+    # Kontexte und System-Prompts nur einmal pro Kontext, erst beim ersten Zugriff geladen
+    from promptset_store import load_questions
+    questions = load_questions(input_file)
+
+    repair_partial_write(output_file)
+    completed = load_completed_pairs(output_file)
+    file_exists = os.path.exists(output_file) and os.path.getsize(output_file) > 0
+
+    print("-" * 60)
+    print(f"[INFO] START ENGINE")
+    print(f"[INFO] Fragen: {len(questions)}")
+    for backend in backends:
+        print(f"[INFO] Backend {backend.name}: {backend.models} (max. {backend.max_concurrency} gleichzeitig)")
+    print(f"[INFO] Output: {output_file}")
+    print("-" * 60)
+
+    write_lock = threading.Lock()
+    written_rows = []
+    run_id = RUN_ID or time.strftime("%Y%m%d-%H%M%S")
+    start = time.perf_counter()
+
+    with open(output_file, "a", newline="", encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL,
+                                extrasaction="ignore")
+        if not file_exists:
+            writer.writeheader()
+
+        # Ein Thread pro Backend, jedes Backend begrenzt seine Anfragen selbst
+        with ThreadPoolExecutor(max_workers=len(backends)) as executor:
+            futures = [executor.submit(run_backend, backend, questions, completed, writer, csvfile, write_lock, written_rows)
+                       for backend in backends]
+            wait(futures)
+
+    wall_time = time.perf_counter() - start
+    results = []
+    for backend, future in zip(backends, futures):
+        error = future.exception()
+        if error is not None:
+            print(f"\n[FEHLER] Backend '{backend.name}' abgebrochen: {error!r}")
+            continue
+        results.append(future.result())
+    serial_time = sum(stats["wall_time"] for stats in results)
+
+    print(f"\n[INFO] ALLE BACKENDS ABGESCHLOSSEN in {wall_time:.1f}s (nacheinander: ca. {serial_time:.1f}s)")
+    print(f"[INFO] Ergebnisse gespeichert in: {output_file}")
+
+    if RESULT_STORE and written_rows:
+        from result_store import append_rows, RESULTS_DIR
+        append_rows(written_rows, run_id)
+        print(f"[INFO] {len(written_rows)} Ergebnisse als Lauf '{run_id}' in {RESULTS_DIR} abgelegt.")
+    return {"wall_time": round(wall_time, 3), "serial_time": round(serial_time, 3), "backends": results}
+
+if __name__ == "__main__":
+    run_engine(create_backends(BACKENDS))
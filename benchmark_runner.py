@@ -2,11 +2,21 @@ import json
 import csv
 import time
 import os
+import random
+from concurrent.futures import ThreadPoolExecutor
 from HTW_Ollama_API import OllamaApi
+from benchmark_engine import system_prompt_for, FIELDNAMES
+from model_scheduler import ModelScheduler, LOAD_KEEP_ALIVE
+from resume_index import repair_partial_write, load_completed_pairs, pending_questions
+from check_data import check_row
+from promptset_store import load_questions, content_hash, template_hash
+from context_planner import plan_request, is_truncated, is_at_risk, plan_report, print_report
+from trials import expand_trials, TrialWriter, summarize_trials, model_overview, write_summary
 
 # --- KONFIGURATION ---
 INPUT_FILE = "promptset.json"
 OUTPUT_FILE = "benchmark_results_open_source.csv"
+RUN_SUMMARY_FILE = "benchmark_run_summary.jsonl"
 
 # Modelle
 MODELS_TO_TEST = [
@@ -21,23 +31,501 @@ CONFIG_OPTIONS = {
     "seed": 42
 }
 
+# Ausführung
+# "sequential" = eine Frage nach der anderen (Originalverhalten)
+# "parallel"   = Worker-Pool mit begrenzten gleichzeitigen Anfragen pro Modell
+EXECUTION_MODE = "sequential"
+MAX_IN_FLIGHT_PER_MODEL = 4     # Nur für "parallel", sollte zu OLLAMA_NUM_PARALLEL des Servers passen
+PAUSE_BETWEEN_REQUESTS = 0.2    # Nur für "sequential" (Server-Stabilität)
+
+# Streaming: Antwort wird als Stream gelesen, zusätzlich werden
+# Time-to-First-Token, Inter-Token-Latenzen und Jitter gespeichert
+STREAM_METRICS = False
+
+# Reihenfolge der Fragen pro Modell
+# "promptset" = Reihenfolge der Datei (Originalverhalten)
+# "grouped"   = Fragen mit identischem System-Prompt direkt hintereinander (nutzt den Prompt-Cache von Ollama)
+# "shuffled"  = zufällige Reihenfolge (Kontrollgruppe ohne Cache-Effekt)
+SCHEDULING = "promptset"
+SHUFFLE_SEED = 42
+
+# Antwort-Cache von OllamaApi (gleiche Anfrage -> gespeicherte Antwort, z.B. nach einem Abbruch)
+# Zeilen aus dem Cache werden in der Spalte "cached" markiert und nicht in die Laufzeit-Statistik eingerechnet
+USE_RESPONSE_CACHE = False
+REFRESH_RESPONSE_CACHE = False  # True = Cache ignorieren, aber neue Antworten speichern
+
+# Fortsetzen: bereits erledigte (id, model)-Paare in OUTPUT_FILE werden übersprungen,
+# eine beim Abbruch halb geschriebene letzte Zeile wird entfernt
+RESUME = True
+
+# Modellwechsel: explizites Laden/Entladen über model_scheduler.py statt "Hi"-Warm-Up.
+# Das nächste Modell wird während der letzten PRELOAD_TAIL Fragen vorgeladen, wenn es zusätzlich in den VRAM passt.
+# Die Ladezeit landet pro Modell in der Laufzeit-Zusammenfassung, time_load pro Frage als eigene Spalte.
+# Standard False: "Hi"-Warm-Up und Spalten wie bisher; mit True kommt die Spalte time_load dazu.
+USE_MODEL_SCHEDULER = False
+PRELOAD_TAIL = 5
+LOAD_POLLUTION_THRESHOLD = 0.5  # Sekunden time_load, ab denen eine Frage als vom Modellwechsel beeinflusst gilt
+
+# Mehrere Ollama-Server, z.B. ["https://host-a:11435", "http://host-b:11434"]. None = nur OllamaApi.HOST:PORT.
+# Anfragen gehen an den am wenigsten ausgelasteten gesunden Server, der das Modell hat;
+# ausgefallene Server werden vorübergehend ausgeschlossen. Mit "parallel" sinnvoll kombinierbar.
+OLLAMA_ENDPOINTS = None
+
+# Client-Overhead pro Frage (Warteschlange, Anfrage, Übertragung, JSON-Parsing, ftfy, Regex, Abstand zu total_duration)
+# als zusätzliche Spalten in Millisekunden. Zeigt, wo unter Last Zeit außerhalb der GPU verloren geht.
+RECORD_CLIENT_TIMINGS = False
+
+# Ergebnisse zusätzlich im Parquet-Speicher ablegen (result_store.py, benötigt pyarrow):
+# typisierte Spalten, partitioniert nach Lauf (RUN_ID) und Modell, Fragetexte nur einmal in der Promptset-Tabelle.
+# Die CSV wird weiterhin geschrieben.
+RESULT_STORE = False
+RUN_ID = None                   # None = Startzeitpunkt des Laufs
+
+# num_ctx pro Frage statt fest aus CONFIG_OPTIONS (context_planner.py): kleinste Stufe, in die Prompt und Antwort passen.
+# Spart KV-Cache (mehr parallele Slots auf derselben GPU). Da Ollama bei jedem Wechsel von num_ctx das Modell
+# neu lädt, werden die Fragen pro Modell nach Stufe sortiert (innerhalb der Stufe gilt SCHEDULING).
+CONTEXT_PLANNING = False
+
+# Wiederholungsmessung: jede Frage TRIALS-mal pro Modell, alle Wiederholungen gemischt (TRIAL_SEED).
+# Die erste Messung eines Paares (und jede mit time_load über LOAD_POLLUTION_THRESHOLD) gilt als kalt,
+# Median, Interquartilsabstand und Variationskoeffizient werden nur aus den warmen Messungen berechnet.
+# Jede Messung landet in TRIALS_FILE, die Kennzahlen pro Paar in TRIAL_SUMMARY_FILE,
+# OUTPUT_FILE erhält wie bisher nur die erste Antwort. Der Antwort-Cache wird dabei umgangen.
+# 1 = jede Frage einmal (Originalverhalten)
+TRIALS = 1
+TRIAL_SEED = 42
+TRIALS_FILE = "benchmark_trials_open_source.csv"
+TRIAL_SUMMARY_FILE = "benchmark_trials_summary.csv"
+
+# Prompt-Aufbau
+# "full"      = ganzer context_text im System-Prompt (Originalverhalten)
+# "retrieval" = nur die passendsten Abschnitte des Regeltexts (retrieval.py, BM25; TOP_K und SCOPE dort)
+# Retrieval-Läufe erhalten in der Spalte model das Suffix retrieval.MODEL_SUFFIX (z.B. "llama3.3:70b+bm25"),
+# damit sie beim Fortsetzen, Zusammenführen und in der Auswertung als eigene Variante neben den vollen Läufen zählen.
+PROMPT_MODE = "full"
+
+# Zusätzliche Spalten, werden nur mit STREAM_METRICS = True geschrieben
+# time_first_token in Sekunden wie alle time_*-Spalten, Inter-Token-Latenzen und Jitter in Millisekunden (_ms)
+STREAM_FIELDNAMES = ["time_first_token", "itl_p50_ms", "itl_p95_ms", "itl_p99_ms", "jitter_ms"]
+
+# Zusätzliche Spalten, werden nur mit SCHEDULING != "promptset" geschrieben
+# shared_prefix = 1, wenn die vorherige Frage an das Modell denselben System-Prompt hatte
+SCHEDULING_FIELDNAMES = ["schedule", "shared_prefix"]
+
+# Zusätzliche Spalte, wird nur mit USE_RESPONSE_CACHE = True geschrieben
+CACHE_FIELDNAMES = ["cached"]
+
+# Zusätzliche Spalte, wird nur mit USE_MODEL_SCHEDULER = True geschrieben
+LOAD_FIELDNAMES = ["time_load"]
+
+# Zusätzliche Spalte, wird nur mit OLLAMA_ENDPOINTS geschrieben
+ENDPOINT_FIELDNAMES = ["endpoint"]
+
+# Zusätzliche Spalten, werden nur mit RECORD_CLIENT_TIMINGS = True geschrieben
+CLIENT_FIELDNAMES = list(OllamaApi.CLIENT_TIMINGS)
+
+# Zusätzliche Spalten, werden nur mit CONTEXT_PLANNING = True geschrieben
+# ctx_truncated = 1, wenn prompt_eval_count bei num_ctx liegt (Prompt abgeschnitten)
+# ctx_at_risk = 1, wenn der Prompt die Planungsgrenze num_ctx - Antwort-Reserve überschreitet
+CONTEXT_FIELDNAMES = ["num_ctx", "ctx_truncated", "ctx_at_risk"]
+
+# Zusätzliche Spalten, werden nur mit PROMPT_MODE = "retrieval" geschrieben
+# full_input_tokens = Prompt-Größe mit vollem Kontext (gemessen oder geschätzt) zum Vergleich mit input_tokens
+PROMPT_FIELDNAMES = ["prompt_mode", "retrieved_chunks", "full_input_tokens"]
+
+# Zusätzliche Spalten, werden immer geschrieben: Hash des ganzen Kontexts und der System-Prompt-Vorlage.
+# promptset_store.py übernimmt input_tokens nur aus Zeilen, deren Hashes zum aktuellen Promptset passen.
+# Fehlen sie in einer bestehenden Datei, werden die neuen Zeilen dort ohne sie geschrieben.
+HASH_FIELDNAMES = ["context_hash", "template_hash"]
+
 # --- HILFSFUNKTIONEN ---
 
-def build_system_prompt(context_text):
+def result_fieldnames():
+    """Spalten für den aktuellen Lauf (Basis-Spalten plus optionale Metriken)."""
+    fieldnames = list(FIELDNAMES)
+    if STREAM_METRICS:
+        fieldnames += STREAM_FIELDNAMES
+    if SCHEDULING != "promptset":
+        fieldnames += SCHEDULING_FIELDNAMES
+    if USE_RESPONSE_CACHE:
+        fieldnames += CACHE_FIELDNAMES
+    if USE_MODEL_SCHEDULER:
+        fieldnames += LOAD_FIELDNAMES
+    if OLLAMA_ENDPOINTS:
+        fieldnames += ENDPOINT_FIELDNAMES
+    if RECORD_CLIENT_TIMINGS:
+        fieldnames += CLIENT_FIELDNAMES
+    if CONTEXT_PLANNING:
+        fieldnames += CONTEXT_FIELDNAMES
+    if PROMPT_MODE != "full":
+        fieldnames += PROMPT_FIELDNAMES
+    fieldnames += HASH_FIELDNAMES
+    return fieldnames
+
+def existing_header():
+    with open(OUTPUT_FILE, "r", newline="", encoding="utf-8") as f:
+        return next(csv.reader(f, delimiter=';'), None)
+
+def missing_columns(file_exists):
+    """Spalten des aktuellen Laufs, die in einer bestehenden OUTPUT_FILE fehlen (ohne die Hash-Spalten)."""
+    if not file_exists:
+        return []
+    existing = existing_header() or []
+    return [name for name in result_fieldnames() if name not in existing and name not in HASH_FIELDNAMES]
+
+def create_writer(csvfile, file_exists):
+    """
+    Erstellt den CSV-Writer. Hat eine bestehende Datei zusätzliche Spalten,
+    wird deren Header beibehalten, damit die Datei nicht verrutscht.
+    Fehlende Spalten werden vorher in run_benchmark abgefangen (missing_columns).
+    """
+    fieldnames = result_fieldnames()
+
+    if file_exists:
+        existing = existing_header()
+        if existing and existing != fieldnames:
+            fieldnames = existing
+
+    writer = csv.DictWriter(csvfile, fieldnames=fieldnames, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL,
+                            restval="", extrasaction="ignore")
+    if not file_exists:
+        writer.writeheader()
+    return writer
+
+def prompt_for(entry):
+    """System-Prompt einer Frage nach PROMPT_MODE."""
+    if PROMPT_MODE == "retrieval":
+        from retrieval import get_retriever
+        return get_retriever(INPUT_FILE).system_prompt(entry)
+    return system_prompt_for(entry)
+
+def result_model(model_name):
+    """Name des Modells in den Ergebnisdateien (mit Suffix für Retrieval-Läufe)."""
+    if PROMPT_MODE == "retrieval":
+        from retrieval import MODEL_SUFFIX
+        return model_name + MODEL_SUFFIX
+    return model_name
+
+def context_plan(entry, model_name):
+    """
+    num_ctx-Plan der Frage: geplant mit CONTEXT_PLANNING, sonst Prüfung gegen das feste num_ctx.
+    Mit Retrieval wird der tatsächlich gesendete (kürzere) System-Prompt geplant.
+    """
+    return plan_request(entry, model_name, None if CONTEXT_PLANNING else CONFIG_OPTIONS.get("num_ctx"),
+                        rendered_prompt(entry))
+
+def rendered_prompt(entry):
+    """System-Prompt für die Planung, None = voller Kontext (gemessene Größen aus dem Promptset gelten)."""
+    return prompt_for(entry) if PROMPT_MODE == "retrieval" else None
+
+def load_options(entry, model_name):
+    """Modell-Optionen der ersten Frage eines Modells, damit der Scheduler mit demselben num_ctx lädt."""
+    return dict(CONFIG_OPTIONS, num_ctx=context_plan(entry, model_name)["num_ctx"])
+
+def order_questions(questions, model_name=None):
+    """
+    Sortiert die Fragen nach SCHEDULING und markiert, ob der System-Prompt
+    mit dem der vorherigen Frage identisch ist (möglicher Prompt-Cache-Treffer).
+    Mit TRIALS > 1 kommt jede Frage mehrfach in gemischter Reihenfolge vor.
+    Mit CONTEXT_PLANNING zusätzlich stabil nach num_ctx-Stufe (jeder Wechsel lädt das Modell neu).
+    Gibt eine Liste von (frage, shared_prefix) zurück.
+    """
+    if SCHEDULING == "grouped":
+        # Gruppen in der Reihenfolge ihres ersten Auftretens, innerhalb der Gruppe Promptset-Reihenfolge
+        groups = {}
+        for entry in questions:
+            groups.setdefault(prompt_for(entry), []).append(entry)
+        ordered = [entry for group in groups.values() for entry in group]
+    elif SCHEDULING == "shuffled":
+        ordered = list(questions)
+        random.Random(SHUFFLE_SEED).shuffle(ordered)
+    else:
+        ordered = list(questions)
+
+    if TRIALS > 1:
+        ordered = expand_trials(ordered, TRIALS, f"{TRIAL_SEED}:{model_name}")
+
+    if CONTEXT_PLANNING and model_name:
+        ordered.sort(key=lambda entry: context_plan(entry, model_name)["num_ctx"])
+
+    scheduled = []
+    previous_prompt = None
+    for entry in ordered:
+        system_prompt = prompt_for(entry)
+        scheduled.append((entry, system_prompt == previous_prompt))
+        previous_prompt = system_prompt
+    return scheduled
+
+def ask_question(entry, model_name, shared_prefix=False, submitted_at=None):
+    """
+    Schickt eine Frage an das Modell und baut daraus die CSV-Zeile.
+    Gibt (zeile, client_zeit) zurück, zeile ist None wenn keine Antwort kam.
+    Die Zeiten in der Zeile stammen vom Ollama-Server und gelten pro Anfrage,
+    auch wenn mehrere Anfragen gleichzeitig laufen.
+    """
+    question_text = entry.get("question")
+    context_text = entry.get("context_text", "")
+
+    # System Prompt (einmal pro Kontext gerendert, mit Retrieval einmal pro Frage)
+    system_message = prompt_for(entry)
+    plan = context_plan(entry, model_name)
+    options = dict(CONFIG_OPTIONS, num_ctx=plan["num_ctx"])
+
+    chat_messages = [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": question_text}
+    ]
+
+    # --- API AUFRUF ---
+    start_time = time.perf_counter()
+    # Im Modus "parallel": Zeit, die die Frage im Worker-Pool gewartet hat
+    pool_wait = start_time - submitted_at if submitted_at is not None else 0.0
+    response = OllamaApi.chat(chat_messages, model=model_name, options=options, stream=STREAM_METRICS,
+                              cache=False if TRIALS > 1 else None)
+    client_time = time.perf_counter() - start_time
+
+    if not response or "result" not in response:
+        return None, client_time
+
+    # --- DATEN VORBEREITEN ---
+    # Werte aus der API holen (mit Fallback auf 0.0)
+    t_total = float(response.get("time", 0))
+    t_read = float(response.get("time_read", 0))
+    t_write = float(response.get("time_write", 0))
+    t_load = float(response.get("time_load", 0))
+
+    in_tok = int(response.get("input_token", 0))
+    out_tok = int(response.get("token", 0))
+
+    # Speed berechnen (Tokens pro Sekunde)
+    # Schutz vor "Division durch Null", falls Zeiten extrem klein sind
+    speed_read = in_tok / t_read if t_read > 0 else 0
+    speed_write = out_tok / t_write if t_write > 0 else 0
+
+    row = {
+        "id": entry.get("id"),
+        "category": entry.get("category"),
+        "model": result_model(model_name),
+        # Zeiten auf 3 Nachkommastellen runden
+        "time_total": f"{t_total:.3f}",
+        "time_read": f"{t_read:.3f}",
+        "time_write": f"{t_write:.3f}",
+        "input_tokens": in_tok,
+        "output_tokens": out_tok,
+        # Speed auf 2 Nachkommastellen runden
+        "tps_read": f"{speed_read:.2f}",
+        "tps_write": f"{speed_write:.2f}",
+        "question": question_text,
+        "model_answer": response["result"],
+        "ground_truth": entry.get("ground_truth", ""),
+        "context_snippet": context_text[:50] + "..." if context_text else "EMPTY"
+    }
+
+    if STREAM_METRICS:
+        row["time_first_token"] = f"{float(response.get('time_first_token', 0)):.3f}"
+        for name in ("itl_p50", "itl_p95", "itl_p99", "jitter"):
+            # Inter-Token-Latenzen in Millisekunden
+            row[f"{name}_ms"] = f"{float(response.get(name, 0)) * 1000:.2f}"
+
+    # Wird nur geschrieben, wenn die Datei die Spalten hat (SCHEDULING != "promptset")
+    row["schedule"] = SCHEDULING
+    row["shared_prefix"] = int(shared_prefix)
+    row["cached"] = int(bool(response.get("cached", False)))
+    row["time_load"] = f"{t_load:.3f}"
+    row["endpoint"] = response.get("endpoint", "")
+    row["num_ctx"] = plan["num_ctx"]
+    row["ctx_truncated"] = int(is_truncated(plan, in_tok))
+    row["ctx_at_risk"] = int(is_at_risk(plan, in_tok))
+    row["prompt_mode"] = PROMPT_MODE
+    if PROMPT_MODE == "retrieval":
+        from retrieval import get_retriever
+        row["retrieved_chunks"] = get_retriever(INPUT_FILE).chunk_labels(entry)
+    row["full_input_tokens"] = entry.get("prompt_tokens", {}).get(model_name) or entry.get("estimated_tokens", "")
+    row["context_hash"] = entry.get("context_hash") or content_hash(context_text)
+    row["template_hash"] = template_hash()
+
+    if RECORD_CLIENT_TIMINGS:
+        for name in CLIENT_FIELDNAMES:
+            value = float(response.get(name, 0))
+            if name == "client_queue":
+                value += pool_wait
+            row[name] = f"{value * 1000:.2f}"
+
+    return row, client_time
+
+def print_issues(row):
+    """Prüft die gerade geschriebene Zeile mit denselben Regeln wie check_data.py."""
+    issues = check_row(row)
+    if issues:
+        print(f" [PRÜFUNG: {', '.join(issues)}] ", end="")
+    if row.get("ctx_truncated"):
+        print(f" [KONTEXT ABGESCHNITTEN: {row['input_tokens']} Tokens bei num_ctx {row['num_ctx']}] ", end="")
+    elif row.get("ctx_at_risk"):
+        print(f" [KONTEXT KNAPP: {row['input_tokens']} Tokens bei num_ctx {row['num_ctx']}] ", end="")
+
+def count_issues(rows):
+    counts = {}
+    for row in rows:
+        for issue in check_row(row):
+            counts[issue] = counts.get(issue, 0) + 1
+    return counts
+
+def run_sequential(scheduled, model_name, writer, csvfile, on_progress=None):
+    """
+    Originalverhalten: eine Anfrage nach der anderen.
+    Gibt die Summe der Client-Zeiten und die geschriebenen Zeilen zurück.
+    on_progress(i) wird vor jeder Frage aufgerufen.
+    """
+    client_time_sum = 0.0
+    rows = []
+
+    # 4. INNERER LOOP: Durch die Fragen iterieren
+    for i, (entry, shared_prefix) in enumerate(scheduled):
+        if on_progress is not None:
+            on_progress(i)
+        print(f"\r   [STATUS] Frage {i+1}/{len(scheduled)} (ID: {entry.get('id')}) an {model_name}...", end="", flush=True)
+
+        try:
+            row, client_time = ask_question(entry, model_name, shared_prefix)
+            client_time_sum += client_time
+
+            if row is not None:
+                # --- IN CSV SCHREIBEN ---
+                writer.writerow(row)
+                rows.append(row)
+                csvfile.flush() # Sofort speichern
+                print_issues(row)
+            else:
+                print(" [KEINE ANTWORT] ", end="")
+
+        except Exception as e:
+            print(f" [FEHLER: {e}] ", end="")
+
+        # Kurze Pause für Server-Stabilität
+        time.sleep(PAUSE_BETWEEN_REQUESTS)
+
+    return client_time_sum, rows
+
+def run_parallel(scheduled, model_name, writer, csvfile, on_progress=None):
+    """
+    Worker-Pool mit höchstens MAX_IN_FLIGHT_PER_MODEL gleichzeitigen Anfragen.
+    Die Ergebnisse werden in der geplanten Reihenfolge geschrieben,
+    damit die CSV identisch zum sequentiellen Lauf sortiert ist.
+    on_progress(i) wird aufgerufen, bevor das Ergebnis der i-ten Frage abgeholt wird.
+    """
+    client_time_sum = 0.0
+    rows = []
+
+    with ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT_PER_MODEL) as executor:
+        futures = [executor.submit(ask_question, entry, model_name, shared_prefix, time.perf_counter())
+                   for entry, shared_prefix in scheduled]
+
+        # In Reihenfolge abholen: wartet jeweils auf die nächste Frage, spätere laufen weiter
+        for i, ((entry, _), future) in enumerate(zip(scheduled, futures)):
+            if on_progress is not None:
+                on_progress(i)
+            print(f"\r   [STATUS] Frage {i+1}/{len(scheduled)} (ID: {entry.get('id')}) an {model_name}...", end="", flush=True)
+
+            try:
+                row, client_time = future.result()
+                client_time_sum += client_time
+
+                if row is not None:
+                    writer.writerow(row)
+                    rows.append(row)
+                    csvfile.flush()
+                    print_issues(row)
+                else:
+                    print(" [KEINE ANTWORT] ", end="")
+
+            except Exception as e:
+                print(f" [FEHLER: {e}] ", end="")
+
+    return client_time_sum, rows
+
+def read_time_stats(rows):
+    """
+    Mittelwerte von time_read und tps_read, getrennt nach Fragen mit und ohne geteiltem Prompt-Präfix.
+    Antworten aus dem Cache sind keine neue Messung und werden ausgelassen.
+    """
+    rows = [r for r in rows if not r.get("cached")]
+
+    def means(selected):
+        if not selected:
+            return {"count": 0, "time_read": None, "tps_read": None}
+        return {
+            "count": len(selected),
+            "time_read": round(sum(float(r["time_read"]) for r in selected) / len(selected), 4),
+            "tps_read": round(sum(float(r["tps_read"]) for r in selected) / len(selected), 2)
+        }
+
+    return {
+        "all": means(rows),
+        "shared_prefix": means([r for r in rows if r.get("shared_prefix")]),
+        "new_prefix": means([r for r in rows if not r.get("shared_prefix")])
+    }
+
+def input_token_stats(rows):
+    """Mittlere input_tokens und (mit Retrieval) Prompt-Größe mit vollem Kontext auf denselben Fragen."""
+    rows = [r for r in rows if not r.get("cached")]
+    if not rows:
+        return {"mean": None, "full": None, "reduction": None}
+    mean = sum(int(r["input_tokens"]) for r in rows) / len(rows)
+    full = [int(r["full_input_tokens"]) for r in rows if r.get("full_input_tokens")]
+    if PROMPT_MODE == "full" or len(full) != len(rows):
+        return {"mean": round(mean, 1), "full": None, "reduction": None}
+    full_mean = sum(full) / len(full)
+    return {"mean": round(mean, 1), "full": round(full_mean, 1), "reduction": round(1 - mean / full_mean, 3)}
+
+def write_run_summary(summary):
+    """Hängt eine Zusammenfassung des Durchlaufs als JSON-Zeile an RUN_SUMMARY_FILE an."""
+    try:
+        with open(RUN_SUMMARY_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"[WARNUNG] Zusammenfassung konnte nicht gespeichert werden: {e}")
+
+def print_scheduling_report():
     """
-    Erstellt den System-Prompt.
-    Definiert die Rolle, Rejection-Logik und Sprache.
+    Vergleicht den jeweils letzten "grouped"- und "shuffled"-Lauf pro Modell aus RUN_SUMMARY_FILE
+    und zeigt den Unterschied bei time_read/tps_read (Effekt des Prompt-Caches).
     """
-    return (
-        "Du bist ein strikter Regel-Analyst für die National Football League (NFL). "
-        "Deine Aufgabe ist es, Fragen ausschließlich basierend auf dem untenstehenden Kontext zu beantworten.\n\n"
-        "Befolge strikt diese Anweisungen:\n"
-        "1. **Wissensbegrenzung:** Nutze NUR Informationen aus dem Abschnitt 'KONTEXT'. Greife NICHT auf dein internes Trainingswissen zurück.\n"
-        "2. **Rejection:** Wenn die Antwort auf die Frage nicht eindeutig im Kontext steht, antworte exakt mit: 'Dazu habe ich keine Informationen.' (Erfinde nichts!).\n"
-        "3. **Sprache:** Antworte in deutscher Sprache. Behalte englische Fachbegriffe (z.B. 'Touchdown', 'Fumble', 'Line of Scrimmage') bei, da diese im deutschen American Football Standard sind.\n"
-        "4. **Präzision:** Antworte direkt und faktenbasiert. Vermeide Einleitungen wie 'Laut dem Text...'.\n\n"
-        f"KONTEXT:\n{context_text}"
-    )
+    if not os.path.exists(RUN_SUMMARY_FILE):
+        return
+
+    latest = {}
+    with open(RUN_SUMMARY_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                summary = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            for model in summary.get("models", []):
+                if "read_stats" in model:
+                    latest[(summary.get("scheduling"), model["model"])] = model["read_stats"]["all"]
+
+    models = sorted({model for mode, model in latest if mode == "grouped"} & {model for mode, model in latest if mode == "shuffled"})
+    if not models:
+        return
+
+    print("\n[INFO] Prompt-Cache-Effekt (letzter grouped- vs. shuffled-Lauf):")
+    for model in models:
+        grouped = latest[("grouped", model)]
+        shuffled = latest[("shuffled", model)]
+        if not grouped["count"] or not shuffled["count"]:
+            continue
+        diff_read = grouped["time_read"] - shuffled["time_read"]
+        diff_tps = grouped["tps_read"] - shuffled["tps_read"]
+        print(f"   {model}: time_read {grouped['time_read']:.3f}s vs. {shuffled['time_read']:.3f}s ({diff_read:+.3f}s), "
+              f"tps_read {grouped['tps_read']:.1f} vs. {shuffled['tps_read']:.1f} ({diff_tps:+.1f})")
+
+def print_trial_overview(overview):
+    print(f"\n[INFO] Wiederholungsmessung ({TRIALS} pro Frage, Kennzahlen pro Paar in {TRIAL_SUMMARY_FILE}):")
+    for model, m in overview.items():
+        def fmt(value, unit=""):
+            return "-" if value is None else f"{value:.3f}{unit}"
+        print(f"   {model}: time_total kalt {fmt(m['cold_time_total'], 's')}, warm {fmt(m['warm_time_total'], 's')} "
+              f"(Median über {m['pairs']} Paare), CV time_total {fmt(m['time_total_cv'])}, CV tps_write {fmt(m['tps_write_cv'])}")
 
 # --- HAUPTPROGRAMM ---
 
@@ -47,123 +535,221 @@ def run_benchmark():
         print(f"[FEHLER] Datei '{INPUT_FILE}' nicht gefunden.")
         return
 
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
-        questions = json.load(f)
+    if EXECUTION_MODE not in ("sequential", "parallel"):
+        print(f"[FEHLER] Unbekannter EXECUTION_MODE '{EXECUTION_MODE}'.")
+        return
+
+    if SCHEDULING not in ("promptset", "grouped", "shuffled"):
+        print(f"[FEHLER] Unbekanntes SCHEDULING '{SCHEDULING}'.")
+        return
+
+    if PROMPT_MODE not in ("full", "retrieval"):
+        print(f"[FEHLER] Unbekannter PROMPT_MODE '{PROMPT_MODE}'.")
+        return
+
+    # Übersetztes Promptset (promptset_store.py): Kontexte einmal pro Hash, Prompt-Größen pro Modell
+    questions = load_questions(INPUT_FILE)
+
+    OllamaApi.CACHE_ENABLED = USE_RESPONSE_CACHE
+    OllamaApi.CACHE_REFRESH = REFRESH_RESPONSE_CACHE
+    OllamaApi.ENDPOINTS = OLLAMA_ENDPOINTS
+    if USE_MODEL_SCHEDULER:
+        # Jede Frage setzt keep_alive neu, sonst würde das Modell nach OllamaApi.KEEP_ALIVE ohne Anfrage entladen
+        OllamaApi.KEEP_ALIVE = LOAD_KEEP_ALIVE
+
+    run_id = RUN_ID or time.strftime("%Y%m%d-%H%M%S")
+    if RESULT_STORE:
+        from result_store import append_rows, RESULTS_DIR
 
     # 2. CSV vorbereiten
     # Semikolon (;) als Trennzeichen für Excel-Kompatibilität
-    file_exists = os.path.exists(OUTPUT_FILE)
-
-    fieldnames = [
-        "id",
-        "category",
-        "model",
-        "time_total", "time_read", "time_write", # Detaillierte Zeiten
-        "input_tokens", "output_tokens",
-        "tps_read", "tps_write",
-        "question",
-        "model_answer",
-        "ground_truth",
-        "context_snippet"
-    ]
+    completed = set()
+    if RESUME:
+        repair_partial_write(OUTPUT_FILE)
+        completed = load_completed_pairs(OUTPUT_FILE)
+
+    file_exists = os.path.exists(OUTPUT_FILE) and os.path.getsize(OUTPUT_FILE) > 0
+
+    # Ohne die Spalten (z.B. cached, num_ctx, prompt_mode) wären neue Zeilen nicht von den alten zu unterscheiden.
+    # Abbruch nur, wenn wirklich neue Zeilen geschrieben würden.
+    missing = missing_columns(file_exists)
+    has_work = any(pending_questions(questions, result_model(m), completed) for m in MODELS_TO_TEST)
+    if missing and has_work:
+        print(f"[FEHLER] '{OUTPUT_FILE}' hat keine Spalten für {missing}. "
+              f"Bitte ein anderes OUTPUT_FILE für diese Einstellungen wählen.")
+        return
+
+    run_summary = {
+        "started": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "output_file": OUTPUT_FILE,
+        "execution_mode": EXECUTION_MODE,
+        "max_in_flight_per_model": MAX_IN_FLIGHT_PER_MODEL if EXECUTION_MODE == "parallel" else 1,
+        "stream_metrics": STREAM_METRICS,
+        "scheduling": SCHEDULING,
+        "response_cache": USE_RESPONSE_CACHE,
+        "resume": RESUME,
+        "endpoints": OllamaApi.endpoints(),
+        "client_timings": RECORD_CLIENT_TIMINGS,
+        "run_id": run_id if RESULT_STORE else None,
+        "context_planning": CONTEXT_PLANNING,
+        "trials": TRIALS,
+        "prompt_mode": PROMPT_MODE,
+        "models": []
+    }
 
     # Datei im Append-Modus öffnen (falls Skript abbricht, bleiben Daten erhalten)
     with open(OUTPUT_FILE, "a", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-
-        if not file_exists:
-            writer.writeheader()
+        writer = create_writer(csvfile, file_exists)
+        trial_writer = None
+        if TRIALS > 1:
+            trial_writer = TrialWriter(writer, TRIALS_FILE, run_id, LOAD_POLLUTION_THRESHOLD)
+            writer = trial_writer
 
         print("-" * 60)
         print(f"[INFO] START BENCHMARK")
         print(f"[INFO] Fragen: {len(questions)}")
         print(f"[INFO] Modelle: {MODELS_TO_TEST}")
+        print(f"[INFO] Modus: {EXECUTION_MODE}, Reihenfolge: {SCHEDULING}, Prompt: {PROMPT_MODE}")
+        if TRIALS > 1:
+            print(f"[INFO] Wiederholungen: {TRIALS} pro Frage (Messungen in {TRIALS_FILE})")
         print(f"[INFO] Output: {OUTPUT_FILE}")
+        for model_name in MODELS_TO_TEST:
+            sizes = [entry.get("prompt_tokens", {}).get(model_name) or entry.get("estimated_tokens", 0)
+                     for entry in questions]
+            if sizes:
+                print(f"[INFO] Prompt-Größe {model_name}: bis {max(sizes)} Tokens (num_ctx {CONFIG_OPTIONS.get('num_ctx')})")
+        if CONTEXT_PLANNING:
+            run_summary["context_plan"] = plan_report(questions, MODELS_TO_TEST, CONFIG_OPTIONS.get("num_ctx"),
+                                                      rendered_prompt)
+            print_report(run_summary["context_plan"])
+        else:
+            for model_name in MODELS_TO_TEST:
+                at_risk = [str(entry.get("id")) for entry in questions if context_plan(entry, model_name)["at_risk"]]
+                if at_risk:
+                    print(f"[WARNUNG] {model_name}: {len(at_risk)} Fragen passen mit Antwort nicht in num_ctx "
+                          f"{CONFIG_OPTIONS.get('num_ctx')}: {', '.join(at_risk[:15])}")
+        if OLLAMA_ENDPOINTS:
+            for endpoint, ok in OllamaApi.health_check().items():
+                print(f"[INFO] Server {endpoint}: {'erreichbar' if ok else 'NICHT ERREICHBAR'}")
+        if completed:
+            print(f"[INFO] Bereits erledigt (werden übersprungen): {len(completed)} Paare")
         print("-" * 60)
 
-        # 3. ÄUßERER LOOP: Durch die Modelle iterieren
+        # Nur Modelle mit offenen Fragen einplanen
+        work = []
         for model_name in MODELS_TO_TEST:
-            print(f"\n[INFO] Lade Modell: {model_name}...")
-
-            # Warm-Up Call (Modell in VRAM laden)
-            try:
-                OllamaApi.chat([{"role": "user", "content": "Hi"}], model=model_name)
-                print("   [INFO] Modell bereit.")
-            except Exception as e:
-                print(f"   [FEHLER] Konnte Modell {model_name} nicht laden: {e}")
+            pending = pending_questions(questions, result_model(model_name), completed)
+            if not pending:
+                print(f"\n[INFO] {model_name}: alle Fragen bereits erledigt, wird übersprungen.")
                 continue
+            work.append((model_name, order_questions(pending, model_name)))
 
-            # 4. INNERER LOOP: Durch die Fragen iterieren
-            for i, entry in enumerate(questions):
-                q_id = entry.get("id")
-                category = entry.get("category")
-                question_text = entry.get("question")
-                context_text = entry.get("context_text", "")
-                ground_truth = entry.get("ground_truth", "")
-
-                # System Prompt bauen
-                system_message = build_system_prompt(context_text)
+        scheduler = ModelScheduler() if USE_MODEL_SCHEDULER else None
+        previous_model = None
 
-                chat_messages = [
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": question_text}
-                ]
+        # 3. ÄUßERER LOOP: Durch die Modelle iterieren
+        for index, (model_name, scheduled) in enumerate(work):
+            next_model, next_scheduled = work[index + 1] if index + 1 < len(work) else (None, None)
 
-                print(f"\r   [STATUS] Frage {i+1}/{len(questions)} (ID: {q_id}) an {model_name}...", end="", flush=True)
+            print(f"\n[INFO] Lade Modell: {model_name}... ({len(scheduled)} offene Fragen)")
 
+            load_metrics = None
+            if scheduler is not None:
+                # Vorheriges Modell explizit entladen, Ladezeit separat messen
+                load_metrics = scheduler.activate(model_name, previous_model, load_options(scheduled[0][0], model_name))
+                previous_model = model_name
+                if not load_metrics.get("ok"):
+                    print(f"   [FEHLER] Konnte Modell {model_name} nicht laden.")
+                    continue
+                print(f"   [INFO] Modell bereit (Ladezeit {load_metrics['load_wall_time']:.1f}s, "
+                      f"Wartezeit {load_metrics['wait_time']:.1f}s, vorgeladen: {'ja' if load_metrics['preloaded'] else 'nein'}).")
+            else:
+                # Warm-Up Call (Modell in VRAM laden)
                 try:
-                    # --- API AUFRUF ---
-                    response = OllamaApi.chat(chat_messages, model=model_name, options=CONFIG_OPTIONS)
-
-                    if response and "result" in response:
-
-                        # --- DATEN VORBEREITEN ---
-                        # Werte aus der API holen (mit Fallback auf 0.0)
-                        t_total = float(response.get("time", 0))
-                        t_read = float(response.get("time_read", 0))
-                        t_write = float(response.get("time_write", 0))
-
-                        in_tok = int(response.get("input_token", 0))
-                        out_tok = int(response.get("token", 0))
-
-                        # Speed berechnen (Tokens pro Sekunde)
-                        # Schutz vor "Division durch Null", falls Zeiten extrem klein sind
-                        speed_read = in_tok / t_read if t_read > 0 else 0
-                        speed_write = out_tok / t_write if t_write > 0 else 0
-
-                        # --- IN CSV SCHREIBEN ---
-                        writer.writerow({
-                            "id": q_id,
-                            "category": category,
-                            "model": model_name,
-                            # Zeiten auf 3 Nachkommastellen runden
-                            "time_total": f"{t_total:.3f}",
-                            "time_read": f"{t_read:.3f}",
-                            "time_write": f"{t_write:.3f}",
-                            "input_tokens": in_tok,
-                            "output_tokens": out_tok,
-                            # Speed auf 2 Nachkommastellen runden
-                            "tps_read": f"{speed_read:.2f}",
-                            "tps_write": f"{speed_write:.2f}",
-                            "question": question_text,
-                            "model_answer": response["result"],
-                            "ground_truth": ground_truth,
-                            "context_snippet": context_text[:50] + "..." if context_text else "EMPTY"
-                        })
-                        csvfile.flush() # Sofort speichern
-                    else:
-                        print(" [KEINE ANTWORT] ", end="")
-
+                    OllamaApi.chat([{"role": "user", "content": "Hi"}], model=model_name, cache=False)
+                    print("   [INFO] Modell bereit.")
                 except Exception as e:
-                    print(f" [FEHLER: {e}] ", end="")
+                    print(f"   [FEHLER] Konnte Modell {model_name} nicht laden: {e}")
+                    continue
+
+            def on_progress(i, next_model=next_model, next_scheduled=next_scheduled, total=len(scheduled)):
+                # Nächstes Modell während der letzten Fragen vorladen
+                if scheduler is not None and next_model and i == max(0, total - PRELOAD_TAIL):
+                    scheduler.preload(next_model, load_options(next_scheduled[0][0], next_model))
+
+            wall_start = time.perf_counter()
+            if EXECUTION_MODE == "parallel":
+                client_time_sum, rows = run_parallel(scheduled, model_name, writer, csvfile, on_progress)
+            else:
+                client_time_sum, rows = run_sequential(scheduled, model_name, writer, csvfile, on_progress)
+            wall_time = time.perf_counter() - wall_start
 
-                # Kurze Pause für Server-Stabilität
-                time.sleep(0.2)
+            if trial_writer is not None:
+                # Nur die erste Antwort pro Paar, wie in OUTPUT_FILE
+                rows_to_store = [r for r in trial_writer.first_rows if r["model"] == result_model(model_name)]
+            else:
+                rows_to_store = rows
+            if RESULT_STORE and rows_to_store:
+                append_rows(rows_to_store, run_id)
+
+            # Geschätzte Dauer des sequentiellen Loops: alle Anfragen hintereinander plus Pausen.
+            # Im Modus "parallel" enthalten die Client-Zeiten das Warten hinter den anderen Anfragen,
+            # daher zählt dort die Summe der Serverzeiten (time_total)
+            server_time_sum = sum(float(r["time_total"]) for r in rows)
+            request_time_sum = server_time_sum if EXECUTION_MODE == "parallel" else client_time_sum
+            sequential_estimate = request_time_sum + PAUSE_BETWEEN_REQUESTS * len(scheduled)
+            saved = sequential_estimate - wall_time
+
+            run_summary["models"].append({
+                "model": result_model(model_name),
+                "questions": len(scheduled),
+                "wall_time": round(wall_time, 3),
+                "client_time_sum": round(client_time_sum, 3),
+                "server_time_sum": round(server_time_sum, 3),
+                "sequential_estimate": round(sequential_estimate, 3),
+                "time_saved": round(saved, 3),
+                "read_stats": read_time_stats(rows),
+                "load": load_metrics,
+                "questions_with_load": sum(1 for r in rows if float(r["time_load"]) > LOAD_POLLUTION_THRESHOLD),
+                "check_issues": count_issues(rows),
+                "ctx_truncated": sum(1 for r in rows if r.get("ctx_truncated")),
+                "ctx_at_risk": sum(1 for r in rows if r.get("ctx_at_risk")),
+                "num_ctx_switches": sum(1 for a, b in zip(rows, rows[1:]) if a["num_ctx"] != b["num_ctx"]),
+                "input_tokens": input_token_stats(rows)
+            })
 
             print(f"\n   [INFO] Durchlauf für {model_name} beendet.")
+            print(f"   [INFO] Laufzeit: {wall_time:.1f}s (sequentiell geschätzt: {sequential_estimate:.1f}s, gespart: {saved:.1f}s)")
+            tokens = run_summary["models"][-1]["input_tokens"]
+            if PROMPT_MODE != "full" and tokens["full"]:
+                print(f"   [INFO] Input-Tokens: {tokens['mean']:.0f} statt {tokens['full']:.0f} mit vollem Kontext "
+                      f"({tokens['reduction'] * 100:.0f}% weniger)")
+
+        if scheduler is not None and previous_model:
+            scheduler.release(previous_model)
+
+        if trial_writer is not None:
+            trial_writer.close()
+            trial_summary = summarize_trials(trial_writer.samples)
+            write_summary(TRIAL_SUMMARY_FILE, trial_summary)
+            run_summary["trial_overview"] = model_overview(trial_summary)
+            print_trial_overview(run_summary["trial_overview"])
+
+    if OLLAMA_ENDPOINTS:
+        run_summary["endpoint_stats"] = OllamaApi.endpoint_stats()
+
+    if USE_RESPONSE_CACHE:
+        run_summary["cache"] = OllamaApi.cache_stats()
+        print(f"\n[INFO] Antwort-Cache: {run_summary['cache']['hits']} Treffer, {run_summary['cache']['misses']} neue Anfragen")
+
+    write_run_summary(run_summary)
+    print_scheduling_report()
 
     print("\n[INFO] ALLE TESTS ABGESCHLOSSEN.")
     print(f"[INFO] Ergebnisse gespeichert in: {OUTPUT_FILE}")
+    print(f"[INFO] Laufzeit-Zusammenfassung in: {RUN_SUMMARY_FILE}")
+    if RESULT_STORE:
+        print(f"[INFO] Parquet-Speicher: {RESULTS_DIR} (Lauf '{run_id}')")
 
 if __name__ == "__main__":
     run_benchmark()
\ No newline at end of file
@@ -4,6 +4,9 @@ import time
 import os
 from dotenv import load_dotenv
 from openai import OpenAI
+from benchmark_engine import build_system_prompt, FIELDNAMES
+from rate_limiter import RateLimiter, call_with_backoff, estimate_tokens
+from resume_index import repair_partial_write, load_completed_pairs, pending_questions
 
 # 1. API Key laden
 load_dotenv()
@@ -14,6 +17,18 @@ INPUT_FILE = "promptset.json"
 OUTPUT_FILE = "benchmark_results_chatgpt.csv"
 MODEL_NAME = "gpt-5-mini"
 
+# Rate Limits (an das eigene OpenAI-Kontingent anpassen)
+# Ersetzt den pauschalen Sleep: bei 429/503 wird mit Backoff wiederholt und die Rate gesenkt
+RPM_LIMIT = 500
+TPM_LIMIT = 200000
+EXPECTED_OUTPUT_TOKENS = 300    # Für die Token-Schätzung vor der Anfrage
+
+# Fortsetzen: erledigte (id, model)-Paare aus OUTPUT_FILE und RESUME_FILES werden übersprungen
+RESUME = True
+RESUME_FILES = [
+    "benchmark_results_chatgpt_ohne_duplikat.csv",
+]
+
 # Einstellungen
 PARAMS = {
     # Es werden nur die Defaultwerte für "temperature" und "top_p" unterstützt.
@@ -21,18 +36,6 @@ PARAMS = {
     "reasoning_effort": "minimal"
 }
 
-def build_system_prompt(context_text):
-    return (
-        "Du bist ein strikter Regel-Analyst für die National Football League (NFL). "
-        "Deine Aufgabe ist es, Fragen ausschließlich basierend auf dem untenstehenden Kontext zu beantworten.\n\n"
-        "Befolge strikt diese Anweisungen:\n"
-        "1. **Wissensbegrenzung:** Nutze NUR Informationen aus dem Abschnitt 'KONTEXT'. Greife NICHT auf dein internes Trainingswissen zurück.\n"
-        "2. **Rejection:** Wenn die Antwort auf die Frage nicht eindeutig im Kontext steht, antworte exakt mit: 'Dazu habe ich keine Informationen.' (Erfinde nichts!).\n"
-        "3. **Sprache:** Antworte in deutscher Sprache. Behalte englische Fachbegriffe (z.B. 'Touchdown', 'Fumble', 'Line of Scrimmage') bei, da diese im deutschen American Football Standard sind.\n"
-        "4. **Präzision:** Antworte direkt und faktenbasiert. Vermeide Einleitungen wie 'Laut dem Text...'.\n\n"
-        f"KONTEXT:\n{context_text}"
-    )
-
 def run_benchmark():
     if not os.path.exists(INPUT_FILE):
         print(f"[FEHLER] Datei '{INPUT_FILE}' fehlt.")
@@ -41,29 +44,36 @@ def run_benchmark():
     with open(INPUT_FILE, "r", encoding="utf-8") as f:
         questions = json.load(f)
 
-    fieldnames = [
-        "id", "category", "model",
-        "time_total", "time_read", "time_write",
-        "input_tokens", "output_tokens",
-        "tps_read", "tps_write",
-        "question", "model_answer", "ground_truth", "context_snippet"
-    ]
-
-    file_exists = os.path.exists(OUTPUT_FILE)
+    if RESUME:
+        repair_partial_write(OUTPUT_FILE)
+        completed = load_completed_pairs(OUTPUT_FILE, *RESUME_FILES)
+        skipped = len(questions)
+        questions = pending_questions(questions, MODEL_NAME, completed)
+        skipped -= len(questions)
+        if skipped:
+            print(f"[INFO] {skipped} Fragen bereits erledigt, {len(questions)} offen.")
+        if not questions:
+            print("[INFO] Nichts zu tun.")
+            return
+
+    file_exists = os.path.exists(OUTPUT_FILE) and os.path.getsize(OUTPUT_FILE) > 0
     with open(OUTPUT_FILE, "a", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
         if not file_exists:
             writer.writeheader()
 
         print(f"[INFO] Starte Benchmark mit {MODEL_NAME}...")
 
+        limiter = RateLimiter(rpm=RPM_LIMIT, tpm=TPM_LIMIT)
+
         for i, entry in enumerate(questions):
             q_id = entry.get("id")
             print(f"\r[STATUS] Frage {i+1}/{len(questions)} (ID: {q_id})...", end="", flush=True)
 
             sys_prompt = build_system_prompt(entry.get("context_text", ""))
 
-            try:
+            def ask():
+                # Zeit nur für den erfolgreichen Versuch messen, nicht für Backoff-Wartezeiten
                 start_time = time.time()
 
                 response = client.chat.completions.create(
@@ -76,14 +86,19 @@ def run_benchmark():
                 )
 
                 end_time = time.time()
+                return response, end_time - start_time
+
+            try:
+                estimated = estimate_tokens(sys_prompt, entry.get("question")) + EXPECTED_OUTPUT_TOKENS
+                response, duration = call_with_backoff(ask, limiter, tokens=estimated)
 
                 # Metriken
-                duration = end_time - start_time
                 usage = response.usage
                 in_tok = usage.prompt_tokens
                 out_tok = usage.completion_tokens
                 content = response.choices[0].message.content
                 tps_total = out_tok / duration if duration > 0 else 0
+                limiter.record_usage(estimated, in_tok + out_tok)
 
                 writer.writerow({
                     "id": q_id,
@@ -106,8 +121,7 @@ def run_benchmark():
             except Exception as e:
                 print(f" [FEHLER: {e}] ", end="")
 
-            # PAUSCHALER SLEEP (Sicherheit vor Rate Limits)
-            time.sleep(10)
+        print(f"\n[INFO] Rate Limiter: {limiter.stats()}")
 
     print(f"\n[INFO] Fertig. Gespeichert in {OUTPUT_FILE}")
 
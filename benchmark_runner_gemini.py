@@ -6,6 +6,9 @@ from dotenv import load_dotenv
 
 from google import genai
 from google.genai import types
+from benchmark_engine import build_system_prompt, FIELDNAMES
+from rate_limiter import RateLimiter, call_with_backoff, estimate_tokens
+from resume_index import repair_partial_write, load_completed_pairs, pending_questions
 
 # 1. API Key laden
 load_dotenv()
@@ -22,23 +25,26 @@ INPUT_FILE = "promptset.json"
 OUTPUT_FILE = "benchmark_results_gemini_erweiterung4.csv"
 MODEL_NAME = "gemini-3-flash-preview"
 
+# Rate Limits (an das eigene Gemini-Kontingent anpassen)
+# Bei 429/503 (z.B. UNAVAILABLE) wird mit Backoff wiederholt, erst danach eine ERROR-Zeile geschrieben
+RPM_LIMIT = 60
+TPM_LIMIT = 250000
+EXPECTED_OUTPUT_TOKENS = 300    # Für die Token-Schätzung vor der Anfrage
+
+# Fortsetzen: erledigte (id, model)-Paare aus OUTPUT_FILE und den früheren Teil-Läufen werden übersprungen
+RESUME = True
+RESUME_FILES = [
+    "benchmark_results_gemini.csv",
+    "benchmark_results_gemini_erweiterung.csv",
+    "benchmark_results_gemini_erweiterung2.csv",
+    "benchmark_results_gemini_erweiterung3.csv",
+]
+
 generate_config = types.GenerateContentConfig(
     temperature=0.0,
     top_p=0.9
 )
 
-def build_system_prompt(context_text):
-    return (
-        "Du bist ein strikter Regel-Analyst für die National Football League (NFL). "
-        "Deine Aufgabe ist es, Fragen ausschließlich basierend auf dem untenstehenden Kontext zu beantworten.\n\n"
-        "Befolge strikt diese Anweisungen:\n"
-        "1. **Wissensbegrenzung:** Nutze NUR Informationen aus dem Abschnitt 'KONTEXT'. Greife NICHT auf dein internes Trainingswissen zurück.\n"
-        "2. **Rejection:** Wenn die Antwort auf die Frage nicht eindeutig im Kontext steht, antworte exakt mit: 'Dazu habe ich keine Informationen.' (Erfinde nichts!).\n"
-        "3. **Sprache:** Antworte in deutscher Sprache. Behalte englische Fachbegriffe (z.B. 'Touchdown', 'Fumble', 'Line of Scrimmage') bei, da diese im deutschen American Football Standard sind.\n"
-        "4. **Präzision:** Antworte direkt und faktenbasiert. Vermeide Einleitungen wie 'Laut dem Text...'.\n\n"
-        f"KONTEXT:\n{context_text}"
-    )
-
 def run_benchmark():
     if not os.path.exists(INPUT_FILE):
         print(f"[FEHLER] Datei '{INPUT_FILE}' fehlt.")
@@ -47,22 +53,28 @@ def run_benchmark():
     with open(INPUT_FILE, "r", encoding="utf-8") as f:
         questions = json.load(f)
 
-    fieldnames = [
-        "id", "category", "model",
-        "time_total", "time_read", "time_write",
-        "input_tokens", "output_tokens",
-        "tps_read", "tps_write",
-        "question", "model_answer", "ground_truth", "context_snippet"
-    ]
-
-    file_exists = os.path.exists(OUTPUT_FILE)
+    if RESUME:
+        repair_partial_write(OUTPUT_FILE)
+        completed = load_completed_pairs(OUTPUT_FILE, *RESUME_FILES)
+        skipped = len(questions)
+        questions = pending_questions(questions, MODEL_NAME, completed)
+        skipped -= len(questions)
+        if skipped:
+            print(f"[INFO] {skipped} Fragen bereits erledigt, {len(questions)} offen.")
+        if not questions:
+            print("[INFO] Nichts zu tun.")
+            return
+
+    file_exists = os.path.exists(OUTPUT_FILE) and os.path.getsize(OUTPUT_FILE) > 0
     with open(OUTPUT_FILE, "a", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
         if not file_exists:
             writer.writeheader()
 
         print(f"[INFO] Starte Benchmark (FAST MODE) mit {MODEL_NAME}...")
 
+        limiter = RateLimiter(rpm=RPM_LIMIT, tpm=TPM_LIMIT)
+
         for i, entry in enumerate(questions):
             q_id = entry.get("id")
             print(f"\r[STATUS] Frage {i+1}/{len(questions)} (ID: {q_id})...", end="", flush=True)
@@ -70,10 +82,10 @@ def run_benchmark():
             sys_prompt = build_system_prompt(entry.get("context_text", ""))
             full_prompt = sys_prompt + "\n\nFRAGE:\n" + entry.get("question")
 
-            try:
+            def ask():
+                # Zeit nur für den erfolgreichen Versuch messen, nicht für Backoff-Wartezeiten
                 start_time = time.time()
 
-                # API Aufruf (Kein Retry, kein Loop)
                 response = client.models.generate_content(
                     model=MODEL_NAME,
                     contents=full_prompt,
@@ -81,7 +93,12 @@ def run_benchmark():
                 )
 
                 end_time = time.time()
-                duration = end_time - start_time
+                return response, end_time - start_time
+
+            try:
+                # API Aufruf (Retry mit Backoff nur bei Drosselung)
+                estimated = estimate_tokens(full_prompt) + EXPECTED_OUTPUT_TOKENS
+                response, duration = call_with_backoff(ask, limiter, tokens=estimated)
 
                 # Text-Extraktion (Minimale Fehlerbehandlung)
                 content = ""
@@ -100,6 +117,7 @@ def run_benchmark():
                     out_tok = response.usage_metadata.candidates_token_count
 
                 tps_total = out_tok / duration if duration > 0 else 0
+                limiter.record_usage(estimated, (in_tok or 0) + (out_tok or 0))
 
                 writer.writerow({
                     "id": q_id,
@@ -137,6 +155,8 @@ def run_benchmark():
                 })
                 csvfile.flush()
 
+        print(f"\n[INFO] Rate Limiter: {limiter.stats()}")
+
     print(f"\n[INFO] Fertig. Gespeichert in {OUTPUT_FILE}")
 
 if __name__ == "__main__":
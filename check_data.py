@@ -1,5 +1,10 @@
-import pandas as pd
+import json
 import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
 
 # --- HIER DEINE DATEIEN EINTRAGEN ---
 FILES_TO_CHECK = [
@@ -9,55 +14,218 @@ FILES_TO_CHECK = [
     "benchmark_results_gemini_erweiterung.csv",
     "benchmark_results_gemini_erweiterung2.csv",
     "benchmark_results_gemini_erweiterung3.csv",
+    "benchmark_results_gemini_erweiterung4.csv",
 ]
 
-def check_csv(filename):
-    print(f"\n PRÜFE: {filename} ...")
+PROMPTSET_FILE = "promptset.json"       # Soll-Abdeckung: jede ID für jedes Modell einer Datei
+REPORT_FILE = "check_report.json"       # Maschinenlesbarer Bericht
+CHUNK_SIZE = 5000                       # Zeilen pro Block beim Einlesen
+MAX_WORKERS = None                      # Prozesse für mehrere Dateien, None = Anzahl CPU-Kerne
+MAX_EXAMPLES = 20                       # Beispielzeilen pro Prüfung im Bericht
+
+ERROR_KEYWORDS = ["ERROR", "Exception", "Traceback", "EMPTY RESPONSE", "BLOCKED"]
+# tps_write außerhalb dieses Bereichs ist bei Antworten mit Output Tokens technisch unplausibel
+# (Cloud-APIs kommen wegen der Gesamtdauer als Nenner auf wenige Tokens/s, lokale Modelle hier auf unter 200)
+TPS_WRITE_RANGE = (0.01, 1000.0)
+
+ROW_CHECKS = ["error_keyword", "empty_answer", "zero_tokens", "implausible_tps_write"]
+ERROR_PATTERN = re.compile("|".join(re.escape(k) for k in ERROR_KEYWORDS), re.IGNORECASE)
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
 
+def check_row(row):
+    """
+    Prüft eine einzelne Ergebniszeile (Dict wie in den Runnern) und gibt die Namen der gefundenen Probleme zurück.
+    Gleiche Regeln wie check_chunk, aber ohne pandas, damit die Runner jede Zeile direkt beim Schreiben prüfen können.
+    """
+    issues = []
+    answer = row.get("model_answer")
+    answer = "" if answer is None else str(answer)
+    if ERROR_PATTERN.search(answer):
+        issues.append("error_keyword")
+    if not answer.strip():
+        issues.append("empty_answer")
+
+    tokens = to_float(row.get("output_tokens"))
+    if tokens == 0:
+        issues.append("zero_tokens")
+    if tokens is not None and tokens > 0:
+        tps = to_float(row.get("tps_write"))
+        if tps is None or not TPS_WRITE_RANGE[0] <= tps <= TPS_WRITE_RANGE[1]:
+            issues.append("implausible_tps_write")
+    return issues
+
+
+def check_chunk(chunk):
+    """Alle Zeilen-Prüfungen als Spaltenoperationen auf einem Block. Gibt {Prüfung: boolesche Maske} zurück."""
+    answers = chunk["model_answer"] if "model_answer" in chunk else pd.Series("", index=chunk.index)
+    tokens = pd.to_numeric(chunk.get("output_tokens"), errors="coerce") if "output_tokens" in chunk \
+        else pd.Series(float("nan"), index=chunk.index)
+    tps = pd.to_numeric(chunk.get("tps_write"), errors="coerce") if "tps_write" in chunk \
+        else pd.Series(float("nan"), index=chunk.index)
+
+    return {
+        "error_keyword": answers.str.contains(ERROR_PATTERN, na=False),
+        "empty_answer": answers.str.strip() == "",
+        "zero_tokens": tokens == 0,
+        "implausible_tps_write": (tokens > 0) & ~tps.between(*TPS_WRITE_RANGE),
+    }
+
+
+def load_promptset_ids(filename=PROMPTSET_FILE):
     if not os.path.exists(filename):
-        print(f" Datei nicht gefunden!")
-        return
+        return None
+    with open(filename, "r", encoding="utf-8") as f:
+        return sorted({str(entry.get("id")) for entry in json.load(f)})
+
+
+def check_file(filename, promptset_ids=None):
+    """
+    Liest eine Ergebnisdatei in Blöcken von CHUNK_SIZE Zeilen und führt alle Prüfungen aus.
+    Gibt das Ergebnis als Dict zurück (läuft in einem eigenen Prozess).
+    """
+    result = {"file": filename, "rows": 0, "models": {}, "counts": {name: 0 for name in ROW_CHECKS + ["duplicate"]},
+              "examples": {name: [] for name in ROW_CHECKS + ["duplicate"]}, "covered": {}}
+    if not os.path.exists(filename):
+        result["error"] = "Datei nicht gefunden"
+        return result
 
+    start = time.perf_counter()
+    seen = set()
     try:
-        # Semikolon als Trenner beachten!
-        df = pd.read_csv(filename, delimiter=";")
+        # Alles als Text lesen: leere Felder bleiben "", Zahlen werden nur für die Prüfungen umgewandelt
+        reader = pd.read_csv(filename, delimiter=";", dtype=str, keep_default_na=False, chunksize=CHUNK_SIZE)
+        for chunk in reader:
+            if "id" not in chunk or "model" not in chunk:
+                result["error"] = "Spalten 'id'/'model' fehlen"
+                return result
+
+            ids = chunk["id"].str.strip()
+            models = chunk["model"].str.strip()
+            keys = ids + "\x1f" + models
+
+            masks = check_chunk(chunk)
+            # Schlüssel ist (id, model): in Dateien mit mehreren Modellen kommt jede ID mehrfach vor
+            masks["duplicate"] = keys.duplicated() | keys.isin(seen)
+            seen.update(keys)
+
+            for name, mask in masks.items():
+                hits = chunk[mask]
+                result["counts"][name] += len(hits)
+                room = MAX_EXAMPLES - len(result["examples"][name])
+                for index, row in zip(hits.index[:room], hits.head(room).to_dict("records")):
+                    result["examples"][name].append({
+                        "row": int(index) + 1, "id": row["id"], "model": row["model"],
+                        "answer": str(row.get("model_answer", ""))[:50]
+                    })
+
+            for model, count in models.value_counts().items():
+                result["models"][model] = result["models"].get(model, 0) + int(count)
+
+            # Abgedeckt ist ein Paar nur mit mindestens einer Zeile ohne Zeilen-Problem
+            valid = ~(masks["error_keyword"] | masks["empty_answer"] | masks["zero_tokens"])
+            for model, model_ids in ids[valid].groupby(models[valid]):
+                result["covered"].setdefault(model, set()).update(model_ids)
+            result["rows"] += len(chunk)
+
     except Exception as e:
-        print(f" Kritisches Format-Problem (kann CSV nicht lesen): {e}")
-        return
+        result["error"] = f"Kritisches Format-Problem (kann CSV nicht lesen): {e}"
+        return result
+
+    if promptset_ids is not None:
+        expected = set(promptset_ids)
+        result["missing"] = {model: sorted(expected - result["covered"].get(model, set()), key=sort_id)
+                             for model in result["models"]}
+        result["unknown_ids"] = sorted({i for ids in result["covered"].values() for i in ids} - expected, key=sort_id)
 
-    # 1. Zeilen zählen
-    row_count = len(df)
-    print(f"   -> Anzahl Antworten: {row_count}")
+    result["covered"] = {model: sorted(ids, key=sort_id) for model, ids in result["covered"].items()}
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
 
-    # 2. Auf Duplikate prüfen (IDs)
-    if "id" in df.columns:
-        duplicates = df[df.duplicated("id")]
-        if not duplicates.empty:
-            print(f"    ACHTUNG: {len(duplicates)} doppelte IDs gefunden!")
+
+def sort_id(value):
+    try:
+        return 0, float(value), value
+    except ValueError:
+        return 1, 0.0, value
 
 
-    # 3. Nach Fehlermeldungen im Text suchen
-    error_keywords = ["ERROR", "Exception", "Traceback", "EMPTY RESPONSE", "BLOCKED"]
-    error_rows = df[df["model_answer"].str.contains("|".join(error_keywords), case=False, na=False)]
+def print_result(result):
+    print(f"\n PRÜFE: {result['file']} ...")
+    if "error" in result:
+        print(f"    {result['error']}")
+        return
 
-    if not error_rows.empty:
-        print(f"    {len(error_rows)} Zeilen enthalten FEHLER-Texte:")
-        for idx, row in error_rows.iterrows():
-            print(f"      - ID {row.get('id', '?')}: {row.get('model_answer', '')[:50]}...")
+    print(f"   -> Anzahl Antworten: {result['rows']} ({', '.join(f'{m}: {c}' for m, c in result['models'].items())})")
+    counts = result["counts"]
+    if counts["duplicate"]:
+        print(f"    ACHTUNG: {counts['duplicate']} doppelte (id, model)-Paare gefunden!")
+    if counts["error_keyword"]:
+        print(f"    {counts['error_keyword']} Zeilen enthalten FEHLER-Texte:")
+        for example in result["examples"]["error_keyword"]:
+            print(f"      - ID {example['id']} ({example['model']}): {example['answer']}...")
     else:
         print("    Keine offensichtlichen Fehlermeldungen in den Antworten.")
+    if counts["empty_answer"]:
+        print(f"    {counts['empty_answer']} Antworten sind komplett LEER.")
+    if counts["zero_tokens"]:
+        print(f"    {counts['zero_tokens']} Zeilen haben 0 Output Tokens (technisch verdächtig).")
+    if counts["implausible_tps_write"]:
+        print(f"    {counts['implausible_tps_write']} Zeilen mit unplausiblem tps_write "
+              f"(außerhalb {TPS_WRITE_RANGE[0]}-{TPS_WRITE_RANGE[1]}).")
+    for model, missing in result.get("missing", {}).items():
+        if missing:
+            print(f"    {model}: {len(missing)} Fragen ohne gültige Antwort: {', '.join(missing[:15])}"
+                  f"{' ...' if len(missing) > 15 else ''}")
+
+
+def check_files(filenames=FILES_TO_CHECK, report_file=REPORT_FILE):
+    """Prüft alle Dateien parallel in eigenen Prozessen und schreibt den Bericht als JSON."""
+    promptset_ids = load_promptset_ids()
+    if promptset_ids is None:
+        print(f"[WARNUNG] {PROMPTSET_FILE} nicht gefunden, Abdeckung wird nicht geprüft.")
+
+    start = time.perf_counter()
+    workers = min(len(filenames), MAX_WORKERS or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = list(executor.map(check_file, filenames, [promptset_ids] * len(filenames)))
+
+    for result in results:
+        print_result(result)
+
+    # Abdeckung über alle Dateien: z.B. Fehler im ersten Lauf, die in einer Erweiterung nachgeholt wurden
+    coverage = {}
+    if promptset_ids is not None:
+        covered = {}
+        for result in results:
+            for model, ids in result.get("covered", {}).items():
+                covered.setdefault(model, set()).update(ids)
+        coverage = {model: sorted(set(promptset_ids) - ids, key=sort_id) for model, ids in sorted(covered.items())}
+
+        print("\n ABDECKUNG ÜBER ALLE DATEIEN:")
+        for model, missing in coverage.items():
+            status = "vollständig" if not missing else f"{len(missing)} fehlen: {', '.join(missing[:15])}"
+            print(f"   -> {model}: {len(promptset_ids) - len(missing)}/{len(promptset_ids)} ({status})")
 
-    # 4. Leere Antworten prüfen
-    empty_answers = df[df["model_answer"].isna() | (df["model_answer"].astype(str).str.strip() == "")]
-    if not empty_answers.empty:
-        print(f"    {len(empty_answers)} Antworten sind komplett LEER.")
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "seconds": round(time.perf_counter() - start, 3),
+        "settings": {"error_keywords": ERROR_KEYWORDS, "tps_write_range": list(TPS_WRITE_RANGE),
+                     "promptset": PROMPTSET_FILE if promptset_ids is not None else None},
+        "files": [{key: value for key, value in result.items() if key != "covered"} for result in results],
+        "missing_overall": coverage
+    }
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n[INFO] Bericht gespeichert in: {report_file} ({report['seconds']:.2f}s)")
+    return report
 
-    # 5. Token-Plausibilität
-    if "output_tokens" in df.columns:
-        zero_tokens = df[df["output_tokens"] == 0]
-        if not zero_tokens.empty:
-            print(f"    {len(zero_tokens)} Zeilen haben 0 Output Tokens (technisch verdächtig).")
 
 if __name__ == "__main__":
-    for f in FILES_TO_CHECK:
-        check_csv(f)
\ No newline at end of file
+    check_files()
@@ -0,0 +1,195 @@
+import json
+import time
+
+from rate_limiter import estimate_tokens
+
+# --- KONFIGURATION ---
+# Erlaubte num_ctx-Werte. Jeder Wechsel von num_ctx lädt bei Ollama das Modell neu,
+# daher wenige Stufen und Fragen im Runner nach Stufe sortieren.
+CTX_BUCKETS = [2048, 4096, 6144, 8192, 12288, 16384]
+OUTPUT_RESERVE = 768            # Tokens für die Antwort (bisher max. 580 bei den lokalen Modellen)
+ESTIMATE_MARGIN = 1.2           # Aufschlag, wenn die Prompt-Größe nur geschätzt ist (ca. 4 Zeichen pro Token)
+TRUNCATION_MARGIN = 16          # prompt_eval_count so nah an num_ctx gilt als abgeschnitten (Ollama kürzt auf das Fenster)
+REPORT_FILE = "context_plan.json"
+
+# KV-Cache pro Token in Bytes (fp16): Layer * KV-Heads * Head-Dim * 2 (K und V) * 2 Bytes
+KV_BYTES_PER_TOKEN = {
+    "llama3.1:8b": 32 * 8 * 128 * 2 * 2,
+    "llama3.3:70b": 80 * 8 * 128 * 2 * 2,
+}
+DEFAULT_KV_BYTES_PER_TOKEN = 32 * 8 * 128 * 2 * 2
+
+# Prefill-Durchsatz in Tokens/s für die Latenz-Schätzung (Median tps_read aus benchmark_results_open_source.csv)
+PREFILL_TPS = {
+    "llama3.1:8b": 11500,
+    "llama3.3:70b": 1460,
+}
+DEFAULT_PREFILL_TPS = 1460
+
+MB = 1024 ** 2
+
+
+def prompt_size(entry, model_name, system_prompt=None):
+    """
+    Prompt-Größe (System-Prompt plus Frage) in Tokens und ob sie gemessen ist.
+    Gemessen: prompt_tokens aus dem übersetzten Promptset (promptset_store.py), sonst Schätzung.
+    Mit system_prompt (z.B. Retrieval statt vollem Kontext) wird dieser Prompt geschätzt,
+    die Messungen gelten nur für den vollen Kontext.
+    """
+    if system_prompt is not None:
+        return int(estimate_tokens(system_prompt, entry.get("question")) * ESTIMATE_MARGIN), False
+    measured = (entry.get("prompt_tokens") or {}).get(model_name)
+    if measured:
+        return int(measured), True
+    estimated = entry.get("estimated_tokens")
+    if not estimated:
+        from benchmark_engine import system_prompt_for
+        estimated = estimate_tokens(system_prompt_for(entry), entry.get("question"))
+    return int(estimated * ESTIMATE_MARGIN), False
+
+
+def pick_bucket(tokens):
+    """Kleinste Stufe, in die tokens passen; None, wenn keine reicht."""
+    for bucket in CTX_BUCKETS:
+        if tokens <= bucket:
+            return bucket
+    return None
+
+
+def plan_request(entry, model_name, num_ctx=None, system_prompt=None):
+    """
+    Plant num_ctx für eine Frage: Prompt plus OUTPUT_RESERVE, aufgerundet auf die nächste Stufe.
+    Mit num_ctx wird nicht geplant, sondern nur geprüft, ob die Frage in das feste Fenster passt.
+    system_prompt = tatsächlich gesendeter System-Prompt, falls er vom vollen Kontext abweicht.
+    at_risk = True, wenn das Fenster für Prompt und Antwort-Reserve nicht reicht.
+    """
+    tokens, measured = prompt_size(entry, model_name, system_prompt)
+    needed = tokens + OUTPUT_RESERVE
+    bucket = pick_bucket(needed) if num_ctx is None else (num_ctx if needed <= num_ctx else None)
+    return {
+        "num_ctx": bucket or num_ctx or CTX_BUCKETS[-1],
+        "prompt_tokens": tokens,
+        "measured": measured,
+        "needed": needed,
+        "at_risk": bucket is None,
+    }
+
+
+def is_truncated(plan, prompt_eval_count):
+    """
+    Abgleich mit prompt_eval_count der Antwort: Ollama kürzt zu lange Prompts auf das Fenster, der Zähler landet
+    dann bei num_ctx. Nur dann fehlt tatsächlich Kontext. Ein kleinerer Zähler als gemessen ist kein Hinweis
+    (Prompt-Cache zählt nur neue Tokens).
+    """
+    return bool(prompt_eval_count) and prompt_eval_count >= plan["num_ctx"] - TRUNCATION_MARGIN
+
+
+def is_at_risk(plan, prompt_eval_count):
+    """
+    Gefährdet, aber nicht zwingend abgeschnitten: der Prompt braucht mehr als num_ctx - OUTPUT_RESERVE (dieselbe
+    Grenze wie bei der Planung), es bleibt also weniger Platz für die Antwort als vorgesehen.
+    """
+    if plan["at_risk"]:
+        return True
+    return bool(prompt_eval_count) and prompt_eval_count > plan["num_ctx"] - OUTPUT_RESERVE
+
+
+def truncated_tokens(prompt_tokens, num_ctx):
+    """Tokens, die bei festem num_ctx vom Prompt fehlen würden."""
+    return max(0, prompt_tokens - num_ctx)
+
+
+def prefill_seconds(prompt_tokens, model_name, num_ctx=None):
+    """
+    Geschätzte Prefill-Zeit eines Prompts. Mit num_ctx verarbeitet Ollama höchstens num_ctx Tokens (der Rest wird
+    abgeschnitten). Die Größe des Fensters selbst ändert die Prefill-Arbeit nicht, nur die verarbeiteten Tokens.
+    """
+    tokens = prompt_tokens if num_ctx is None else min(prompt_tokens, num_ctx)
+    return tokens / PREFILL_TPS.get(model_name, DEFAULT_PREFILL_TPS)
+
+
+def plan_report(questions, models, fixed_num_ctx, render=None):
+    """
+    Vergleicht festes num_ctx mit der Planung: Verteilung der Stufen, KV-Cache pro Anfrage, geschätzte
+    Prefill-Zeit, gefährdete Prompts und Prompt-Tokens, die bei festem num_ctx abgeschnitten würden.
+    render(entry) liefert den gesendeten System-Prompt, falls er vom vollen Kontext abweicht (Retrieval).
+    """
+    report = {"fixed_num_ctx": fixed_num_ctx, "buckets": CTX_BUCKETS, "output_reserve": OUTPUT_RESERVE, "models": {}}
+    for model_name in models:
+        kv_bytes = KV_BYTES_PER_TOKEN.get(model_name, DEFAULT_KV_BYTES_PER_TOKEN)
+        plans = [(entry, plan_request(entry, model_name, system_prompt=render(entry) if render else None))
+                 for entry in questions]
+        if not plans:
+            continue
+
+        histogram = {}
+        for _, plan in plans:
+            histogram[plan["num_ctx"]] = histogram.get(plan["num_ctx"], 0) + 1
+
+        fixed_kv = fixed_num_ctx * kv_bytes
+        planned_kv = sum(plan["num_ctx"] for _, plan in plans) / len(plans) * kv_bytes
+        # Geplant wird nichts abgeschnitten, der volle Prompt kostet also mindestens so viel Prefill wie fest
+        prefill_fixed = sum(prefill_seconds(plan["prompt_tokens"], model_name, fixed_num_ctx) for _, plan in plans)
+        prefill_planned = sum(prefill_seconds(plan["prompt_tokens"], model_name) for _, plan in plans)
+        report["models"][model_name] = {
+            "questions": len(plans),
+            "measured": sum(1 for _, plan in plans if plan["measured"]),
+            "max_prompt_tokens": max(plan["prompt_tokens"] for _, plan in plans),
+            "num_ctx_histogram": dict(sorted(histogram.items())),
+            "kv_mb_fixed": round(fixed_kv / MB, 1),
+            "kv_mb_planned_mean": round(planned_kv / MB, 1),
+            "kv_saving": round(1 - planned_kv / fixed_kv, 3) if fixed_kv else 0.0,
+            "prefill_tps": PREFILL_TPS.get(model_name, DEFAULT_PREFILL_TPS),
+            "prefill_s_fixed": round(prefill_fixed, 2),
+            "prefill_s_planned": round(prefill_planned, 2),
+            "prefill_saving": round(1 - prefill_planned / prefill_fixed, 3) if prefill_fixed else 0.0,
+            # Der Runner sortiert nach Stufe, jede weitere Stufe bedeutet einen Neuladevorgang des Modells
+            "num_ctx_reloads": max(len(histogram) - 1, 0),
+            # Bei festem num_ctx abgeschnittene Prompts: hier geht Prefill-Arbeit am Kontext vorbei verloren
+            "truncated_fixed": [str(entry.get("id")) for entry, plan in plans
+                                if truncated_tokens(plan["prompt_tokens"], fixed_num_ctx)],
+            "truncated_tokens_fixed": sum(truncated_tokens(plan["prompt_tokens"], fixed_num_ctx) for _, plan in plans),
+            # Prompt passt, aber ohne volle Antwort-Reserve
+            "at_risk_fixed": [str(entry.get("id")) for entry, plan in plans if plan["needed"] > fixed_num_ctx
+                              and not truncated_tokens(plan["prompt_tokens"], fixed_num_ctx)],
+            "at_risk": [str(entry.get("id")) for entry, plan in plans if plan["at_risk"]],
+        }
+    return report
+
+
+def print_report(report):
+    print(f"[INFO] num_ctx-Planung (fest: {report['fixed_num_ctx']}, Reserve für die Antwort: {report['output_reserve']})")
+    for model_name, m in report["models"].items():
+        histogram = ", ".join(f"{ctx}: {count}" for ctx, count in m["num_ctx_histogram"].items())
+        print(f"   -> {model_name}: {m['measured']}/{m['questions']} Größen gemessen, max. {m['max_prompt_tokens']} Tokens")
+        print(f"      Stufen: {histogram}")
+        print(f"      KV-Cache pro Anfrage: {m['kv_mb_fixed']} MB fest, {m['kv_mb_planned_mean']} MB geplant "
+              f"({abs(m['kv_saving']) * 100:.0f}% {'weniger' if m['kv_saving'] >= 0 else 'mehr'})")
+        print(f"      Prefill geschätzt ({m['prefill_tps']} Tokens/s): {m['prefill_s_fixed']}s fest, "
+              f"{m['prefill_s_planned']}s geplant ({abs(m['prefill_saving']) * 100:.0f}% "
+              f"{'weniger' if m['prefill_saving'] >= 0 else 'mehr'}), {m['num_ctx_reloads']} zusätzliche Ladevorgänge")
+        if m["truncated_fixed"]:
+            print(f"      Mit festem num_ctx abgeschnitten: {len(m['truncated_fixed'])} Fragen, "
+                  f"{m['truncated_tokens_fixed']} Prompt-Tokens (IDs {', '.join(m['truncated_fixed'][:10])})")
+        if m["at_risk_fixed"]:
+            print(f"      Mit festem num_ctx knapp (weniger als {report['output_reserve']} Tokens für die Antwort): "
+                  f"{len(m['at_risk_fixed'])} Fragen (IDs {', '.join(m['at_risk_fixed'][:10])})")
+        if m["at_risk"]:
+            print(f"      [WARNUNG] Passen in keine Stufe: {', '.join(m['at_risk'])}")
+
+
+if __name__ == "__main__":
+    import benchmark_runner
+    from HTW_Ollama_API import OllamaApi
+    from promptset_store import load_questions
+
+    questions = load_questions(benchmark_runner.INPUT_FILE)
+    report = {"created": time.strftime("%Y-%m-%d %H:%M:%S"), "plans": {}}
+    for name, num_ctx in (("runner", benchmark_runner.CONFIG_OPTIONS.get("num_ctx")),
+                          ("ollama_default", OllamaApi.DEFAULT_OPTIONS["num_ctx"])):
+        report["plans"][name] = plan_report(questions, benchmark_runner.MODELS_TO_TEST, num_ctx)
+        print_report(report["plans"][name])
+
+    with open(REPORT_FILE, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[INFO] Bericht gespeichert in: {REPORT_FILE}")
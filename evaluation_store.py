@@ -0,0 +1,311 @@
+import csv
+import json
+import os
+import random
+import sqlite3
+import time
+from auto_grader import LOW_CONFIDENCE
+
+# --- KONFIGURATION ---
+DB_FILE = "evaluation.db"
+INPUT_FILE = "benchmark_results_merged.csv"
+OUTPUT_FILE = "evaluation_completed.csv"
+JUDGE_FILE = "evaluation_auto.csv"
+REVIEW_FILE = "evaluation_review.csv"
+
+CLAIM_TIMEOUT = 1800            # Sekunden, nach denen eine nicht bewertete Zuteilung wieder frei wird
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id TEXT NOT NULL,
+    model TEXT NOT NULL,
+    category TEXT,
+    data TEXT NOT NULL,             -- komplette CSV-Zeile als JSON (Spaltenreihenfolge bleibt erhalten)
+    shuffle REAL NOT NULL,          -- zufällige, feste Reihenfolge für die Blind-Bewertung
+    PRIMARY KEY (id, model)
+);
+CREATE TABLE IF NOT EXISTS ratings (
+    id TEXT NOT NULL,
+    model TEXT NOT NULL,
+    source TEXT NOT NULL,           -- "human" oder "review"
+    score REAL NOT NULL,
+    rater TEXT,
+    note TEXT,
+    rated_at REAL NOT NULL,
+    PRIMARY KEY (id, model, source)
+);
+CREATE TABLE IF NOT EXISTS assignments (
+    id TEXT NOT NULL,
+    model TEXT NOT NULL,
+    source TEXT NOT NULL,
+    rater TEXT NOT NULL,
+    assigned_at REAL NOT NULL,
+    PRIMARY KEY (id, model, source)
+);
+CREATE INDEX IF NOT EXISTS idx_assignments_rater ON assignments (rater, source);
+CREATE TABLE IF NOT EXISTS judge (
+    id TEXT NOT NULL,
+    model TEXT NOT NULL,
+    score REAL NOT NULL,
+    confidence REAL,
+    reasoning TEXT,
+    judge_model TEXT,
+    PRIMARY KEY (id, model)
+);
+"""
+
+# Offene Zeilen für eine Bewertungsquelle; im Review nur unsichere oder strittige Judge-Urteile
+OPEN_CONDITION = """
+    NOT EXISTS (SELECT 1 FROM ratings x WHERE x.id = r.id AND x.model = r.model AND x.source = :source)
+    AND (:source != 'review' OR EXISTS (
+        SELECT 1 FROM judge j WHERE j.id = r.id AND j.model = r.model AND (
+            j.confidence < :low_confidence
+            OR EXISTS (SELECT 1 FROM ratings h WHERE h.id = j.id AND h.model = j.model
+                       AND h.source = 'human' AND h.score != j.score))))
+"""
+
+
+class EvaluationStore:
+    """
+    SQLite-Datenbank (WAL-Modus) hinter rate_answers.py. Bewertungen werden per (id, model) nachgeschlagen
+    und einzeln in einer Transaktion gespeichert. Mehrere Bewerter können gleichzeitig arbeiten:
+    claim_next teilt jede Zeile unter BEGIN IMMEDIATE genau einem Bewerter zu.
+    Die CSV-/Excel-Dateien entstehen über export_csv bzw. export_all.
+    """
+
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = db_file
+        # isolation_level=None: Transaktionen werden explizit mit BEGIN/COMMIT gesteuert
+        self.conn = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # --- IMPORT ---
+
+    @staticmethod
+    def read_csv(filename):
+        if not os.path.exists(filename):
+            return []
+        with open(filename, "r", encoding="utf-8") as f:
+            return list(csv.DictReader(f, delimiter=';'))
+
+    def import_results(self, filename=INPUT_FILE):
+        """Übernimmt neue Zeilen aus der Ergebnisdatei. Vorhandene (id, model) bleiben unverändert."""
+        rows = self.read_csv(filename)
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO results (id, model, category, data, shuffle) VALUES (?, ?, ?, ?, ?)",
+                [(row["id"], row["model"], row.get("category"), json.dumps(row, ensure_ascii=False), random.random())
+                 for row in rows]
+            )
+            added = self.conn.total_changes - before
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def import_ratings(self, filename=OUTPUT_FILE, source="human"):
+        """Übernimmt Bewertungen aus einer bestehenden CSV (z.B. evaluation_completed.csv), vorhandene bleiben."""
+        rows = [row for row in self.read_csv(filename) if row.get("score") not in (None, "")]
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Fehlende Zeilen auch in results anlegen, damit der Export vollständig ist
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO results (id, model, category, data, shuffle) VALUES (?, ?, ?, ?, ?)",
+                [(row["id"], row["model"], row.get("category"),
+                  json.dumps({k: v for k, v in row.items() if k not in ("score", "review_reason")}, ensure_ascii=False),
+                  random.random()) for row in rows]
+            )
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO ratings (id, model, source, score, rater, note, rated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                # Reihenfolge der Datei über rated_at erhalten
+                [(row["id"], row["model"], source, float(row["score"]), "import", row.get("review_reason"), now + i * 1e-6)
+                 for i, row in enumerate(rows)]
+            )
+            added = self.conn.total_changes - before
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def import_judge(self, filename=JUDGE_FILE):
+        """Übernimmt die Urteile von auto_grader.py (ersetzt ältere Urteile derselben Zeile)."""
+        rows = self.read_csv(filename)
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO judge (id, model, score, confidence, reasoning, judge_model) VALUES (?, ?, ?, ?, ?, ?)",
+                [(row["id"], row["model"], float(row["score"]), float(row.get("judge_confidence") or 0),
+                  row.get("judge_reasoning"), row.get("judge_model")) for row in rows]
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    # --- BEWERTEN ---
+
+    def claim_next(self, rater, source="human"):
+        """
+        Teilt dem Bewerter die nächste offene Zeile zu und gibt sie als Dict zurück (None = nichts mehr offen).
+        Eine noch offene Zuteilung desselben Bewerters (z.B. nach einem Absturz) wird zuerst zurückgegeben.
+        """
+        now = time.time()
+        params = {"source": source, "rater": rater, "expired": now - CLAIM_TIMEOUT, "low_confidence": LOW_CONFIDENCE}
+
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute(f"""
+                SELECT r.id, r.model, r.data FROM results r
+                JOIN assignments a ON a.id = r.id AND a.model = r.model AND a.source = :source
+                WHERE a.rater = :rater AND {OPEN_CONDITION}
+                ORDER BY a.assigned_at LIMIT 1
+            """, params).fetchone()
+
+            if row is None:
+                row = self.conn.execute(f"""
+                    SELECT r.id, r.model, r.data FROM results r
+                    WHERE {OPEN_CONDITION}
+                    AND NOT EXISTS (SELECT 1 FROM assignments a WHERE a.id = r.id AND a.model = r.model
+                                    AND a.source = :source AND a.assigned_at > :expired)
+                    ORDER BY r.shuffle LIMIT 1
+                """, params).fetchone()
+
+            if row is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO assignments (id, model, source, rater, assigned_at) VALUES (?, ?, ?, ?, ?)",
+                    (row["id"], row["model"], source, rater, now)
+                )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        if row is None:
+            return None
+        data = json.loads(row["data"])
+        if source == "review":
+            data["review_reason"] = self.review_reason(row["id"], row["model"])
+        return data
+
+    def review_reason(self, id, model):
+        judge = self.conn.execute("SELECT score, confidence FROM judge WHERE id = ? AND model = ?", (id, model)).fetchone()
+        human = self.conn.execute("SELECT score FROM ratings WHERE id = ? AND model = ? AND source = 'human'",
+                                  (id, model)).fetchone()
+        reasons = []
+        if judge is not None and judge["confidence"] < LOW_CONFIDENCE:
+            reasons.append("low_confidence")
+        if judge is not None and human is not None and human["score"] != judge["score"]:
+            reasons.append("disagreement")
+        return "+".join(reasons)
+
+    def save_rating(self, id, model, score, rater, source="human", note=None):
+        """Speichert eine Bewertung und gibt die Zuteilung frei (eine Transaktion)."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO ratings (id, model, source, score, rater, note, rated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (str(id), model, source, float(score), rater, note, time.time())
+            )
+            self.conn.execute("DELETE FROM assignments WHERE id = ? AND model = ? AND source = ?", (str(id), model, source))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def release(self, rater, source="human"):
+        """Gibt alle Zuteilungen eines Bewerters frei (beim Schließen der App)."""
+        self.conn.execute("DELETE FROM assignments WHERE rater = ? AND source = ?", (rater, source))
+
+    def remaining(self, source="human"):
+        params = {"source": source, "low_confidence": LOW_CONFIDENCE}
+        return self.conn.execute(f"SELECT COUNT(*) FROM results r WHERE {OPEN_CONDITION}", params).fetchone()[0]
+
+    def rating_count(self, source="human"):
+        return self.conn.execute("SELECT COUNT(*) FROM ratings WHERE source = ?", (source,)).fetchone()[0]
+
+    # --- EXPORT ---
+
+    def export_csv(self, filename=OUTPUT_FILE, source="human"):
+        """
+        Schreibt alle Bewertungen einer Quelle im Format von evaluation_completed.csv (Ergebnis-Spalten plus score),
+        in der Reihenfolge der Bewertung. Die Datei wird erst am Ende ersetzt, Zeilenende "\n" wie in merge_csv.py.
+        """
+        rows = self.conn.execute("""
+            SELECT r.data, x.score, x.note FROM ratings x
+            JOIN results r ON r.id = x.id AND r.model = x.model
+            WHERE x.source = ? ORDER BY x.rated_at
+        """, (source,)).fetchall()
+
+        records = []
+        fieldnames = []
+        for row in rows:
+            record = json.loads(row["data"])
+            record["score"] = row["score"]
+            if source == "review":
+                record["review_reason"] = row["note"] or ""
+            for key in record:
+                if key not in fieldnames:
+                    fieldnames.append(key)
+            records.append(record)
+
+        temp_file = f"{filename}.tmp"
+        with open(temp_file, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';', quotechar='"',
+                                    quoting=csv.QUOTE_MINIMAL, restval="", lineterminator="\n")
+            writer.writeheader()
+            writer.writerows(records)
+        os.replace(temp_file, filename)
+        return len(records)
+
+
+def export_all(store):
+    """CSV-Dateien aus der Datenbank schreiben und daraus die Excel-Übersicht erzeugen."""
+    count = store.export_csv(OUTPUT_FILE, "human")
+    print(f"[INFO] {count} Bewertungen exportiert nach: {OUTPUT_FILE}")
+    if store.rating_count("review"):
+        count = store.export_csv(REVIEW_FILE, "review")
+        print(f"[INFO] {count} Review-Bewertungen exportiert nach: {REVIEW_FILE}")
+
+    from export_raw_data import create_overview_excel
+    create_overview_excel()
+
+
+def open_store():
+    """Öffnet die Datenbank und übernimmt neue Ergebnisse sowie (beim ersten Start) die bestehenden Bewertungen."""
+    store = EvaluationStore()
+    added = store.import_results(INPUT_FILE)
+    if added:
+        print(f"[INFO] {added} neue Antworten aus {INPUT_FILE} übernommen.")
+    if store.rating_count("human") == 0 and os.path.exists(OUTPUT_FILE):
+        imported = store.import_ratings(OUTPUT_FILE, "human")
+        print(f"[INFO] {imported} bestehende Bewertungen aus {OUTPUT_FILE} übernommen.")
+    if store.rating_count("review") == 0 and os.path.exists(REVIEW_FILE):
+        store.import_ratings(REVIEW_FILE, "review")
+    if os.path.exists(JUDGE_FILE):
+        store.import_judge(JUDGE_FILE)
+    return store
+
+
+if __name__ == "__main__":
+    with open_store() as store:
+        print(f"[INFO] Offen: {store.remaining('human')} Antworten, im Review: {store.remaining('review')}")
+        export_all(store)
@@ -1,9 +1,138 @@
-import pandas as pd
+import csv
+import hashlib
+import json
 import os
 
+import numpy as np
+from openpyxl import Workbook
+
+from resume_index import iter_records
+
 # --- KONFIGURATION ---
 INPUT_FILE = "evaluation_completed.csv"
 OUTPUT_FILE = "BA_Rohdaten_Uebersicht.xlsx"
+CACHE_FILE = "export_cache.json"    # Kennzahlen je (Modell, Kategorie), neu berechnet nur bei geänderten Eingabezeilen
+
+PERCENTILES = [50, 95, 99]          # Zusätzlich zu mean/min/max im Blatt Check_Technik
+
+# Spalten, die als Zahl in Excel landen (damit Excel damit rechnen kann)
+NUMERIC_COLS = [
+    'score',
+    'time_total', 'time_read', 'time_write', 'time_sec',  # time_sec für Abwärtskompatibilität
+    'input_tokens', 'output_tokens',
+    'tps_read', 'tps_write'
+]
+INTEGER_COLS = ['id', 'input_tokens', 'output_tokens']
+ERROR_COLS = ['id', 'category', 'model', 'score', 'question', 'model_answer', 'ground_truth']
+TECH_AGGREGATES = ['mean', 'min', 'max'] + [f"p{q}" for q in PERCENTILES]
+
+
+def to_cell(name, value):
+    """Wandelt ein CSV-Feld in einen Excel-Wert um. Nicht lesbare Zahlen werden zu leeren Zellen."""
+    if name not in NUMERIC_COLS and name != 'id':
+        return value
+    if value.strip() == "":
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        return None if name in NUMERIC_COLS else value
+    if name in INTEGER_COLS and number.is_integer():
+        return int(number)
+    return number
+
+
+def sort_key(value):
+    try:
+        return 0, float(value), value
+    except ValueError:
+        return 1, 0.0, value
+
+
+def read_at(f, offset):
+    """Liest den Datensatz, der an Byte-Position offset beginnt."""
+    f.seek(offset)
+    lines = (raw.decode("utf-8", errors="replace") for raw in iter(f.readline, b""))
+    return next(csv.reader(lines, delimiter=';', quotechar='"'))
+
+
+def row_hash(fields):
+    return int(hashlib.sha1(json.dumps(fields, ensure_ascii=False).encode("utf-8")).hexdigest(), 16)
+
+
+def scan(filename):
+    """
+    Erster Durchlauf: merkt sich pro Zeile nur Sortierschlüssel und Byte-Position, nicht den Inhalt.
+    Pro (Modell, Kategorie) wird ein Hash über die Zeilen gebildet (Summe der Zeilen-Hashes, damit die
+    Reihenfolge der Bewertung keine Rolle spielt).
+    """
+    header = None
+    index = []          # (Sortierschlüssel, Position) für Rohdaten_Komplett
+    errors = []         # (Kategorie, Score, Position) für Nur_Fehler
+    partitions = {}     # (Modell, Kategorie) -> [Hash-Summe, Anzahl]
+    start = 0
+
+    for fields, end_offset, _ in iter_records(filename):
+        if fields is None:
+            break
+        if header is None:
+            header = fields
+            start = end_offset
+            continue
+        if len(fields) != len(header):
+            start = end_offset
+            continue
+
+        row = dict(zip(header, fields))
+        part = (row.get("model", ""), row.get("category", ""))
+        digest = partitions.setdefault(part, [0, 0])
+        digest[0] = (digest[0] + row_hash(fields)) % (1 << 160)
+        digest[1] += 1
+
+        index.append(((sort_key(row.get("id", "")), row.get("model", "")), start))
+        score = to_cell("score", row.get("score", ""))
+        if score is not None and score < 1.0:
+            errors.append((row.get("category", ""), score, start))
+        start = end_offset
+
+    digests = {part: f"{value:040x}-{count}" for part, (value, count) in partitions.items()}
+    return header, index, errors, digests
+
+
+def tech_columns(header):
+    cols = []
+    if 'time_total' in header:
+        cols.append('time_total')
+    elif 'time_sec' in header:
+        cols.append('time_sec')
+    if 'tps_write' in header:
+        cols.append('tps_write')  # Das ist der wichtigste Speed-Wert
+    if 'output_tokens' in header:
+        cols.append('output_tokens')
+    return cols
+
+
+def load_cache(settings):
+    if os.path.exists(CACHE_FILE):
+        try:
+            with open(CACHE_FILE, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+            if cache.get("settings") == settings:
+                return cache
+        except (OSError, json.JSONDecodeError):
+            pass
+    return {"settings": settings, "partitions": {}, "models": {}}
+
+
+def tech_aggregates(values):
+    if not values:
+        return {name: None for name in TECH_AGGREGATES}
+    array = np.asarray(values, dtype=float)
+    result = {"mean": float(array.mean()), "min": float(array.min()), "max": float(array.max())}
+    for q, value in zip(PERCENTILES, np.percentile(array, PERCENTILES)):
+        result[f"p{q}"] = float(value)
+    return result
+
 
 def create_overview_excel():
     if not os.path.exists(INPUT_FILE):
@@ -12,93 +141,133 @@ def create_overview_excel():
 
     print("[STATUS] Verarbeite Daten für Excel-Export...")
 
-    # 1. Daten laden (Semikolon-getrennt)
+    # 1. Index aufbauen (Semikolon-getrennt)
     try:
-        df = pd.read_csv(INPUT_FILE, delimiter=";")
+        header, index, errors, digests = scan(INPUT_FILE)
     except Exception as e:
         print(f"[FEHLER] Fehler beim CSV-Lesen: {e}")
         return
+    if header is None:
+        print(f"[FEHLER] '{INPUT_FILE}' ist leer.")
+        return
+
+    has_score = 'score' in header
+    tech_cols = tech_columns(header)
 
-    # 2. Datentypen erzwingen (damit Excel damit rechnen kann)
-    numeric_cols = [
-        'score',
-        'time_total', 'time_read', 'time_write', 'time_sec', # time_sec für Abwärtskompatibilität
-        'input_tokens', 'output_tokens',
-        'tps_read', 'tps_write'
-    ]
+    # 2. Geänderte Partitionen bestimmen: Scores je (Modell, Kategorie), Technik je Modell (Perzentile lassen sich
+    #    nicht aus Teilergebnissen zusammensetzen, daher wird ein Modell neu berechnet, sobald eine Partition sich ändert)
+    cache = load_cache({"header": header, "tech_cols": tech_cols, "percentiles": PERCENTILES})
+    part_key = {part: "\x1f".join(part) for part in digests}
+    changed_parts = {part for part in digests
+                     if cache["partitions"].get(part_key[part], {}).get("digest") != digests[part]}
+    model_digests = {}
+    for (model, category), digest in sorted(digests.items()):
+        model_digests.setdefault(model, []).append(f"{category}:{digest}")
+    model_digests = {model: hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+                     for model, parts in model_digests.items()}
+    changed_models = {model for model, digest in model_digests.items()
+                      if cache["models"].get(model, {}).get("digest") != digest}
 
-    for col in numeric_cols:
-        if col in df.columns:
-            # errors='coerce' wandelt fehlerhafte Werte in NaN um, statt abzustürzen
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+    scores = {part: [] for part in changed_parts}
+    tech_values = {model: {col: [] for col in tech_cols} for model in changed_models}
+    col_index = {name: i for i, name in enumerate(header)}
 
-    # 3. Excel Writer starten
+    # 3. Excel im Write-Only-Modus: Zeilen werden direkt in die Datei gestreamt
+    temp_file = OUTPUT_FILE + ".tmp"
     try:
-        with pd.ExcelWriter(OUTPUT_FILE, engine='openpyxl') as writer:
+        workbook = Workbook(write_only=True)
+        with open(INPUT_FILE, "rb") as f:
 
             # --- BLATT 1: ROHDATEN (Alles) ---
-            if 'id' in df.columns and 'model' in df.columns:
-                df_sorted = df.sort_values(by=['id', 'model'])
-            else:
-                df_sorted = df
+            sheet = workbook.create_sheet("Rohdaten_Komplett")
+            sheet.append(header)
+            index.sort(key=lambda item: item[0])
+            for _, offset in index:
+                fields = read_at(f, offset)
+                cells = [to_cell(name, value) for name, value in zip(header, fields)]
+                sheet.append(cells)
+
+                model = fields[col_index["model"]] if "model" in col_index else ""
+                category = fields[col_index["category"]] if "category" in col_index else ""
+                if has_score and (model, category) in scores:
+                    score = cells[col_index["score"]]
+                    if score is not None:
+                        scores[(model, category)].append(score)
+                if model in tech_values:
+                    for col in tech_cols:
+                        value = cells[col_index[col]]
+                        if value is not None:
+                            tech_values[model][col].append(value)
 
-            df_sorted.to_excel(writer, sheet_name="Rohdaten_Komplett", index=False)
+            # Cache aktualisieren: neu berechnete Partitionen ersetzen, entfernte verwerfen
+            partitions = {}
+            for part, digest in digests.items():
+                if part in scores:
+                    values = scores[part]
+                    partitions[part_key[part]] = {
+                        "digest": digest, "model": part[0], "category": part[1],
+                        "mean": float(np.mean(values)) if values else None, "count": len(values)
+                    }
+                else:
+                    partitions[part_key[part]] = cache["partitions"][part_key[part]]
+            models = {}
+            for model, digest in model_digests.items():
+                if model in tech_values:
+                    models[model] = {"digest": digest,
+                                     "tech": {col: tech_aggregates(tech_values[model][col]) for col in tech_cols}}
+                else:
+                    models[model] = cache["models"][model]
 
             # --- BLATT 2: QUALITÄTS-CHECK (Nur Scores) ---
-            if 'score' in df.columns:
-                pivot_quality = df.pivot_table(
-                    index="category",
-                    columns="model",
-                    values="score",
-                    aggfunc=['mean', 'count']
-                )
-                pivot_quality.to_excel(writer, sheet_name="Check_Scores")
+            if has_score:
+                model_names = sorted({p["model"] for p in partitions.values() if p["count"]})
+                categories = sorted({p["category"] for p in partitions.values() if p["count"]})
+                sheet = workbook.create_sheet("Check_Scores")
+                sheet.append([None] + ["mean"] * len(model_names) + ["count"] * len(model_names))
+                sheet.append(["model"] + model_names * 2)
+                sheet.append(["category"])
+                for category in categories:
+                    cells = [partitions.get(f"{model}\x1f{category}", {}) for model in model_names]
+                    sheet.append([category] + [c.get("mean") for c in cells] + [c.get("count") for c in cells])
 
             # --- BLATT 3: EFFIZIENZ (Zeit & Token) ---
-            tech_cols = []
-            if 'time_total' in df.columns:
-                tech_cols.append('time_total')
-            elif 'time_sec' in df.columns:
-                tech_cols.append('time_sec')
-
-            if 'tps_write' in df.columns:
-                tech_cols.append('tps_write') # Das ist der wichtigste Speed-Wert
-
-            if 'output_tokens' in df.columns:
-                tech_cols.append('output_tokens')
-
             if tech_cols:
-                pivot_tech = df.pivot_table(
-                    index="model",
-                    values=tech_cols,
-                    aggfunc=['mean', 'min', 'max']
-                )
-                pivot_tech.to_excel(writer, sheet_name="Check_Technik")
+                tech_cols = sorted(tech_cols)  # Spaltenreihenfolge wie bisher in der Pivot-Tabelle
+                sheet = workbook.create_sheet("Check_Technik")
+                sheet.append([None] + [agg for agg in TECH_AGGREGATES for _ in tech_cols])
+                sheet.append([None] + tech_cols * len(TECH_AGGREGATES))
+                sheet.append(["model"])
+                for model in sorted(models):
+                    tech = models[model]["tech"]
+                    sheet.append([model] + [tech[col][agg] for agg in TECH_AGGREGATES for col in tech_cols])
 
             # --- BLATT 4: FEHLER-ANALYSE (Nur Scores < 1.0) ---
-            if 'score' in df.columns:
-                # Filtert alles raus, was perfekt war. Zeigt nur die Fehler.
-                df_errors = df[df['score'] < 1.0].copy()
-
-                # Sortieren, falls Spalten existieren
-                if 'category' in df_errors.columns:
-                    df_errors = df_errors.sort_values(by=['category', 'score'])
-
+            if has_score:
                 # Wir nehmen nur die wichtigsten Spalten für die Übersicht
-                cols_to_keep = ['id', 'category', 'model', 'score', 'question', 'model_answer', 'ground_truth']
-                # Prüfen ob alle Spalten da sind
-                available_cols = [c for c in cols_to_keep if c in df.columns]
+                available_cols = [c for c in ERROR_COLS if c in col_index]
+                sheet = workbook.create_sheet("Nur_Fehler")
+                sheet.append(available_cols)
+                for _, _, offset in sorted(errors, key=lambda item: (item[0], item[1])):
+                    fields = read_at(f, offset)
+                    sheet.append([to_cell(name, fields[col_index[name]]) for name in available_cols])
+
+        workbook.save(temp_file)
+        os.replace(temp_file, OUTPUT_FILE)
 
-                df_errors[available_cols].to_excel(writer, sheet_name="Nur_Fehler", index=False)
+        with open(CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump({"settings": cache["settings"], "partitions": partitions, "models": models}, f)
 
-        print(f"[INFO] Datei erstellt: {OUTPUT_FILE}")
+        print(f"[INFO] Datei erstellt: {OUTPUT_FILE} ({len(index)} Zeilen, "
+              f"{len(changed_parts)}/{len(digests)} Partitionen neu berechnet)")
         print("       -> Öffne diese Datei jetzt in Excel.")
         print("       -> Blatt 'Rohdaten_Komplett': Hier kannst du filtern.")
         print("       -> Blatt 'Nur_Fehler': Schau dir hier an, WORAN die Modelle gescheitert sind.")
 
     except Exception as e:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
         print(f"[FEHLER] Konnte Excel nicht schreiben: {e}")
         print("[INFO] Stelle sicher, dass die Datei nicht in Excel geöffnet ist!")
 
 if __name__ == "__main__":
-    create_overview_excel()
\ No newline at end of file
+    create_overview_excel()
@@ -0,0 +1,175 @@
+import json
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import benchmark_runner
+import ollama_stub_server
+from HTW_Ollama_API import OllamaApi
+
+# --- KONFIGURATION ---
+# Lasttest des Clients gegen ollama_stub_server.py (läuft ohne GPU-Server).
+# Gemessen wird der Overhead des Clients: Client-Zeit pro Anfrage minus total_duration des Servers.
+REQUESTS = 200                  # Anfragen pro Szenario
+CONCURRENCY_LEVELS = [1, 4, 8]  # Gleichzeitige Anfragen
+MODEL = "llama3.1:8b"
+PROMPT = "Explain the rule for a dead ball when the runner is down by contact. " * 20
+
+# Stub schnell einstellen, damit der Client-Overhead nicht im Rauschen untergeht
+STUB_SETTINGS = {
+    "PREFILL_TPS": 200000.0,
+    "DECODE_TPS": 5000.0,
+    "OUTPUT_TOKENS": 32,
+    "LOAD_DELAY": 0.0,
+    "NUM_PARALLEL": 8,
+}
+
+RUNNER_QUESTIONS = 10           # Fragen aus dem Promptset für den Durchlauf von benchmark_runner.py
+REPORT_FILE = "load_test_report.json"
+
+
+def percentile(values, q):
+    return OllamaApi.percentile(sorted(values), q) if values else 0.0
+
+
+def run_scenario(concurrency, stream, pooled):
+    """Schickt REQUESTS Chat-Anfragen mit `concurrency` Threads und misst Durchsatz und Client-Overhead."""
+    OllamaApi.USE_SESSION = pooled
+    OllamaApi.close()
+
+    def one_request(_):
+        start = time.perf_counter()
+        response = OllamaApi.chat([{"role": "user", "content": PROMPT}], model=MODEL, stream=stream, cache=False)
+        return time.perf_counter() - start, response
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one_request, range(REQUESTS)))
+    wall_time = time.perf_counter() - wall_start
+
+    ok = [(t, r) for t, r in results if r.get("result") is not None]
+    overhead = [(t - r["time"]) * 1000 for t, r in ok]
+    tokens = sum(r.get("token", 0) for _, r in ok)
+
+    return {
+        "concurrency": concurrency,
+        "stream": stream,
+        "pooled": pooled,
+        "requests": REQUESTS,
+        "errors": REQUESTS - len(ok),
+        "wall_time": round(wall_time, 3),
+        "requests_per_s": round(len(ok) / wall_time, 1) if wall_time else 0,
+        "tokens_per_s": round(tokens / wall_time, 1) if wall_time else 0,
+        "client_ms_mean": round(statistics.mean(t for t, _ in ok) * 1000, 2) if ok else 0,
+        "overhead_ms_p50": round(percentile(overhead, 50), 2),
+        "overhead_ms_p95": round(percentile(overhead, 95), 2),
+        "overhead_ms_p99": round(percentile(overhead, 99), 2),
+        # Mittelwert der einzelnen Client-Phasen aus OllamaApi
+        "phases_ms": {name: round(statistics.mean(r.get(name, 0) for _, r in ok) * 1000, 3) if ok else 0
+                      for name in OllamaApi.CLIENT_TIMINGS}
+    }
+
+
+def run_runner(workdir):
+    """Lässt benchmark_runner.py mit einem Teil des Promptsets gegen den Stub laufen."""
+    with open(benchmark_runner.INPUT_FILE, "r", encoding="utf-8") as f:
+        questions = json.load(f)[:RUNNER_QUESTIONS]
+
+    input_file = os.path.join(workdir, "promptset_load_test.json")
+    with open(input_file, "w", encoding="utf-8") as f:
+        json.dump(questions, f)
+
+    benchmark_runner.INPUT_FILE = input_file
+    benchmark_runner.OUTPUT_FILE = os.path.join(workdir, "benchmark_results_load_test.csv")
+    benchmark_runner.RUN_SUMMARY_FILE = os.path.join(workdir, "benchmark_run_summary_load_test.jsonl")
+    benchmark_runner.MODELS_TO_TEST = list(ollama_stub_server.MODELS)[:2]
+    benchmark_runner.PAUSE_BETWEEN_REQUESTS = 0.0
+    benchmark_runner.USE_RESPONSE_CACHE = False
+
+    reports = []
+    for mode in ("sequential", "parallel"):
+        benchmark_runner.EXECUTION_MODE = mode
+        if os.path.exists(benchmark_runner.OUTPUT_FILE):
+            os.remove(benchmark_runner.OUTPUT_FILE)
+
+        start = time.perf_counter()
+        benchmark_runner.run_benchmark()
+        wall_time = time.perf_counter() - start
+
+        with open(benchmark_runner.RUN_SUMMARY_FILE, "r", encoding="utf-8") as f:
+            summary = json.loads(f.readlines()[-1])
+        reports.append({
+            "execution_mode": mode,
+            "questions": RUNNER_QUESTIONS * len(benchmark_runner.MODELS_TO_TEST),
+            "wall_time": round(wall_time, 3),
+            "models": [{key: m[key] for key in ("model", "wall_time", "client_time_sum")} for m in summary["models"]]
+        })
+    return reports
+
+
+def print_table(scenarios):
+    print("\n" + "-" * 96)
+    print(f"{'Threads':>7} {'Stream':>7} {'Pool':>6} {'Fehler':>6} {'Anfr./s':>9} {'Tok./s':>9} "
+          f"{'Client ms':>10} {'Overhead p50':>13} {'p95':>8} {'p99':>8}")
+    print("-" * 96)
+    for s in scenarios:
+        print(f"{s['concurrency']:>7} {'ja' if s['stream'] else 'nein':>7} {'ja' if s['pooled'] else 'nein':>6} "
+              f"{s['errors']:>6} {s['requests_per_s']:>9} {s['tokens_per_s']:>9} {s['client_ms_mean']:>10} "
+              f"{s['overhead_ms_p50']:>13} {s['overhead_ms_p95']:>8} {s['overhead_ms_p99']:>8}")
+    print("-" * 96)
+    print("[INFO] Client-Phasen (Mittelwert in ms):")
+    for s in scenarios:
+        phases = ", ".join(f"{name[7:]} {value}" for name, value in s["phases_ms"].items())
+        print(f"   {s['concurrency']} Threads, Stream {'ja' if s['stream'] else 'nein'}, Pool {'ja' if s['pooled'] else 'nein'}: {phases}")
+
+
+def run_load_test():
+    for name, value in STUB_SETTINGS.items():
+        setattr(ollama_stub_server, name, value)
+    server, url = ollama_stub_server.start_in_background()
+
+    host, port = url.rsplit(":", 1)
+    saved = (OllamaApi.HOST, OllamaApi.PORT, OllamaApi.ENDPOINTS, OllamaApi.USE_SESSION)
+    OllamaApi.HOST, OllamaApi.PORT, OllamaApi.ENDPOINTS = host, int(port), None
+    print(f"[INFO] Stub läuft auf {url}")
+
+    try:
+        # Modell einmal laden, damit die Ladezeit nicht im ersten Szenario landet
+        OllamaApi.load_model(MODEL)
+
+        scenarios = []
+        for pooled in (True, False):
+            for stream in (False, True):
+                for concurrency in CONCURRENCY_LEVELS:
+                    print(f"[INFO] Szenario: {concurrency} Threads, Stream {stream}, Pool {pooled}")
+                    scenarios.append(run_scenario(concurrency, stream, pooled))
+        print_table(scenarios)
+
+        OllamaApi.USE_SESSION = saved[3]
+        OllamaApi.close()
+        with tempfile.TemporaryDirectory() as workdir:
+            runner = run_runner(workdir)
+        for r in runner:
+            print(f"[INFO] benchmark_runner.py ({r['execution_mode']}): {r['questions']} Fragen in {r['wall_time']:.2f}s")
+
+    finally:
+        OllamaApi.HOST, OllamaApi.PORT, OllamaApi.ENDPOINTS, OllamaApi.USE_SESSION = saved
+        OllamaApi.close()
+        server.shutdown()
+        server.server_close()
+
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "stub_settings": STUB_SETTINGS,
+        "scenarios": scenarios,
+        "runner": runner
+    }
+    with open(REPORT_FILE, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[INFO] Bericht gespeichert in: {REPORT_FILE}")
+
+
+if __name__ == "__main__":
+    run_load_test()
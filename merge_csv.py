@@ -1,6 +1,10 @@
-import pandas as pd
+import csv
+import hashlib
+import json
 import os
 
+from resume_index import iter_records
+
 # --- KONFIGURATION ---
 #
 FILES_TO_MERGE = [
@@ -14,57 +18,263 @@ FILES_TO_MERGE = [
     ]
 
 OUTPUT_FILE = "benchmark_results_merged.csv"
+STATE_FILE = "merge_state.json"             # Bereits übernommene Byte-Bereiche je Quelldatei und Schlüssel-Index
+CONFLICTS_FILE = "merge_conflicts.csv"      # Protokoll der verworfenen Duplikate
+FULL_REBUILD = False                        # True: alles neu einlesen und OUTPUT_FILE komplett neu schreiben
 
-def merge_simple():
-    all_dfs = []
-    print("[STATUS] Starte Merge-Vorgang...")
+# Zeilen, deren 'model_answer' eines dieser Wörter enthält, werden nicht übernommen (Groß-/Kleinschreibung egal).
+# 'UNAVAILABLE' sind die 503-Fehler von Google.
+ERROR_KEYWORDS = ["ERROR", "UNAVAILABLE"]
+
+# Konfliktregel: pro (id, model, run) gilt die zuerst übernommene gültige Zeile (Reihenfolge von FILES_TO_MERGE,
+# innerhalb einer Datei die Zeilenreihenfolge). Spätere Zeilen mit demselben Schlüssel landen in CONFLICTS_FILE.
+# Quellen ohne Spalte 'run' gehören zum selben Lauf, die Erweiterungs-Dateien ergänzen also den ursprünglichen Lauf.
+DEFAULT_RUN = ""
+HEAD_BYTES = 4096                           # Anfang jeder Quelldatei, an dem ein Neuschreiben erkannt wird
+
+CONFLICT_FIELDNAMES = ["id", "model", "run", "kept_source", "skipped_source", "skipped_offset", "reason"]
+
+
+def is_error(answer):
+    upper = (answer or "").upper()
+    return any(keyword in upper for keyword in ERROR_KEYWORDS)
+
+
+def record_key(row):
+    data = json.dumps([row.get("id", "").strip(), row.get("model", "").strip(), row.get("run") or DEFAULT_RUN],
+                      ensure_ascii=False)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()[:16]
+
+
+def row_digest(row):
+    data = json.dumps(sorted(row.items()), ensure_ascii=False)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()[:16]
+
+
+def sort_key(row):
+    # Wie bisher nach ID und Modell sortieren (numerisch, damit 1001 hinter 901 kommt)
+    raw_id = row.get("id", "").strip()
+    try:
+        return 0, float(raw_id), row.get("model", "")
+    except ValueError:
+        return 1, raw_id, row.get("model", "")
+
+
+def head_hash(filename, length):
+    with open(filename, "rb") as f:
+        return hashlib.sha1(f.read(length)).hexdigest()
+
+
+# --- ZUSTAND ---
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return None
+    try:
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def save_state(state):
+    # Erst komplett schreiben, dann ersetzen: ein Abbruch hinterlässt nie einen halben Zustand
+    tmp_file = STATE_FILE + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_file, STATE_FILE)
+
+
+def stale_reason(state):
+    """Gibt zurück, warum der gespeicherte Zustand nicht mehr zu den Dateien passt (None, wenn er passt)."""
+    if state is None:
+        return "kein Merge-Zustand vorhanden"
+    if not os.path.exists(OUTPUT_FILE) or os.path.getsize(OUTPUT_FILE) < state["output_size"]:
+        return f"'{OUTPUT_FILE}' wurde verändert"
+
+    for filename, source in state["sources"].items():
+        if filename not in FILES_TO_MERGE:
+            return f"'{filename}' ist nicht mehr in FILES_TO_MERGE"
+        if not os.path.exists(filename) or os.path.getsize(filename) < source["offset"]:
+            return f"'{filename}' wurde gekürzt oder gelöscht"
+        length, expected = source["head"]
+        if head_hash(filename, length) != expected:
+            return f"'{filename}' wurde neu geschrieben"
+    return None
+
+
+# --- EINLESEN ---
+
+def collect_new_rows(filename, source, state, conflicts):
+    """
+    Liest die noch nicht übernommenen Datensätze einer Quelldatei ab source["offset"].
+    Neue gültige Zeilen werden in den Index eingetragen und zurückgegeben, Duplikate in conflicts gesammelt.
+    Ein unvollständiger letzter Datensatz (Runner schreibt noch) bleibt für den nächsten Merge liegen.
+    """
+    rows = []
+    errors = 0
+    header = source.get("header")
+
+    for fields, end_offset, complete in iter_records(filename, source["offset"]):
+        if fields is None or not complete:
+            break
+        source["offset"] = end_offset
+
+        if header is None:
+            if "id" not in fields or "model" not in fields:
+                print(f"[WARNUNG] '{filename}' hat keine Spalten 'id'/'model' und wird uebersprungen.")
+                source["offset"] = os.path.getsize(filename)
+                break
+            header = source["header"] = fields
+            continue
+        if len(fields) != len(header):
+            if fields:
+                print(f"[WARNUNG] '{filename}': Datensatz vor Byte {end_offset} hat {len(fields)} statt {len(header)} Felder.")
+            continue
+
+        row = dict(zip(header, fields))
+        if is_error(row.get("model_answer")):
+            errors += 1
+            continue
+
+        key = record_key(row)
+        digest = row_digest(row)
+        kept = state["index"].get(key)
+        if kept is not None:
+            conflicts.append({
+                "id": row.get("id"), "model": row.get("model"), "run": row.get("run") or DEFAULT_RUN,
+                "kept_source": kept[1], "skipped_source": filename, "skipped_offset": end_offset,
+                "reason": "identisch" if kept[0] == digest else "abweichend"
+            })
+            continue
+
+        state["index"][key] = [digest, filename]
+        rows.append(row)
+
+    source["head"] = [min(HEAD_BYTES, source["offset"]), head_hash(filename, min(HEAD_BYTES, source["offset"]))]
+    return rows, errors
+
+
+def write_conflicts(conflicts, append):
+    if not conflicts and append:
+        return
+    exists = append and os.path.exists(CONFLICTS_FILE)
+    with open(CONFLICTS_FILE, "a" if append else "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CONFLICT_FIELDNAMES, delimiter=';', quotechar='"',
+                                quoting=csv.QUOTE_MINIMAL, lineterminator="\n")
+        if not exists:
+            writer.writeheader()
+        writer.writerows(conflicts)
+
+    differing = sum(1 for c in conflicts if c["reason"] == "abweichend")
+    if conflicts:
+        print(f"[WARNUNG] {len(conflicts)} Duplikate verworfen (davon {differing} mit abweichendem Inhalt), "
+              f"siehe {CONFLICTS_FILE}")
+
+
+def print_source(filename, rows, errors):
+    print(f"[INFO] Datei '{filename}' geladen. {errors} Fehler-Zeilen entfernt. {len(rows)} neue Zeilen behalten.")
+
+
+# --- MERGE ---
+
+def merge_full():
+    """
+    Liest alle Quellen vollständig und schreibt OUTPUT_FILE neu, sortiert nach ID und Modell.
+    Zeilenende "\n" wie in den Quelldateien (csv.DictWriter schreibt sonst "\r\n").
+    """
+    state = {"fieldnames": [], "output_size": 0, "sources": {}, "index": {}}
+    all_rows = []
+    conflicts = []
 
     for filename in FILES_TO_MERGE:
         if not os.path.exists(filename):
             print(f"[WARNUNG] Datei nicht gefunden (wird uebersprungen): {filename}")
             continue
+        source = state["sources"][filename] = {"offset": 0, "header": None}
+        rows, errors = collect_new_rows(filename, source, state, conflicts)
+        # Spalten aller Quellen vereinigen, in der Reihenfolge ihres ersten Auftretens
+        state["fieldnames"] += [name for name in source["header"] or [] if name not in state["fieldnames"]]
+        all_rows.extend(rows)
+        print_source(filename, rows, errors)
 
-        try:
-            # CSV lesen (Semikolon-getrennt)
-            df = pd.read_csv(filename, delimiter=";")
-            original_count = len(df)
+    if not all_rows:
+        print("[FEHLER] Keine Daten geladen. Abbruch.")
+        return False
 
-            # --- FILTERUNG ---
-            # Wir entfernen Zeilen, wo 'model_answer' das Wort 'ERROR' enthaelt
-            # Wir wandeln erst in String um, falls da komische Werte drin sind
-            # case=False bedeutet: egal ob 'ERROR', 'Error' oder 'error'
-            df_clean = df[~df["model_answer"].astype(str).str.contains("ERROR", case=False, na=False)]
+    all_rows.sort(key=sort_key)
+    tmp_file = OUTPUT_FILE + ".tmp"
+    with open(tmp_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=state["fieldnames"], delimiter=';', quotechar='"',
+                                quoting=csv.QUOTE_MINIMAL, restval="", lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(all_rows)
+    os.replace(tmp_file, OUTPUT_FILE)
 
-            # Zusaetzlich filtern wir explizit 'UNAVAILABLE' (Google 503 Fehler)
-            df_clean = df_clean[~df_clean["model_answer"].astype(str).str.contains("UNAVAILABLE", case=False, na=False)]
+    state["output_size"] = os.path.getsize(OUTPUT_FILE)
+    save_state(state)
+    write_conflicts(conflicts, append=False)
+    print(f"[INFO] Gesamtzeilen: {len(all_rows)}")
+    return True
 
-            filtered_count = len(df_clean)
-            removed = original_count - filtered_count
 
-            all_dfs.append(df_clean)
-            print(f"[INFO] Datei '{filename}' geladen. {removed} Fehler-Zeilen entfernt. {filtered_count} Zeilen behalten.")
+def merge_incremental(state):
+    """Hängt nur die seit dem letzten Merge hinzugekommenen Zeilen an. Gibt False zurück, wenn neu aufgebaut werden muss."""
+    if os.path.getsize(OUTPUT_FILE) > state["output_size"]:
+        # Zeilen eines abgebrochenen Merges, deren Zustand nie gespeichert wurde
+        with open(OUTPUT_FILE, "r+b") as f:
+            f.truncate(state["output_size"])
+        print(f"[INFO] Nicht abgeschlossene Zeilen am Ende von '{OUTPUT_FILE}' entfernt.")
 
-        except Exception as e:
-            print(f"[FEHLER] Konnte Datei '{filename}' nicht lesen: {e}")
+    conflicts = []
+    added = 0
+    with open(OUTPUT_FILE, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=state["fieldnames"], delimiter=';', quotechar='"',
+                                quoting=csv.QUOTE_MINIMAL, restval="", lineterminator="\n")
+        for filename in FILES_TO_MERGE:
+            if not os.path.exists(filename):
+                print(f"[WARNUNG] Datei nicht gefunden (wird uebersprungen): {filename}")
+                continue
+            source = state["sources"].setdefault(filename, {"offset": 0, "header": None})
+            if source["offset"] >= os.path.getsize(filename):
+                continue
 
-    if not all_dfs:
-        print("[FEHLER] Keine Daten geladen. Abbruch.")
-        return
+            rows, errors = collect_new_rows(filename, source, state, conflicts)
+            if any(name not in state["fieldnames"] for name in source["header"] or []):
+                print(f"[INFO] '{filename}' bringt neue Spalten mit.")
+                return False
+
+            rows.sort(key=sort_key)
+            writer.writerows(rows)
+            added += len(rows)
+            print_source(filename, rows, errors)
 
-    # Alles zusammenfuegen
-    full_df = pd.concat(all_dfs, ignore_index=True)
+        f.flush()
+        os.fsync(f.fileno())
 
-    # Sortieren nach ID (damit du das Duplikat leichter findest)
-    if 'id' in full_df.columns:
-        full_df['id'] = pd.to_numeric(full_df['id'], errors='coerce')
-        full_df = full_df.sort_values(by=['id', 'model'])
+    state["output_size"] = os.path.getsize(OUTPUT_FILE)
+    save_state(state)
+    write_conflicts(conflicts, append=True)
+    print(f"[INFO] {added} neue Zeilen angehängt, Gesamtzeilen: {len(state['index'])}")
+    return True
 
-    # Speichern (wieder als Semikolon-CSV fuer Excel)
-    full_df.to_csv(OUTPUT_FILE, sep=";", index=False, encoding="utf-8")
 
+def merge_simple(full_rebuild=FULL_REBUILD):
+    print("[STATUS] Starte Merge-Vorgang...")
+
+    state = None if full_rebuild else load_state()
+    reason = "FULL_REBUILD gesetzt" if full_rebuild else stale_reason(state)
+    if reason is None and merge_incremental(state):
+        print(f"[STATUS] Fertig.")
+        print(f"[INFO] Datei gespeichert unter: {OUTPUT_FILE}")
+        return
+
+    print(f"[INFO] Kompletter Neuaufbau ({reason or 'neue Spalten'}).")
+    if not merge_full():
+        return
     print(f"[STATUS] Fertig.")
-    print(f"[INFO] Gesamtzeilen: {len(full_df)}")
     print(f"[INFO] Datei gespeichert unter: {OUTPUT_FILE}")
 
+
 if __name__ == "__main__":
-    merge_simple()
\ No newline at end of file
+    merge_simple()
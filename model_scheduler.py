@@ -0,0 +1,127 @@
+import threading
+import time
+from HTW_Ollama_API import OllamaApi
+
+# --- KONFIGURATION ---
+VRAM_BUDGET_GB = 80             # Verfügbarer GPU-Speicher (H100: 80 GB)
+VRAM_OVERHEAD_FACTOR = 1.2      # Aufschlag auf die Dateigröße, wenn das Modell noch nie geladen war (KV-Cache etc.)
+# Geladene Modelle bleiben bis zum expliziten Entladen im Speicher. Jede Anfrage setzt keep_alive neu,
+# der Runner setzt daher auch OllamaApi.KEEP_ALIVE für die Fragen auf diesen Wert.
+LOAD_KEEP_ALIVE = "30m"
+
+GB = 1024 ** 3
+
+
+class ModelScheduler:
+    """
+    Lädt die Modelle eines Benchmarks nacheinander auf den Server.
+    Das vorherige Modell wird explizit entladen. Passt das nächste Modell zusätzlich in den
+    VRAM, wird es bereits während der letzten Fragen des aktuellen Modells im Hintergrund geladen.
+    Die Ladezeit wird pro Modell als eigene Metrik festgehalten.
+    """
+
+    def __init__(self, vram_budget_gb=VRAM_BUDGET_GB):
+        self.vram_budget = vram_budget_gb * GB
+        self.known_sizes = {}       # Modell -> VRAM-Bedarf in Bytes
+        self.preloads = {}          # Modell -> (Thread, Ergebnis-Dict)
+        self.load_metrics = {}      # Modell -> Lade-Metriken
+        self._lock = threading.Lock()
+
+    def resident_models(self, endpoint=None):
+        """
+        Aktuell geladene Modelle laut /api/ps: {name: size_vram in Bytes}.
+        Ohne endpoint über alle Server von OllamaApi.endpoints() (größter Wert pro Modell).
+        """
+        resident = {}
+        for url in [endpoint] if endpoint else OllamaApi.endpoints():
+            for model in OllamaApi.running_models(endpoint=url) or []:
+                name = model.get("name") or model.get("model")
+                size = model.get("size_vram") or model.get("size") or 0
+                resident[name] = max(resident.get(name, 0), size)
+                self.known_sizes[name] = max(self.known_sizes.get(name, 0), size)
+        return resident
+
+    def required_vram(self, model_name):
+        if model_name in self.known_sizes:
+            return self.known_sizes[model_name]
+        for model in OllamaApi.models() or []:
+            if (model.get("name") or model.get("model")) == model_name:
+                return int(model.get("size", 0) * VRAM_OVERHEAD_FACTOR)
+        return 0
+
+    def fits_alongside(self, model_name):
+        """True, wenn model_name auf jedem Server zusätzlich zu den dort geladenen Modellen in das VRAM-Budget passt."""
+        for endpoint in OllamaApi.endpoints():
+            resident = self.resident_models(endpoint)
+            if model_name in resident:
+                continue
+            if sum(resident.values()) + self.required_vram(model_name) > self.vram_budget:
+                return False
+        return True
+
+    def _load(self, model_name, result, options=None):
+        # Bei mehreren Ollama-Servern (OllamaApi.ENDPOINTS) wird das Modell auf jedem Server geladen.
+        # options wie bei den Fragen, sonst lädt Ollama das Modell bei der ersten Frage mit anderem num_ctx neu
+        start = time.perf_counter()
+        responses = [OllamaApi.load_model(model_name, keep_alive=LOAD_KEEP_ALIVE, endpoint=endpoint, options=options)
+                     for endpoint in OllamaApi.endpoints()]
+        loaded = [r for r in responses if r]
+        result.update({
+            "load_wall_time": round(time.perf_counter() - start, 3),
+            "load_duration": round(max(r["time_load"] for r in loaded), 3) if loaded else None,
+            "ok": bool(loaded)
+        })
+
+    def preload(self, model_name, options=None):
+        """
+        Startet das Laden von model_name im Hintergrund, falls es neben dem aktuellen Modell Platz hat.
+        options = Modell-Optionen der ersten Frage (vor allem num_ctx). Gibt True zurück, wenn vorgeladen wird.
+        """
+        with self._lock:
+            if model_name in self.preloads:
+                return True
+
+        if not self.fits_alongside(model_name):
+            print(f"\n   [INFO] {model_name} passt nicht zusätzlich in den VRAM, wird erst nach dem Entladen geladen.")
+            return False
+
+        result = {"preloaded": True}
+        thread = threading.Thread(target=self._load, args=(model_name, result, options), daemon=True)
+        with self._lock:
+            self.preloads[model_name] = (thread, result)
+        thread.start()
+        return True
+
+    def activate(self, model_name, previous_model=None, options=None):
+        """
+        Stellt sicher, dass model_name geladen ist, und entlädt vorher bzw. danach das vorherige Modell.
+        Gibt die Lade-Metriken zurück (Wartezeit im Benchmark, Ladezeit, vorgeladen ja/nein).
+        """
+        start = time.perf_counter()
+
+        with self._lock:
+            preload = self.preloads.pop(model_name, None)
+
+        if preload is not None:
+            thread, result = preload
+            thread.join()
+            if previous_model:
+                self.release(previous_model)
+        else:
+            # Kein Vorladen: zuerst Platz schaffen, dann laden
+            if previous_model:
+                self.release(previous_model)
+            result = {"preloaded": False}
+            self._load(model_name, result, options)
+
+        result["wait_time"] = round(time.perf_counter() - start, 3)
+        self.load_metrics[model_name] = result
+        return result
+
+    def release(self, model_name):
+        ok = True
+        for endpoint in OllamaApi.endpoints():
+            if OllamaApi.unload_model(model_name, endpoint=endpoint) is None:
+                print(f"\n   [WARNUNG] Modell {model_name} konnte auf {endpoint} nicht entladen werden.")
+                ok = False
+        return ok
@@ -0,0 +1,328 @@
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# --- KONFIGURATION ---
+# Lokaler Ersatz für den Ollama-Server der HTW, um OllamaApi und benchmark_runner.py ohne GPU zu testen.
+# Start: python ollama_stub_server.py, danach in HTW_Ollama_API.py HOST = "http://127.0.0.1" und PORT = 11435.
+HOST = "127.0.0.1"
+PORT = 11435
+
+MODELS = {                      # Name -> Dateigröße in GB (für /api/tags und /api/ps)
+    "llama3.1:8b": 4.9,
+    "llama3.3:70b": 42.5,
+    "phi4:latest": 9.1,
+}
+
+PREFILL_TPS = 4000.0            # Tokens/s beim Einlesen des Prompts
+DECODE_TPS = 60.0               # Tokens/s beim Generieren der Antwort
+OUTPUT_TOKENS = 64              # Antwortlänge, wenn options.num_predict nicht gesetzt ist
+LOAD_DELAY = 2.0                # Sekunden, um ein nicht geladenes Modell zu laden
+NUM_PARALLEL = 4                # Gleichzeitig bearbeitete Anfragen (wie OLLAMA_NUM_PARALLEL), weitere warten
+TIME_SCALE = 1.0                # Faktor auf alle Wartezeiten, z.B. 0.01 für schnelle Tests (gemeldete Zeiten werden mitskaliert)
+
+# Fehlerinjektion: Anteil der Anfragen, die mit einem der Status-Codes abgelehnt werden
+ERROR_RATE = 0.0
+ERROR_STATUSES = [429, 500, 503]
+RETRY_AFTER = 1                 # Sekunden im Retry-After-Header bei 429/503
+
+WORDS = ["The", "rule", "states", "that", "the", "ball", "is", "dead", "when", "a", "runner",
+         "is", "down", "and", "the", "down", "counts", "toward", "the", "series", "."]
+
+NS = 1_000_000_000
+GB = 1024 ** 3
+
+
+def estimate_tokens(text):
+    """Grobe Token-Schätzung (ca. 4 Zeichen pro Token), reicht für realistische Zeiten."""
+    return max(1, len(text or "") // 4)
+
+
+def keep_alive_seconds(value, default=300.0):
+    """Wandelt keep_alive von Ollama ("5m", "30s", "1h", 0, -1) in Sekunden um. -1 = unbegrenzt."""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    value = str(value).strip()
+    units = {"s": 1, "m": 60, "h": 3600}
+    try:
+        if value[-1] in units:
+            seconds = float(value[:-1]) * units[value[-1]]
+        else:
+            seconds = float(value)
+    except (ValueError, IndexError):
+        return default
+    return float("inf") if seconds < 0 else seconds
+
+
+def schema_answer(schema):
+    """Minimale Antwort, die zum JSON-Schema aus "format" passt (oder ein einfaches Objekt bei "json")."""
+    if not isinstance(schema, dict):
+        return {"answer": " ".join(WORDS[:8])}
+
+    defaults = {"string": "stub", "number": 0.5, "integer": 1, "boolean": False, "array": [], "object": {}}
+    answer = {}
+    for name, spec in schema.get("properties", {}).items():
+        if "enum" in spec:
+            answer[name] = spec["enum"][0]
+        elif spec.get("type") == "object":
+            answer[name] = schema_answer(spec)
+        else:
+            answer[name] = defaults.get(spec.get("type"), "stub")
+    return answer
+
+
+class StubState:
+    """Geladene Modelle, Slots für parallele Anfragen und Zähler. Wird von allen Handler-Threads geteilt."""
+
+    def __init__(self):
+        self.loaded = {}            # Modell -> Ablaufzeitpunkt (monotonic)
+        self.loading = {}           # Modell -> Lock, damit ein Modell nur einmal geladen wird
+        self.slots = threading.BoundedSemaphore(NUM_PARALLEL)
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def expire(self):
+        now = time.monotonic()
+        with self._lock:
+            for model in [m for m, until in self.loaded.items() if until <= now]:
+                del self.loaded[model]
+
+    def ensure_loaded(self, model, keep_alive):
+        """Lädt das Modell bei Bedarf (mit LOAD_DELAY). Gibt die Ladezeit in Sekunden zurück."""
+        self.expire()
+        with self._lock:
+            lock = self.loading.setdefault(model, threading.Lock())
+
+        load_time = 0.0
+        with lock:
+            with self._lock:
+                is_loaded = model in self.loaded
+            if not is_loaded:
+                start = time.perf_counter()
+                time.sleep(LOAD_DELAY * TIME_SCALE)
+                load_time = time.perf_counter() - start
+
+            with self._lock:
+                self.loaded[model] = time.monotonic() + keep_alive_seconds(keep_alive)
+        return load_time
+
+    def unload(self, model):
+        with self._lock:
+            self.loaded.pop(model, None)
+
+    def running(self):
+        self.expire()
+        with self._lock:
+            return dict(self.loaded)
+
+
+class OllamaStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # Keep-Alive wie beim echten Server
+    disable_nagle_algorithm = True  # Sonst verzögern Nagle/Delayed-ACK jede Antwort um ~40 ms
+    state = None                    # StubState, wird in create_server gesetzt
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- Antworten ---
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def send_chunk(self, data):
+        line = (json.dumps(data) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+    def end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def read_payload(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b"{}"
+        return json.loads(raw or b"{}")
+
+    # --- Routing ---
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self.send_json(200, {"models": [
+                {"name": name, "model": name, "size": int(size * GB), "details": {"format": "gguf"}}
+                for name, size in MODELS.items()
+            ]})
+        elif self.path == "/api/ps":
+            self.send_json(200, {"models": [
+                {"name": name, "model": name, "size": int(MODELS[name] * GB), "size_vram": int(MODELS[name] * GB)}
+                for name in self.state.running()
+            ]})
+        elif self.path == "/api/version":
+            self.send_json(200, {"version": "0.0.0-stub"})
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        try:
+            payload = self.read_payload()
+        except json.JSONDecodeError:
+            self.send_json(400, {"error": "invalid JSON"})
+            return
+
+        if self.path in ("/api/chat", "/api/generate"):
+            self.handle_generate(payload, chat=self.path == "/api/chat")
+        elif self.path == "/api/pull":
+            self.handle_pull(payload)
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def handle_pull(self, payload):
+        name = payload.get("model") or payload.get("name")
+        if name not in MODELS:
+            MODELS[name] = 4.0
+        steps = ["pulling manifest", "verifying sha256 digest", "writing manifest", "success"]
+        if payload.get("stream", True):
+            self.start_stream()
+            for status in steps:
+                self.send_chunk({"status": status})
+            self.end_stream()
+        else:
+            self.send_json(200, {"status": "success"})
+
+    def handle_generate(self, payload, chat):
+        state = self.state
+        with state._lock:
+            state.requests += 1
+
+        model = payload.get("model")
+        if model not in MODELS:
+            self.send_json(404, {"error": f"model '{model}' not found, try pulling it first"})
+            return
+
+        if ERROR_RATE and random.random() < ERROR_RATE:
+            status = random.choice(ERROR_STATUSES)
+            with state._lock:
+                state.errors += 1
+            headers = {"Retry-After": RETRY_AFTER} if status in (429, 503) else None
+            self.send_json(status, {"error": f"injected error {status}"}, headers)
+            return
+
+        if chat:
+            messages = payload.get("messages") or []
+            prompt_text = "".join(str(m.get("content", "")) for m in messages)
+        else:
+            prompt_text = payload.get("prompt") or ""
+        keep_alive = payload.get("keep_alive")
+        created_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+        # Leere Anfrage: Modell nur laden bzw. mit keep_alive = 0 entladen (wie Ollama)
+        if not prompt_text:
+            if keep_alive_seconds(keep_alive) == 0:
+                state.unload(model)
+                load_time, reason = 0.0, "unload"
+            else:
+                load_time, reason = state.ensure_loaded(model, keep_alive), "load"
+            empty = {"role": "assistant", "content": ""} if chat else ""
+            self.send_json(200, {
+                "model": model, "created_at": created_at,
+                **({"message": empty} if chat else {"response": empty}),
+                "done": True, "done_reason": reason,
+                "total_duration": int(load_time * NS), "load_duration": int(load_time * NS)
+            })
+            return
+
+        options = payload.get("options") or {}
+        num_predict = options.get("num_predict", -1)
+        output_tokens = OUTPUT_TOKENS if num_predict is None or num_predict < 0 else max(1, num_predict)
+
+        if payload.get("format"):
+            text = json.dumps(schema_answer(payload["format"]))
+            pieces = [text[i:i + 4] for i in range(0, len(text), 4)]
+        else:
+            pieces = [(" " if i else "") + WORDS[i % len(WORDS)] for i in range(output_tokens)]
+        prompt_tokens = estimate_tokens(prompt_text)
+
+        with state.slots:
+            start = time.perf_counter()
+            load_time = state.ensure_loaded(model, keep_alive)
+
+            prefill_start = time.perf_counter()
+            time.sleep(prompt_tokens / PREFILL_TPS * TIME_SCALE)
+            prefill_time = time.perf_counter() - prefill_start
+
+            decode_start = time.perf_counter()
+            if payload.get("stream", True):
+                self.start_stream()
+                for piece in pieces:
+                    time.sleep(TIME_SCALE / DECODE_TPS)
+                    content = {"message": {"role": "assistant", "content": piece}} if chat else {"response": piece}
+                    self.send_chunk({"model": model, "created_at": created_at, **content, "done": False})
+            else:
+                time.sleep(len(pieces) / DECODE_TPS * TIME_SCALE)
+            decode_time = time.perf_counter() - decode_start
+            total_time = time.perf_counter() - start
+
+        final = {
+            "model": model,
+            "created_at": created_at,
+            "done": True,
+            "done_reason": "stop" if not num_predict or num_predict < 0 or len(pieces) < num_predict else "length",
+            "total_duration": int(total_time * NS),
+            "load_duration": int(load_time * NS),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prefill_time * NS),
+            "eval_count": len(pieces),
+            "eval_duration": int(decode_time * NS)
+        }
+
+        if payload.get("stream", True):
+            empty = {"message": {"role": "assistant", "content": ""}} if chat else {"response": ""}
+            self.send_chunk({**final, **empty})
+            self.end_stream()
+        else:
+            text = "".join(pieces)
+            content = {"message": {"role": "assistant", "content": text}} if chat else {"response": text}
+            self.send_json(200, {**final, **content})
+
+
+def create_server(host=HOST, port=PORT):
+    """Erstellt den Stub-Server (port=0 wählt einen freien Port). Jeder Server hat eigene geladene Modelle."""
+    handler = type("OllamaStubHandler", (OllamaStubHandler,), {"state": StubState()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_background(host=HOST, port=0):
+    """Startet einen Stub-Server in einem Hintergrund-Thread. Gibt (server, base_url) zurück."""
+    server = create_server(host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    server = create_server()
+    print(f"[INFO] Ollama-Stub läuft auf http://{HOST}:{PORT} (Modelle: {', '.join(MODELS)})")
+    print(f"[INFO] Prefill {PREFILL_TPS} tok/s, Decode {DECODE_TPS} tok/s, Ladezeit {LOAD_DELAY}s, Fehlerrate {ERROR_RATE}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[INFO] Stub beendet.")
+        server.server_close()
@@ -0,0 +1,122 @@
+import csv
+import json
+import re
+import time
+
+import ftfy
+
+from HTW_Ollama_API import OllamaApi, JsonStreamChecker
+
+# --- KONFIGURATION ---
+# Micro-Benchmark der Nachbearbeitung in OllamaApi mit den Antworten aus den bisherigen Läufen.
+# Vergleicht den alten Ablauf (immer ftfy, unkompilierte Regex) mit dem Fast-Path und prüft, dass beide gleich ergeben.
+INPUT_FILE = "benchmark_results_merged.csv"
+REPEATS = 5                 # Bester von REPEATS Durchläufen zählt
+CHARS_PER_TOKEN = 4         # Für die Schätzung, wie viele Stream-Tokens beim frühen Abbruch gespart werden
+
+
+def legacy_fix_text(s):
+    """Alte Version von OllamaApi.fix_invalid_escapes: ftfy bei jeder Antwort."""
+    try:
+        s_re = ftfy.fix_text(s)
+        if s_re != s:
+            s = s_re
+    except Exception:
+        pass
+    return s
+
+
+def legacy_extract(message):
+    """Alte Version der Regex-Schritte aus OllamaApi.extract_json."""
+    if message.strip().startswith("<think>"):
+        message = re.sub(r"^\s*<think>.*?</think>\s*", "", message, flags=re.DOTALL).strip()
+    match = re.search(r'```json(.*?)```', message, re.DOTALL)
+    if match:
+        message = match.group(1).strip()
+    return json.loads(message)
+
+
+def fast_extract(message):
+    message, _, _ = OllamaApi.strip_json_wrappers(message)
+    return json.loads(message)
+
+
+def load_answers():
+    with open(INPUT_FILE, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f, delimiter=';')
+        return [row["model_answer"] for row in reader if row.get("model_answer")]
+
+
+def best_time(func, items):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(name, legacy, fast, count):
+    print(f"{name:<28} alt {legacy / count * 1e6:>9.1f} µs   neu {fast / count * 1e6:>9.1f} µs   "
+          f"Faktor {legacy / fast if fast else float('inf'):>6.1f}")
+
+
+def run_benchmark():
+    answers = load_answers()
+    clean = sum(1 for a in answers if OllamaApi.CLEAN_TEXT.fullmatch(a))
+    print(f"[INFO] {len(answers)} Antworten aus {INPUT_FILE}, davon {clean} ohne Reparaturbedarf (Fast-Path)")
+
+    # 1. ftfy: Ergebnis muss identisch sein
+    mismatches = [a for a in answers if legacy_fix_text(a) != OllamaApi.fix_invalid_escapes(a)]
+    if mismatches:
+        print(f"[FEHLER] {len(mismatches)} Antworten werden unterschiedlich repariert, z.B.: {mismatches[0][:80]!r}")
+
+    # 2. JSON-Extraktion: so wie die Antworten mit Schema, mit <think>-Block und in Markdown zurückkämen
+    documents = [json.dumps({"answer": a}, ensure_ascii=False) for a in answers]
+    variants = {
+        "JSON": documents,
+        "<think> + JSON": [f"<think>\nThe context says ...\n</think>\n{d}" for d in documents],
+        "```json Fence": [f"Here is the answer:\n```json\n{d}\n```" for d in documents],
+    }
+    for name, items in variants.items():
+        wrong = sum(1 for item in items if legacy_extract(item) != fast_extract(item))
+        if wrong:
+            print(f"[FEHLER] {name}: {wrong} Antworten werden unterschiedlich extrahiert")
+
+    print("-" * 90)
+    report("ftfy / fix_invalid_escapes", best_time(legacy_fix_text, answers),
+           best_time(OllamaApi.fix_invalid_escapes, answers), len(answers))
+    for name, items in variants.items():
+        report(f"Extraktion {name}", best_time(legacy_extract, items), best_time(fast_extract, items), len(items))
+
+    # 3. Früher Abbruch: freie Textantworten, obwohl ein Schema verlangt war
+    rejected = []
+    for answer in answers:
+        checker = JsonStreamChecker()
+        tokens = [answer[i:i + CHARS_PER_TOKEN] for i in range(0, len(answer), CHARS_PER_TOKEN)]
+        for n, token in enumerate(tokens, start=1):
+            if not checker.feed(token):
+                rejected.append((n, len(tokens)))
+                break
+
+    # Kosten des Checkers für gültiges JSON, Token für Token
+    streamed = [[d[i:i + CHARS_PER_TOKEN] for i in range(0, len(d), CHARS_PER_TOKEN)] for d in documents]
+
+    def check_stream(tokens):
+        checker = JsonStreamChecker()
+        for token in tokens:
+            checker.feed(token)
+
+    checker_time = best_time(check_stream, streamed)
+    print("-" * 90)
+    if rejected:
+        read = sum(n for n, _ in rejected)
+        total = sum(t for _, t in rejected)
+        print(f"[INFO] Ungültiges JSON: {len(rejected)} von {len(answers)} Antworten verworfen nach "
+              f"{read / len(rejected):.1f} statt {total / len(rejected):.1f} Tokens ({100 * (1 - read / total):.1f}% gespart)")
+    print(f"[INFO] Stream-Prüfung gültiger JSON-Antworten: {checker_time / len(streamed) * 1e6:.1f} µs pro Antwort")
+
+
+if __name__ == "__main__":
+    run_benchmark()
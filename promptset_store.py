@@ -0,0 +1,308 @@
+import glob
+import hashlib
+import json
+import os
+import time
+
+from benchmark_engine import build_system_prompt
+from rate_limiter import estimate_tokens
+from resume_index import iter_records
+
+# --- KONFIGURATION ---
+INPUT_FILE = "promptset.json"
+# Übersetztes Promptset: <Name>_compiled/index.json (Fragen, Hashes, Größen) und blobs.bin (Texte).
+# Wird automatisch neu erstellt, wenn sich promptset.json oder der System-Prompt ändert.
+COMPILED_SUFFIX = "_compiled"
+FORMAT_VERSION = 3
+
+# Gemessene Prompt-Größen (input_tokens) aus bisherigen Läufen; Modelle ohne Messung werden geschätzt.
+# Es zählen nur Zeilen mit context_hash und template_hash (schreibt benchmark_runner.py), die zum aktuellen
+# Kontext und System-Prompt passen. Ältere Zeilen ohne diese Spalten lassen sich nicht prüfen und werden ignoriert.
+# Die Messungen stehen getrennt vom Index in <Name>_compiled/measurements.json. Beim Laden werden nur die seit dem
+# letzten Mal angehängten Zeilen der Ergebnisdateien gelesen, neue Zeilen lösen also kein neues Übersetzen aus.
+RESULT_FILES = "benchmark_results_*.csv"
+MEASUREMENTS_FORMAT = 1
+TAIL_BYTES = 64                 # Letzte Bytes vor der gelesenen Position, erkennen neu geschriebene Dateien
+
+
+def content_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def file_hash(filename):
+    with open(filename, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def template_parts():
+    """Text vor und nach dem Kontext im System-Prompt."""
+    prefix, _, suffix = build_system_prompt("\x00").partition("\x00")
+    return prefix, suffix
+
+
+def template_hash():
+    # Ändert sich build_system_prompt, passen die gespeicherten Prompts nicht mehr
+    return content_hash(build_system_prompt("\x00"))
+
+
+def compiled_dir(filename):
+    return os.path.splitext(filename)[0] + COMPILED_SUFFIX
+
+
+def context_snippet(context_text):
+    # Wie in den Runnern: die ersten 50 Zeichen des Kontexts
+    return context_text[:50] + "..." if context_text else "EMPTY"
+
+
+def measurement_key(template, context_key, question):
+    return f"{template}|{context_key}|{content_hash(question or '')}"
+
+
+def read_tail(filename, offset):
+    with open(filename, "rb") as f:
+        f.seek(max(offset - TAIL_BYTES, 0))
+        return f.read(offset - max(offset - TAIL_BYTES, 0)).decode("utf-8", errors="replace")
+
+
+def update_measurements(folder, pattern=RESULT_FILES):
+    """
+    Sammelt input_tokens je (Vorlage, Kontext, Frage) und Modell aus den Ergebnisdateien, bei mehreren Messungen
+    die größte. measurements.json merkt sich pro Datei die Position hinter dem letzten gelesenen Datensatz:
+    ist die Datei nur gewachsen, werden nur die neuen Zeilen gelesen; wurde sie neu geschrieben (kleiner oder
+    andere Bytes vor der Position), wird sie ganz gelesen. Gibt {Schlüssel: {model: tokens}} zurück.
+    """
+    cache_file = os.path.join(folder, "measurements.json")
+    cache = {"format": MEASUREMENTS_FORMAT, "files": {}, "tokens": {}}
+    if os.path.exists(cache_file):
+        with open(cache_file, "r", encoding="utf-8") as f:
+            loaded = json.load(f)
+        if loaded.get("format") == MEASUREMENTS_FORMAT:
+            cache = loaded
+
+    changed = False
+    for filename in sorted(glob.glob(pattern)):
+        state = cache["files"].get(filename)
+        size = os.path.getsize(filename)
+        if state and size == state["offset"] and read_tail(filename, size) == state["tail"]:
+            continue
+        if not (state and size > state["offset"] and read_tail(filename, state["offset"]) == state["tail"]):
+            state = {"offset": 0, "header": None, "tail": ""}
+        changed = True
+
+        header, offset = state["header"], state["offset"]
+        for fields, end, complete in iter_records(filename, offset):
+            if fields is None or not complete:
+                break
+            offset = end
+            if header is None:
+                header = fields
+                continue
+            row = dict(zip(header, fields))
+            if not row.get("template_hash") or not row.get("context_hash"):
+                continue
+            try:
+                count = int(float(row.get("input_tokens") or 0))
+            except ValueError:
+                continue
+            if count > 0:
+                models = cache["tokens"].setdefault(
+                    measurement_key(row["template_hash"], row["context_hash"], row.get("question")), {})
+                model = row.get("model", "").strip()
+                models[model] = max(count, models.get(model, 0))
+        cache["files"][filename] = {"offset": offset, "header": header, "tail": read_tail(filename, offset)}
+
+    if changed:
+        os.makedirs(folder, exist_ok=True)
+        with open(cache_file + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(cache_file + ".tmp", cache_file)
+    return cache["tokens"]
+
+
+def compile_promptset(filename=INPUT_FILE):
+    """
+    Übersetzt promptset.json: jeder Kontext steht nur einmal in blobs.bin (Schlüssel: Hash des Kontexts),
+    index.json enthält die Fragen, Byte-Positionen und Größe des gerenderten System-Prompts.
+    Die gemessenen Token-Zahlen kommen beim Laden aus update_measurements dazu.
+    Der System-Prompt ist Vorlage + Kontext; nur wenn build_system_prompt davon abweicht, wird er extra gespeichert.
+    """
+    with open(filename, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+
+    target = compiled_dir(filename)
+    os.makedirs(target, exist_ok=True)
+
+    prefix, suffix = template_parts()
+    contexts = {}
+    entries = []
+    blob_file = os.path.join(target, "blobs.bin")
+    with open(blob_file + ".tmp", "wb") as blob:
+        def append(text):
+            data = text.encode("utf-8")
+            offset = blob.tell()
+            blob.write(data)
+            return [offset, len(data)]
+
+        for entry in questions:
+            context_text = entry.get("context_text", "")
+            key = content_hash(context_text)
+            if key not in contexts:
+                system_prompt = build_system_prompt(context_text)
+                contexts[key] = {
+                    "context": append(context_text),
+                    "snippet": context_snippet(context_text),
+                    "prompt_chars": len(system_prompt),
+                    "estimated_tokens": estimate_tokens(system_prompt),
+                }
+                if system_prompt != prefix + context_text + suffix:
+                    contexts[key]["system_prompt"] = append(system_prompt)
+
+            entries.append({
+                **{k: v for k, v in entry.items() if k != "context_text"},
+                "context_hash": key,
+                "estimated_tokens": contexts[key]["estimated_tokens"] + estimate_tokens(entry.get("question")),
+            })
+
+    index = {
+        "format": FORMAT_VERSION,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "source": {"file": os.path.basename(filename), "size": os.path.getsize(filename),
+                   "mtime": os.path.getmtime(filename), "sha1": file_hash(filename)},
+        "template": template_hash(),
+        "template_parts": [prefix, suffix],
+        "contexts": contexts,
+        "entries": entries,
+    }
+    index_file = os.path.join(target, "index.json")
+    with open(index_file + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(blob_file + ".tmp", blob_file)
+    os.replace(index_file + ".tmp", index_file)
+    return index
+
+
+class PromptEntry(dict):
+    """
+    Ein Eintrag wie in promptset.json. context_text und system_prompt werden erst beim Zugriff
+    aus blobs.bin gelesen (einmal pro Kontext, alle Fragen mit demselben Kontext teilen sich den Text).
+    """
+
+    def __init__(self, data, store):
+        super().__init__(data)
+        self._store = store
+
+    def __missing__(self, key):
+        if key == "context_text":
+            return self._store.context(self["context_hash"])
+        if key == "system_prompt":
+            return self._store.system_prompt(self["context_hash"])
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+class CompiledPromptset:
+    def __init__(self, filename=INPUT_FILE):
+        self.filename = filename
+        self.folder = compiled_dir(filename)
+        self.index = self._load_index()
+        self._apply_measurements(update_measurements(self.folder))
+        self._by_id = {str(entry.get("id")): entry for entry in self.index["entries"]}
+        self._texts = {}
+
+    def _load_index(self):
+        index_file = os.path.join(self.folder, "index.json")
+        if os.path.exists(index_file):
+            with open(index_file, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if not self._stale(index):
+                return index
+        print(f"[INFO] Übersetze {self.filename} nach {self.folder}/ ...")
+        return compile_promptset(self.filename)
+
+    def _stale(self, index):
+        if index.get("format") != FORMAT_VERSION or index.get("template") != template_hash():
+            return True
+        source = index["source"]
+        if os.path.getsize(self.filename) == source["size"] and os.path.getmtime(self.filename) == source["mtime"]:
+            return False
+        # Nur Zeitstempel geändert (z.B. nach git checkout): Inhalt vergleichen
+        return file_hash(self.filename) != source["sha1"]
+
+    def _apply_measurements(self, tokens):
+        """Trägt die gemessenen Prompt-Größen passend zu Vorlage, Kontext und Frage in die Einträge ein."""
+        template = self.index["template"]
+        models = set()
+        for entry in self.index["entries"]:
+            entry["prompt_tokens"] = dict(tokens.get(
+                measurement_key(template, entry["context_hash"], entry.get("question")), {}))
+            models.update(entry["prompt_tokens"])
+        self.index["models"] = sorted(models)
+
+    def _read(self, key, field):
+        cache_key = (key, field)
+        if cache_key not in self._texts:
+            offset, length = self.index["contexts"][key][field]
+            with open(os.path.join(self.folder, "blobs.bin"), "rb") as f:
+                f.seek(offset)
+                self._texts[cache_key] = f.read(length).decode("utf-8")
+        return self._texts[cache_key]
+
+    def context(self, key):
+        return self._read(key, "context")
+
+    def system_prompt(self, key):
+        if "system_prompt" in self.index["contexts"][key]:
+            return self._read(key, "system_prompt")
+        prefix, suffix = self.index["template_parts"]
+        return prefix + self.context(key) + suffix
+
+    def entries(self):
+        """Alle Fragen als PromptEntry (ohne Texte zu laden)."""
+        return [PromptEntry(entry, self) for entry in self.index["entries"]]
+
+    def prompt_tokens(self, question_id, model):
+        """
+        Prompt-Größe (System-Prompt plus Frage) in Tokens. Gemessen aus bisherigen Läufen, sonst die Schätzung
+        mit ca. 4 Zeichen pro Token. Gibt (tokens, gemessen) zurück.
+        """
+        entry = self._by_id[str(question_id)]
+        measured = entry["prompt_tokens"].get(model)
+        return (measured, True) if measured else (entry["estimated_tokens"], False)
+
+    def stats(self):
+        entries = self.index["entries"]
+        stats = {"questions": len(entries), "contexts": len(self.index["contexts"]), "models": {}}
+        for model in self.index["models"]:
+            counts = [e["prompt_tokens"][model] for e in entries if model in e["prompt_tokens"]]
+            stats["models"][model] = {"measured": len(counts), "min": min(counts), "max": max(counts)}
+        return stats
+
+
+def load_questions(filename=INPUT_FILE):
+    """Ersatz für json.load(promptset.json) in den Runnern: lädt das übersetzte Promptset (und erstellt es bei Bedarf)."""
+    return CompiledPromptset(filename).entries()
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    compile_promptset(INPUT_FILE)
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store = CompiledPromptset(INPUT_FILE)
+    questions = store.entries()
+    load_time = time.perf_counter() - start
+
+    folder = compiled_dir(INPUT_FILE)
+    size = sum(os.path.getsize(os.path.join(folder, name)) for name in ("index.json", "blobs.bin"))
+    stats = store.stats()
+    print(f"[INFO] {stats['questions']} Fragen, {stats['contexts']} verschiedene Kontexte "
+          f"({os.path.getsize(INPUT_FILE) / 1024:.0f} KB -> {size / 1024:.0f} KB in {folder}/)")
+    print(f"[INFO] Übersetzen: {compile_time * 1000:.0f} ms, Laden: {load_time * 1000:.1f} ms")
+    for model, s in stats["models"].items():
+        print(f"   -> {model}: {s['measured']} Prompt-Größen gemessen, {s['min']}-{s['max']} Tokens")
@@ -1,29 +1,19 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
-import csv
-import os
-import random
+import getpass
+import sqlite3
+from auto_grader import RUBRIC_TEXT
+from evaluation_store import open_store, export_all
 
 # --- KONFIGURATION ---
-INPUT_FILE = "benchmark_results_merged.csv"
-OUTPUT_FILE = "evaluation_completed.csv"
-
-# Rubrik-Definitionen für die Anzeige
-RUBRIC_TEXT = (
-    "BEWERTUNGS-LEITFADEN:\n"
-    "---------------------------------------------------------\n"
-    "🔴 0.0 Pkt (Falsch/Halluzination):\n"
-    "   - Antwort widerspricht dem Kontext.\n"
-    "   - Erfindet Fakten (Halluzination).\n"
-    "   - Bei Kat 4 (Rejection): Modell gibt eine Antwort statt zu verweigern.\n\n"
-    "🟡 0.5 Pkt (Teilweise/Ungenau):\n"
-    "   - Im Kern richtig, aber wichtige Details fehlen.\n"
-    "   - Zu viel irrelevantes Geschwafel (Low Precision).\n\n"
-    "🟢 1.0 Pkt (Korrekt & Vollständig):\n"
-    "   - Faktisch korrekt laut Kontext.\n"
-    "   - Vollständig (alle Bedingungen genannt).\n"
-    "   - Bei Kat 4: Korrekte Verweigerung ('Dazu habe ich keine Infos')."
-)
+# Die Bewertungen liegen in evaluation.db (evaluation_store.py), Ein- und Ausgabedateien sind dort konfiguriert.
+# evaluation_completed.csv und die Excel-Übersicht werden beim Beenden bzw. mit "python evaluation_store.py" exportiert.
+# Mehrere Bewerter können gleichzeitig arbeiten, jede Antwort wird nur einem Bewerter zugeteilt.
+RATER = getpass.getuser()
+
+# Review-Modus: nur die Antworten aus dem automatischen Judge (auto_grader.py), bei denen der Judge
+# unsicher war oder anders als die manuelle Bewertung entschieden hat (Export: evaluation_review.csv)
+REVIEW_MODE = False
 
 class BlindRaterApp:
     def __init__(self, root):
@@ -33,13 +23,14 @@ class BlindRaterApp:
         self.root.geometry("1400x900")
 
         # Daten laden
-        self.todo_list = []
-        self.current_index = 0
-        self.load_data()
+        self.source = "review" if REVIEW_MODE else "human"
+        self.store = open_store()
+        self.rated_in_session = 0
+        self.current = self.store.claim_next(RATER, self.source)
 
-        if not self.todo_list:
+        if self.current is None:
             messagebox.showinfo("Fertig", "Alle Antworten wurden bereits bewertet!")
-            root.destroy()
+            self.close()
             return
 
         # GUI Aufbau
@@ -50,34 +41,18 @@ class BlindRaterApp:
         self.root.bind('1', lambda event: self.save_rating(0.0))  # Taste 1 -> 0 Punkte
         self.root.bind('2', lambda event: self.save_rating(0.5))  # Taste 2 -> 0.5 Punkte
         self.root.bind('3', lambda event: self.save_rating(1.0))  # Taste 3 -> 1.0 Punkte
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
 
-    def load_data(self):
-        evaluated_ids = set()
-        # Prüfen, was schon da ist
-        if os.path.exists(OUTPUT_FILE):
-            try:
-                with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
-                    # Semikolon wichtig!
-                    reader = csv.DictReader(f, delimiter=';')
-                    for row in reader:
-                        unique_key = f"{row['id']}_{row['model']}"
-                        evaluated_ids.add(unique_key)
-            except Exception as e:
-                print(f"Warnung beim Laden existierender Daten: {e}")
-
-        if not os.path.exists(INPUT_FILE):
-            messagebox.showerror("Fehler", f"Datei {INPUT_FILE} nicht gefunden!")
-            return
-
-        with open(INPUT_FILE, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f, delimiter=';')
-            rows = list(reader)
-            random.shuffle(rows) # Mischen für Blind-Test
-
-            for row in rows:
-                unique_key = f"{row['id']}_{row['model']}"
-                if unique_key not in evaluated_ids:
-                    self.todo_list.append(row)
+    def close(self):
+        # Nicht bewertete Zuteilung freigeben und CSV/Excel aktualisieren
+        self.store.release(RATER, self.source)
+        try:
+            export_all(self.store)
+        except PermissionError as e:
+            messagebox.showwarning("Export", f"Export nicht möglich, Datei ist geöffnet (z.B. in Excel):\n{e}\n"
+                                             "Die Bewertungen sind in der Datenbank gespeichert.")
+        self.store.close()
+        self.root.destroy()
 
     def setup_ui(self):
         # Hauptcontainer
@@ -151,16 +126,16 @@ class BlindRaterApp:
         btn_1.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
 
     def show_current_question(self):
-        if self.current_index >= len(self.todo_list):
+        if self.current is None:
             messagebox.showinfo("Fertig", "Bewertung abgeschlossen!")
-            self.root.destroy()
+            self.close()
             return
 
-        data = self.todo_list[self.current_index]
+        data = self.current
 
         # Header Infos
-        remaining = len(self.todo_list) - self.current_index
-        self.lbl_progress.config(text=f"Noch offen: {remaining} | Gesamt in Session: {len(self.todo_list)}")
+        remaining = self.store.remaining(self.source)
+        self.lbl_progress.config(text=f"Noch offen: {remaining} | Bewertet in Session: {self.rated_in_session} | Bewerter: {RATER}")
 
         # Kategorie einfärben bei Kat 4
         cat_text = data['category']
@@ -193,24 +168,17 @@ class BlindRaterApp:
         self.txt_model_answer.config(state=tk.DISABLED)
 
     def save_rating(self, score):
-        data = self.todo_list[self.current_index]
-        data['score'] = score
-
-        file_exists = os.path.exists(OUTPUT_FILE)
-        fieldnames = list(data.keys())
+        data = self.current
 
-        # Speichern
+        # Speichern (eine Transaktion, Datei-Sperren durch Excel spielen keine Rolle mehr)
         try:
-            with open(OUTPUT_FILE, "a", newline="", encoding="utf-8") as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-                if not file_exists:
-                    writer.writeheader()
-                writer.writerow(data)
-        except PermissionError:
-            messagebox.showerror("Fehler", f"Bitte schließe die Datei {OUTPUT_FILE} in Excel!")
+            self.store.save_rating(data['id'], data['model'], score, RATER, self.source, data.get('review_reason'))
+        except sqlite3.OperationalError as e:
+            messagebox.showerror("Fehler", f"Bewertung konnte nicht gespeichert werden: {e}")
             return
 
-        self.current_index += 1
+        self.rated_in_session += 1
+        self.current = self.store.claim_next(RATER, self.source)
         self.show_current_question()
 
 if __name__ == "__main__":
@@ -0,0 +1,211 @@
+import random
+import threading
+import time
+
+# Verhalten bei Drosselung (429/503)
+DECREASE_FACTOR = 0.5       # Rate wird bei jeder Drosselung mit diesem Faktor multipliziert
+INCREASE_SHARE = 0.01       # Nach jeder erfolgreichen Anfrage steigt die Rate um diesen Anteil des Maximums
+MAX_RETRIES = 6
+BASE_DELAY = 1.0            # Sekunden, verdoppelt sich pro Versuch (mit Jitter)
+MAX_DELAY = 60.0
+
+THROTTLE_STATUS = (429, 503)
+THROTTLE_KEYWORDS = ["429", "503", "RESOURCE_EXHAUSTED", "UNAVAILABLE", "RATE LIMIT", "RATE_LIMIT", "OVERLOADED"]
+
+
+class RateLimiter:
+    """
+    Token-Bucket für Anfragen pro Minute (rpm) und Tokens pro Minute (tpm).
+    Die aktuelle Rate startet beim konfigurierten Maximum, wird bei Drosselung halbiert
+    und steigt mit jeder erfolgreichen Anfrage langsam wieder an (AIMD).
+    Kann von mehreren Threads gleichzeitig benutzt werden.
+    """
+
+    def __init__(self, rpm, tpm=None, burst_seconds=10):
+        self.max_rpm = float(rpm)
+        self.rpm = float(rpm)
+        self.tpm = float(tpm) if tpm else None
+        self.burst_seconds = burst_seconds
+
+        self.request_bucket = self._request_capacity()
+        self.token_bucket = self._token_capacity()
+        self.blocked_until = 0.0
+        self.last_refill = time.monotonic()
+
+        self.throttles = 0
+        self.wait_time = 0.0
+        self._lock = threading.Lock()
+
+    def _request_capacity(self):
+        return max(1.0, self.rpm * self.burst_seconds / 60)
+
+    def _token_capacity(self):
+        return self.tpm * self.burst_seconds / 60 if self.tpm else None
+
+    def _refill(self, now):
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        self.request_bucket = min(self._request_capacity(), self.request_bucket + elapsed * self.rpm / 60)
+        if self.tpm:
+            self.token_bucket = min(self._token_capacity(), self.token_bucket + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens=0):
+        """Blockiert, bis eine Anfrage mit geschätzt `tokens` Tokens erlaubt ist. Gibt die Wartezeit zurück."""
+        waited = 0.0
+        if self.tpm:
+            # Größere Anfragen als der Bucket würden sonst nie durchgelassen
+            tokens = min(tokens, self._token_capacity())
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                delay = max(0.0, self.blocked_until - now)
+                if delay == 0 and self.request_bucket < 1:
+                    delay = (1 - self.request_bucket) * 60 / self.rpm
+                if delay == 0 and self.tpm and self.token_bucket < tokens:
+                    delay = (tokens - self.token_bucket) * 60 / self.tpm
+
+                if delay == 0:
+                    self.request_bucket -= 1
+                    if self.tpm:
+                        self.token_bucket -= tokens
+                    self.wait_time += waited
+                    return waited
+
+            time.sleep(delay)
+            waited += delay
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """Korrigiert den Token-Bucket um die Differenz zwischen Schätzung und tatsächlichem Verbrauch."""
+        if not self.tpm:
+            return
+        with self._lock:
+            self.token_bucket -= actual_tokens - estimated_tokens
+
+    def on_success(self):
+        with self._lock:
+            self.rpm = min(self.max_rpm, self.rpm + self.max_rpm * INCREASE_SHARE)
+
+    def on_throttle(self, retry_after=None):
+        with self._lock:
+            self.throttles += 1
+            self.rpm = max(1.0, self.rpm * DECREASE_FACTOR)
+            self.request_bucket = min(self.request_bucket, 0.0)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def stats(self):
+        return {
+            "rpm": round(self.rpm, 2),
+            "max_rpm": self.max_rpm,
+            "tpm": self.tpm,
+            "throttles": self.throttles,
+            "wait_time": round(self.wait_time, 3)
+        }
+
+
+def status_code(error):
+    """HTTP-Status einer Exception (OpenAI: status_code, google-genai: code, requests: response.status_code)."""
+    for attr in ("status_code", "code", "status"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_throttle_error(error):
+    if status_code(error) in THROTTLE_STATUS:
+        return True
+    message = str(error).upper()
+    return any(keyword in message for keyword in THROTTLE_KEYWORDS)
+
+
+def retry_after_seconds(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        return float(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def call_with_backoff(func, limiter=None, tokens=0, max_retries=MAX_RETRIES):
+    """
+    Ruft func() über den RateLimiter auf. Bei 429/503 wird die Rate gesenkt und nach
+    exponentiellem Backoff mit Full-Jitter erneut versucht, andere Fehler werden direkt weitergereicht.
+    """
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            limiter.acquire(tokens)
+        try:
+            result = func()
+        except Exception as e:
+            if not is_throttle_error(e) or attempt == max_retries:
+                raise
+            retry_after = retry_after_seconds(e)
+            if limiter is not None:
+                limiter.on_throttle(retry_after)
+            delay = retry_after or random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+            print(f" [DROSSELUNG: neuer Versuch in {delay:.1f}s] ", end="", flush=True)
+            time.sleep(delay)
+            continue
+
+        if limiter is not None:
+            limiter.on_success()
+        return result
+
+
+def estimate_tokens(*texts):
+    """Grobe Token-Schätzung vor der Anfrage (ca. 4 Zeichen pro Token)."""
+    return sum(len(text or "") for text in texts) // 4
+
+
+class ThrottleError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class QuotaStub:
+    """
+    Lokaler Stub für Tests: erlaubt `limit` Anfragen pro gleitendem Zeitfenster (Standard: eine Minute)
+    und antwortet darüber hinaus wie eine Cloud-API mit 429 (oder 503).
+    """
+
+    def __init__(self, limit, status=429, window=60.0):
+        self.limit = limit
+        self.status = status
+        self.window = window
+        self.calls = []
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            now = time.monotonic()
+            self.calls = [t for t in self.calls if now - t < self.window]
+            if len(self.calls) >= self.limit:
+                self.rejected += 1
+                raise ThrottleError(self.status)
+            self.calls.append(now)
+        return "ok"
+
+
+if __name__ == "__main__":
+    # Kurzer Selbsttest gegen den Stub mit 20 Anfragen pro 10 Sekunden (= 120 rpm):
+    # Limiter startet mit 4-facher Rate und muss sich auf das Kontingent herunterregeln
+    MAX_DELAY = 5.0
+    stub = QuotaStub(limit=20, window=10.0)
+    limiter = RateLimiter(rpm=20 * 6 * 4, burst_seconds=1)
+
+    start = time.monotonic()
+    for i in range(60):
+        call_with_backoff(stub, limiter)
+    duration = time.monotonic() - start
+
+    print(f"\n[INFO] 60 Anfragen in {duration:.1f}s, {stub.rejected} gedrosselt")
+    print(f"[INFO] Limiter: {limiter.stats()}")
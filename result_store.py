@@ -0,0 +1,258 @@
+import csv
+import glob
+import hashlib
+import json
+import os
+import time
+import uuid
+from urllib.parse import quote
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from resume_index import is_valid_answer
+
+# --- KONFIGURATION ---
+STORE_DIR = "result_store"
+RESULTS_DIR = os.path.join(STORE_DIR, "results")            # results/run=<run>/model=<model>/part-*.parquet
+PROMPTSET_FILE = os.path.join(STORE_DIR, "promptset.parquet")
+PROMPTSET_JSON = "promptset.json"
+
+CSV_FIELDNAMES = ["id", "category", "model", "time_total", "time_read", "time_write", "input_tokens", "output_tokens",
+                  "tps_read", "tps_write", "question", "model_answer", "ground_truth", "context_snippet"]
+
+# Typisierte Spalten pro Ergebnis. Frage, Musterlösung und Kontext stehen nur einmal in der Promptset-Tabelle,
+# verknüpft über prompt_key (ändert sich der Text einer Frage, bekommt die neue Fassung einen eigenen Schlüssel).
+# run und model sind Partitionen (Verzeichnisse), nicht Teil der Dateien.
+RESULT_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("prompt_key", pa.string()),
+    ("seq", pa.int64()),                # Reihenfolge innerhalb einer Datei
+    ("time_total", pa.float64()),
+    ("time_read", pa.float64()),
+    ("time_write", pa.float64()),
+    ("input_tokens", pa.int64()),
+    ("output_tokens", pa.int64()),
+    ("tps_read", pa.float64()),
+    ("tps_write", pa.float64()),
+    ("time_load", pa.float64()),
+    ("time_first_token", pa.float64()),
+    ("endpoint", pa.string()),
+    ("model_answer", pa.string()),
+    ("written_at", pa.timestamp("s")),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([("run", pa.string()), ("model", pa.string())]), flavor="hive")
+
+PROMPTSET_SCHEMA = pa.schema([
+    ("prompt_key", pa.string()),
+    ("id", pa.string()),
+    ("category", pa.dictionary(pa.int32(), pa.string())),
+    ("question", pa.string()),
+    ("ground_truth", pa.string()),
+    ("source_ref", pa.string()),
+    ("context_snippet", pa.string()),
+])
+
+FLOAT_COLUMNS = [f.name for f in RESULT_SCHEMA if pa.types.is_floating(f.type)]
+INT_COLUMNS = ["input_tokens", "output_tokens"]
+PROMPT_COLUMNS = ["category", "question", "ground_truth", "context_snippet"]
+
+
+def to_number(value, cast):
+    if value in (None, ""):
+        return None
+    try:
+        return cast(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def context_snippet(context_text):
+    # Wie in den Runnern: die ersten 50 Zeichen des Kontexts
+    return context_text[:50] + "..." if context_text else "EMPTY"
+
+
+def prompt_key(id, question, ground_truth, snippet):
+    data = json.dumps([str(id), question or "", ground_truth or "", snippet or ""], ensure_ascii=False)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()[:16]
+
+
+def partition_dir(run, model):
+    # Modellnamen wie "llama3.1:8b" URI-kodieren (":" ist unter Windows in Pfaden nicht erlaubt)
+    return os.path.join(RESULTS_DIR, f"run={quote(str(run), safe='')}", f"model={quote(str(model), safe='')}")
+
+
+# --- SCHREIBEN ---
+
+def read_promptset():
+    if not os.path.exists(PROMPTSET_FILE):
+        return {}
+    return {row["prompt_key"]: row for row in pq.read_table(PROMPTSET_FILE).to_pylist()}
+
+
+def save_promptset(prompts):
+    os.makedirs(STORE_DIR, exist_ok=True)
+    table = pa.Table.from_pylist(list(prompts.values()), schema=PROMPTSET_SCHEMA)
+    pq.write_table(table, PROMPTSET_FILE)
+
+
+def write_promptset(questions=None):
+    """Übernimmt alle Fragen aus promptset.json in die Referenztabelle (eine Zeile pro Fassung einer Frage)."""
+    if questions is None:
+        with open(PROMPTSET_JSON, "r", encoding="utf-8") as f:
+            questions = json.load(f)
+
+    prompts = read_promptset()
+    for entry in questions:
+        snippet = context_snippet(entry.get("context_text", ""))
+        key = prompt_key(entry.get("id"), entry.get("question"), entry.get("ground_truth", ""), snippet)
+        prompts[key] = {
+            "prompt_key": key,
+            "id": str(entry.get("id")),
+            "category": entry.get("category"),
+            "question": entry.get("question"),
+            "ground_truth": entry.get("ground_truth", ""),
+            "source_ref": entry.get("source_ref"),
+            "context_snippet": snippet,
+        }
+    save_promptset(prompts)
+    return len(prompts)
+
+
+def append_rows(rows, run):
+    """
+    Schreibt Ergebniszeilen (Dicts wie in den Runnern) als neue Parquet-Datei je Modell-Partition.
+    Fehlerzeilen (ERROR, leere Antwort) sind keine Messung und werden ausgelassen.
+    Zahlen werden typisiert, fehlende optionale Spalten bleiben leer. Noch unbekannte Fassungen von
+    Frage/Musterlösung/Kontext werden in die Promptset-Tabelle aufgenommen. Gibt die Anzahl geschriebener Zeilen zurück.
+    """
+    prompts = read_promptset()
+    known = len(prompts)
+    by_model = {}
+    for row in rows:
+        if is_valid_answer(row.get("model_answer")):
+            by_model.setdefault(row.get("model"), []).append(row)
+
+    written_at = int(time.time())
+    for model, model_rows in by_model.items():
+        records = []
+        for seq, row in enumerate(model_rows):
+            key = prompt_key(row.get("id"), row.get("question"), row.get("ground_truth"), row.get("context_snippet"))
+            if key not in prompts:
+                prompts[key] = {name: row.get(name) for name in PROMPT_COLUMNS}
+                prompts[key].update({"prompt_key": key, "id": str(row.get("id")), "source_ref": None})
+
+            record = {"id": str(row.get("id")), "prompt_key": key, "seq": seq, "model_answer": row.get("model_answer"),
+                      "endpoint": row.get("endpoint") or None, "written_at": written_at}
+            for name in FLOAT_COLUMNS:
+                record[name] = to_number(row.get(name), float)
+            for name in INT_COLUMNS:
+                record[name] = to_number(row.get(name), int)
+            records.append(record)
+
+        folder = partition_dir(run, model)
+        os.makedirs(folder, exist_ok=True)
+        table = pa.Table.from_pylist(records, schema=RESULT_SCHEMA)
+        pq.write_table(table, os.path.join(folder, f"part-{written_at}-{uuid.uuid4().hex[:8]}.parquet"))
+
+    if len(prompts) != known:
+        save_promptset(prompts)
+    return sum(len(r) for r in by_model.values())
+
+
+def import_csv(filename, run=None):
+    """Übernimmt eine bestehende Ergebnis-CSV als eigenen Lauf (Standard: Dateiname ohne Endung)."""
+    run = run or os.path.splitext(os.path.basename(filename))[0]
+    with open(filename, "r", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f, delimiter=';'))
+    return run, append_rows(rows, run)
+
+
+# --- LESEN ---
+
+def dataset():
+    return ds.dataset(RESULTS_DIR, format="parquet", partitioning=PARTITIONING)
+
+
+def load_results(columns=None, runs=None, models=None, with_prompts=False):
+    """
+    Lädt Ergebnisse als pandas DataFrame. Gelesen werden nur die angegebenen Spalten (plus run und model)
+    und die Partitionen der angegebenen Läufe/Modelle.
+    with_prompts=True ergänzt Kategorie, Frage, Musterlösung und Kontext aus der Promptset-Tabelle.
+    """
+    if not os.path.isdir(RESULTS_DIR):
+        raise FileNotFoundError(f"Kein Ergebnis-Speicher unter '{RESULTS_DIR}'.")
+
+    condition = None
+    if runs is not None:
+        condition = ds.field("run").isin(list(runs))
+    if models is not None:
+        model_condition = ds.field("model").isin(list(models))
+        condition = model_condition if condition is None else condition & model_condition
+
+    if columns is not None:
+        # Die Partitionsspalten kommen aus den Verzeichnisnamen und kosten nichts
+        columns = list(dict.fromkeys(["run", "model", *(["prompt_key"] if with_prompts else []), *columns]))
+    table = dataset().to_table(columns=columns, filter=condition)
+
+    if with_prompts:
+        prompts = pq.read_table(PROMPTSET_FILE, columns=["prompt_key", *PROMPT_COLUMNS, "source_ref"])
+        prompts = prompts.set_column(prompts.schema.get_field_index("category"), "category",
+                                     prompts.column("category").cast(pa.string()))
+        table = table.join(prompts, keys="prompt_key", join_type="left outer")
+    return table.to_pandas()
+
+
+def list_runs():
+    """Alle Läufe im Speicher (aus den Verzeichnisnamen, ohne Dateien zu lesen)."""
+    return sorted(dataset().to_table(columns=["run"]).column("run").unique().to_pylist())
+
+
+def export_csv(filename, runs=None, models=None):
+    """Exportiert im bisherigen Semikolon-Format (z.B. für Excel) mit Frage, Musterlösung und Kontext."""
+    df = load_results(runs=runs, models=models, with_prompts=True)
+    df = df.sort_values(by=["run", "model", "written_at", "seq"], kind="stable")
+    fieldnames = CSV_FIELDNAMES + [c for c in ("time_load", "time_first_token", "endpoint") if df[c].notna().any()]
+
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';', quotechar='"',
+                                quoting=csv.QUOTE_MINIMAL, extrasaction="ignore", restval="")
+        writer.writeheader()
+        for record in df.to_dict("records"):
+            row = {}
+            for name in fieldnames:
+                value = record.get(name)
+                if value is None or (isinstance(value, float) and value != value):
+                    row[name] = ""
+                elif name in ("time_total", "time_read", "time_write", "time_load", "time_first_token"):
+                    row[name] = f"{value:.3f}"
+                elif name in ("tps_read", "tps_write"):
+                    row[name] = f"{value:.2f}"
+                elif name in INT_COLUMNS:
+                    row[name] = int(value)
+                else:
+                    row[name] = value
+            writer.writerow(row)
+    return len(df)
+
+
+if __name__ == "__main__":
+    # Bestehende Ergebnis-CSVs (ohne die zusammengeführte Datei) als je einen Lauf übernehmen
+    files = sorted(f for f in glob.glob("benchmark_results_*.csv") if "merged" not in f)
+    if os.path.isdir(RESULTS_DIR) and list_runs():
+        print(f"[INFO] Ergebnis-Speicher enthält bereits Läufe: {list_runs()}")
+        files = [f for f in files if os.path.splitext(f)[0] not in list_runs()]
+
+    for filename in files:
+        run, count = import_csv(filename)
+        print(f"[INFO] {filename}: {count} Zeilen als Lauf '{run}' übernommen.")
+
+    prompts = write_promptset()
+    print(f"[INFO] Promptset-Tabelle mit {prompts} Fragen-Fassungen: {PROMPTSET_FILE}")
+
+    csv_size = sum(os.path.getsize(f) for f in files)
+    store_size = sum(os.path.getsize(f) for f in glob.glob(os.path.join(STORE_DIR, "**", "*.parquet"), recursive=True))
+    if csv_size:
+        print(f"[INFO] Größe: CSV {csv_size / 1024:.0f} KB, Parquet {store_size / 1024:.0f} KB")
@@ -0,0 +1,111 @@
+import csv
+import os
+
+# Antworten mit diesen Texten gelten nicht als erledigt und werden beim Fortsetzen erneut abgefragt
+ERROR_KEYWORDS = ["ERROR", "UNAVAILABLE", "EMPTY RESPONSE"]
+
+
+def iter_records(filename, start=0):
+    """
+    Liest eine Semikolon-CSV und liefert für jeden Datensatz (felder, end_offset, vollständig).
+    end_offset ist die Byte-Position direkt hinter dem Datensatz, vollständig ist False,
+    wenn der Datensatz nicht mit einem Zeilenumbruch endet (abgebrochener Schreibvorgang).
+    Mehrzeilige Felder in Anführungszeichen werden korrekt als ein Datensatz behandelt.
+    Mit start > 0 beginnt das Lesen an dieser Byte-Position (muss ein Datensatzanfang sein, ohne Kopfzeile).
+    """
+    state = {"offset": start, "newline": True}
+
+    with open(filename, "rb") as f:
+        f.seek(start)
+        def lines():
+            for raw in f:
+                state["offset"] += len(raw)
+                state["newline"] = raw.endswith(b"\n")
+                yield raw.decode("utf-8", errors="replace")
+
+        reader = csv.reader(lines(), delimiter=';', quotechar='"')
+        while True:
+            try:
+                fields = next(reader)
+            except StopIteration:
+                return
+            except csv.Error:
+                # Datei endet mitten in einem Feld in Anführungszeichen
+                yield None, state["offset"], False
+                return
+            yield fields, state["offset"], state["newline"]
+
+
+def repair_partial_write(filename):
+    """
+    Schneidet einen unvollständig geschriebenen letzten Datensatz ab (z.B. nach einem Absturz),
+    damit weitere Zeilen sauber angehängt werden können. Gibt True zurück, wenn etwas entfernt wurde.
+    """
+    if not os.path.exists(filename):
+        return False
+
+    header = None
+    good_end = 0
+    for fields, end_offset, complete in iter_records(filename):
+        if header is None:
+            if fields is None or not complete:
+                break
+            header = fields
+        elif fields is None or not complete or len(fields) != len(header):
+            break
+        good_end = end_offset
+
+    size = os.path.getsize(filename)
+    if good_end >= size:
+        return False
+
+    with open(filename, "r+b") as f:
+        f.truncate(good_end)
+    print(f"[INFO] Unvollständige letzte Zeile in '{filename}' entfernt ({size - good_end} Bytes).")
+    return True
+
+
+def is_valid_answer(answer):
+    if answer is None or not answer.strip():
+        return False
+    upper = answer.upper()
+    return not any(keyword in upper for keyword in ERROR_KEYWORDS)
+
+
+def load_completed_pairs(*filenames):
+    """
+    Baut den Index aller bereits erledigten (id, model)-Paare aus einer oder mehreren Ergebnisdateien.
+    Fehlerzeilen und leere Antworten zählen nicht als erledigt.
+    """
+    completed = set()
+
+    for filename in filenames:
+        if not os.path.exists(filename):
+            continue
+
+        header = None
+        for fields, _, complete in iter_records(filename):
+            if fields is None or not complete:
+                break
+            if header is None:
+                header = fields
+                if "id" not in header or "model" not in header:
+                    print(f"[WARNUNG] '{filename}' hat keine Spalten 'id'/'model', wird beim Fortsetzen ignoriert.")
+                    break
+                col_id = header.index("id")
+                col_model = header.index("model")
+                col_answer = header.index("model_answer") if "model_answer" in header else None
+                continue
+            if len(fields) != len(header):
+                continue
+
+            answer = fields[col_answer] if col_answer is not None else "x"
+            if is_valid_answer(answer):
+                completed.add((fields[col_id].strip(), fields[col_model].strip()))
+
+    return completed
+
+
+def pending_questions(questions, model_name, completed):
+    """Filtert die Fragen, die für model_name noch nicht erledigt sind (Reihenfolge bleibt erhalten)."""
+    return [entry for entry in questions if (str(entry.get("id")), model_name) not in completed]
@@ -0,0 +1,382 @@
+import csv
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from benchmark_engine import build_system_prompt
+from promptset_store import content_hash, load_questions
+from rate_limiter import estimate_tokens
+
+# --- KONFIGURATION ---
+# BM25-Retrieval: statt des ganzen context_text kommen nur die TOP_K passendsten Abschnitte in den System-Prompt.
+INPUT_FILE = "promptset.json"
+TOP_K = 3
+# "own"    = nur Abschnitte aus dem Kontext der Frage (gleiche Quelle wie im Promptset, nur gekürzt)
+# "global" = Abschnitte aus allen Kontexten des Promptsets (echte Suche über das Regelwerk)
+SCOPE = "own"
+MAX_CHUNK_CHARS = 1500          # Längere Artikel werden an Absatzgrenzen weiter geteilt
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+EVALUATION_FILE = "evaluation_completed.csv"    # Für den Vergleich der Scores (voll vs. Retrieval)
+MODEL_SUFFIX = "+bm25"                          # Kennzeichnung der Retrieval-Läufe in der Spalte model
+REPORT_FILE = "retrieval_report.json"
+
+SECTION_PATTERN = re.compile(r"^SECTION\s+(\d+)\b", re.IGNORECASE)
+ARTICLE_PATTERN = re.compile(r"^ARTICLE\s+(\d+)\.")
+TOKEN_PATTERN = re.compile(r"[a-z0-9äöüß]+")
+
+STOPWORDS = {
+    # Englisch (Regeltext)
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "he", "his", "if", "in", "is", "it",
+    "its", "may", "of", "on", "or", "shall", "that", "the", "their", "there", "this", "to", "was", "when",
+    "which", "who", "will", "with",
+    # Deutsch (Fragen)
+    "der", "die", "das", "den", "dem", "des", "ein", "eine", "einen", "einem", "einer", "ist", "sind", "und",
+    "oder", "wie", "was", "wann", "wer", "wo", "ab", "bei", "beim", "mit", "im", "in", "zu", "zum", "zur",
+    "es", "man", "sich", "darf", "dürfen", "muss", "müssen", "kann", "gibt", "gilt", "wenn", "dann", "auch",
+    "nicht", "als", "auf", "für", "vom", "von", "welche", "welcher", "welches", "mir",
+}
+
+# Fragen sind deutsch, das Regelwerk englisch. Das Glossar enthält allgemeine Football-Begriffe und ist bewusst
+# nicht auf die Fragen des Promptsets zugeschnitten, sonst misst die Trefferquote das Glossar statt des Retrievals.
+# Schlüssel werden gegen die Tokens der Frage geprüft: ganze Wörter, mehrere Wörter als Folge ("nach vorne"),
+# ein "*" am Ende erlaubt zusammengesetzte Wörter ("torpfost*" passt auf "Torpfostens", "feld" nicht auf "Spielfeld").
+# Englische Fachbegriffe in den Fragen bleiben ohnehin erhalten.
+GLOSSARY = {
+    # Spielfeld
+    "spielfeld*": "field", "feld": "field", "seitenlinie*": "sideline", "linie": "line", "endzone*": "end zone",
+    "torpfost*": "goal post", "tor": "goal", "seitenaus": "out bounds", "ins aus": "out bounds",
+    # Spieler und Offizielle
+    "spieler": "player", "mitspieler": "teammate", "mannschaft*": "team", "gegner*": "opponent",
+    "angriff*": "offense offensive", "verteidigung*": "defense defensive", "verteidiger": "defender",
+    "ballträger": "runner", "passempfänger": "receiver", "schiedsrichter*": "official referee", "trainer": "coach",
+    # Ausrüstung
+    "ball": "ball", "bälle": "ball", "spielball": "ball", "ausrüstung": "equipment", "helm": "helmet",
+    "trikot*": "jersey", "nummer": "number",
+    # Spielablauf
+    "spielzug*": "play", "versuch": "down", "anstoß": "kickoff", "spielzeit": "period", "viertel": "quarter",
+    "halbzeit": "half", "verlängerung": "overtime", "auszeit": "timeout", "nach vorne": "forward",
+    "vorwärts": "forward", "rückwärts": "backward", "raumgewinn": "gain yard",
+    # Aktionen
+    "werfen": "pass thrown", "wirft": "pass thrown", "geworfen": "pass thrown", "gepasst": "pass",
+    "fangen": "catch", "fängt": "catch", "gefangen": "catch", "berühr*": "touch", "blockt": "block",
+    "blocken": "block", "gefumbelt": "fumble", "übergeben": "handoff", "treten": "kick", "getreten": "kick",
+    # Wertung und Strafen
+    "punkt": "point", "punkte": "point", "extrapunkt": "try extra point", "fieldgoal": "field goal",
+    "erzielen": "score", "erzielt": "score", "strafe*": "penalty", "regelwidrig": "illegal", "verstoß": "foul",
+}
+
+GLOSSARY_TERMS = None
+
+
+def normalize(token):
+    # Einfacher Plural-Abgleich für englische Wörter (balls -> ball), kurze Wörter bleiben unverändert
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [normalize(t) for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def glossary_key(key):
+    """Übersetzt einen GLOSSARY-Schlüssel in den Suchtext für glossary_text: Wörter mit Leerzeichen begrenzt."""
+    if key.endswith("*"):
+        return " " + " ".join(TOKEN_PATTERN.findall(key[:-1]))
+    return " " + " ".join(normalize(w) for w in TOKEN_PATTERN.findall(key)) + " "
+
+
+def glossary_text(question):
+    # Ohne Stoppwort-Filter, damit Schlüssel wie "ins aus" oder "nach vorne" als Wortfolge erkannt werden
+    return " " + " ".join(normalize(t) for t in TOKEN_PATTERN.findall(question.lower())) + " "
+
+
+def query_terms(question):
+    """Suchbegriffe einer deutschen Frage: die Wörter selbst plus Übersetzungen aus GLOSSARY."""
+    global GLOSSARY_TERMS
+    if GLOSSARY_TERMS is None:
+        GLOSSARY_TERMS = [(glossary_key(key), tokenize(value)) for key, value in GLOSSARY.items()]
+
+    # Nur ganze Wörter: " feld " steht nicht in " spielfeld ", " torpfost" (Präfix) aber in " torpfosten "
+    text = glossary_text(question)
+    terms = tokenize(question)
+    for needle, translation in GLOSSARY_TERMS:
+        if needle in text:
+            terms += translation
+    return terms
+
+
+def rule_number(source_ref):
+    match = re.search(r"Rule\s*(\d+)", source_ref or "")
+    return int(match.group(1)) if match else None
+
+
+def split_context(context_text, max_chars=MAX_CHUNK_CHARS):
+    """
+    Zerlegt einen Kontext an "SECTION n"- und "ARTICLE n."-Zeilen. Jeder Abschnitt erhält die SECTION-Zeile als
+    Überschrift, Text vor dem ersten Artikel ist ein eigener Abschnitt. Gibt [(section, article, part, text)] zurück.
+    """
+    chunks = []
+    section, header, article, lines = None, "", None, []
+
+    def flush():
+        text = "\n".join(lines).strip()
+        if not text:
+            return
+        # Lange Artikel an Zeilengrenzen teilen, jeder Teil mit Überschrift
+        parts, current = [], ""
+        for line in text.split("\n"):
+            if current and len(current) + len(line) > max_chars:
+                parts.append(current)
+                current = ""
+            current = f"{current}\n{line}" if current else line
+        parts.append(current)
+        for i, part in enumerate(parts):
+            chunks.append((section, article, i, f"{header}\n{part}" if header else part))
+
+    for line in context_text.split("\n"):
+        stripped = line.strip()
+        section_match = SECTION_PATTERN.match(stripped)
+        article_match = ARTICLE_PATTERN.match(stripped)
+        if section_match:
+            flush()
+            section, header, article, lines = int(section_match.group(1)), stripped, None, []
+        elif article_match:
+            flush()
+            article, lines = int(article_match.group(1)), [line]
+        else:
+            lines.append(line)
+    flush()
+    return chunks
+
+
+class Retriever:
+    """
+    Invertierter Index über alle Abschnitte der Kontexte im Promptset. Die BM25-Gewichte je (Begriff, Abschnitt)
+    hängen nicht von der Frage ab und werden beim Aufbau berechnet; eine Suche ist dann nur noch Aufsummieren der
+    Posting-Listen der Suchbegriffe (np.bincount).
+    """
+
+    def __init__(self, questions, top_k=TOP_K, scope=SCOPE):
+        self.top_k = top_k
+        self.scope = scope
+        self.chunks = []            # {"context", "rule", "section", "article", "part", "text"}
+        context_ids = {}
+
+        for entry in questions:
+            key = entry.get("context_hash") or content_hash(entry.get("context_text", ""))
+            if key in context_ids:
+                continue
+            context_ids[key] = len(context_ids)
+            rule = rule_number(entry.get("source_ref"))
+            for section, article, part, text in split_context(entry.get("context_text", "")):
+                self.chunks.append({"context": key, "rule": rule, "section": section, "article": article,
+                                    "part": part, "text": text})
+
+        self.context_index = context_ids
+        self.chunk_context = np.array([context_ids[c["context"]] for c in self.chunks], dtype=np.int32)
+        self._build_index()
+        self._cache = {}
+
+    def _build_index(self):
+        vocabulary = {}
+        term_ids, doc_ids, counts = [], [], []
+        lengths = np.zeros(len(self.chunks), dtype=np.float64)
+        for doc, chunk in enumerate(self.chunks):
+            tokens = tokenize(chunk["text"])
+            lengths[doc] = len(tokens)
+            tf = {}
+            for token in tokens:
+                tf[token] = tf.get(token, 0) + 1
+            for token, count in tf.items():
+                term_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+                doc_ids.append(doc)
+                counts.append(count)
+
+        term_ids = np.array(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind="stable")
+        self.vocabulary = vocabulary
+        self.postings_docs = np.array(doc_ids, dtype=np.int32)[order]
+        tf = np.array(counts, dtype=np.float64)[order]
+        # Posting-Liste von Begriff t: postings_docs[ptr[t]:ptr[t + 1]]
+        self.ptr = np.concatenate(([0], np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)))))
+
+        n = len(self.chunks)
+        df = np.diff(self.ptr)
+        idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(lengths.mean(), 1.0))
+        self.postings_weights = np.repeat(idf, df) * tf * (BM25_K1 + 1) / (tf + norm[self.postings_docs])
+
+    def scores(self, question):
+        """BM25-Score jedes Abschnitts für die Frage."""
+        ids = sorted({self.vocabulary[t] for t in query_terms(question) if t in self.vocabulary})
+        if not ids:
+            return np.zeros(len(self.chunks))
+        slices = [np.arange(self.ptr[t], self.ptr[t + 1]) for t in ids]
+        postings = np.concatenate(slices)
+        return np.bincount(self.postings_docs[postings], weights=self.postings_weights[postings],
+                           minlength=len(self.chunks))
+
+    def retrieve(self, entry):
+        """Indizes der TOP_K besten Abschnitte für eine Frage, in der Reihenfolge des Regeltexts."""
+        key = (str(entry.get("id")), entry.get("question"))
+        if key not in self._cache:
+            scores = self.scores(entry.get("question") or "")
+            if self.scope == "own":
+                context = entry.get("context_hash") or content_hash(entry.get("context_text", ""))
+                scores = np.where(self.chunk_context == self.context_index[context], scores, -np.inf)
+            candidates = np.flatnonzero(np.isfinite(scores))
+            k = min(self.top_k, len(candidates))
+            # Bei gleichem Score gewinnt der frühere Abschnitt (stabile Sortierung)
+            best = candidates[np.argsort(-scores[candidates], kind="stable")[:k]]
+            self._cache[key] = sorted(best.tolist())
+        return self._cache[key]
+
+    def label(self, index):
+        chunk = self.chunks[index]
+        # Wie im Regelwerk zitiert (Regel-Section-Artikel), geteilte Artikel mit Teilnummer
+        parts = [chunk["rule"], chunk["section"], chunk["article"]]
+        label = "-".join(str(p) for p in parts if p is not None)
+        return f"{label}#{chunk['part'] + 1}" if chunk["part"] else label
+
+    def context_text(self, entry):
+        return "\n\n".join(self.chunks[i]["text"] for i in self.retrieve(entry))
+
+    def system_prompt(self, entry):
+        return build_system_prompt(self.context_text(entry))
+
+    def chunk_labels(self, entry):
+        return " ".join(self.label(i) for i in self.retrieve(entry))
+
+
+_retrievers = {}
+
+
+def get_retriever(filename=INPUT_FILE):
+    """Retriever für ein Promptset, einmal pro Prozess aufgebaut."""
+    key = (os.path.abspath(filename), TOP_K, SCOPE)
+    if key not in _retrievers:
+        _retrievers[key] = Retriever(load_questions(filename))
+    return _retrievers[key]
+
+
+def expected_sections(source_ref):
+    """(Regel, Section) und Artikel-Nummern aus source_ref, z.B. 'Rule 3, Section 2, Article 3 & 4'."""
+    rule = rule_number(source_ref)
+    sections = {(rule, int(s)) for s in re.findall(r"Section\s*(\d+)", source_ref or "")}
+    articles = {int(a) for group in re.findall(r"Articles?\s*([\d\s&,]+)", source_ref or "")
+                for a in re.findall(r"\d+", group)}
+    return sections, articles
+
+
+def hit(retriever, entry):
+    """True, wenn ein gefundener Abschnitt zur Quelle der Frage (source_ref) passt."""
+    sections, articles = expected_sections(entry.get("source_ref"))
+    for i in retriever.retrieve(entry):
+        chunk = retriever.chunks[i]
+        if (chunk["rule"], chunk["section"]) in sections and (not articles or chunk["article"] in articles):
+            return True
+    return False
+
+
+def offline_report(questions, retriever):
+    """Trefferquote gegen source_ref und geschätzte Prompt-Verkleinerung, ohne Server."""
+    start = time.perf_counter()
+    for entry in questions:
+        retriever.scores(entry.get("question") or "")
+    lookup_us = (time.perf_counter() - start) / max(len(questions), 1) * 1e6
+
+    per_category = {}
+    for entry in questions:
+        full = estimate_tokens(build_system_prompt(entry.get("context_text", "")), entry.get("question"))
+        reduced = estimate_tokens(retriever.system_prompt(entry), entry.get("question"))
+        stats = per_category.setdefault(entry.get("category"), {"questions": 0, "full_tokens": 0, "retrieval_tokens": 0,
+                                                                "hits": 0})
+        stats["questions"] += 1
+        stats["full_tokens"] += full
+        stats["retrieval_tokens"] += reduced
+        stats["hits"] += int(hit(retriever, entry))
+
+    for stats in per_category.values():
+        stats["reduction"] = round(1 - stats["retrieval_tokens"] / stats["full_tokens"], 3)
+        stats["hit_rate"] = round(stats["hits"] / stats["questions"], 3)
+    return {"chunks": len(retriever.chunks), "vocabulary": len(retriever.vocabulary),
+            "lookup_us": round(lookup_us, 1), "categories": per_category}
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def compare_scores(filename=EVALUATION_FILE):
+    """
+    Vergleicht bewertete Läufe mit vollem Kontext (model) und mit Retrieval (model + MODEL_SUFFIX)
+    auf denselben Fragen: Score, input_tokens und time_read.
+    """
+    rows = {}
+    with open(filename, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f, delimiter=';'):
+            rows.setdefault(row.get("model", "").strip(), {}).setdefault(row.get("id", "").strip(), row)
+
+    comparison = {}
+    for model in sorted(rows):
+        if not model.endswith(MODEL_SUFFIX) or model[:-len(MODEL_SUFFIX)] not in rows:
+            continue
+        base = model[:-len(MODEL_SUFFIX)]
+        shared = sorted(set(rows[base]) & set(rows[model]))
+        result = {"pairs": len(shared)}
+        for name in ("score", "input_tokens", "time_read"):
+            pairs = [(to_float(rows[base][i].get(name)), to_float(rows[model][i].get(name))) for i in shared]
+            pairs = [(a, b) for a, b in pairs if a is not None and b is not None]
+            if pairs:
+                result[name] = {"full": round(sum(a for a, _ in pairs) / len(pairs), 4),
+                                "retrieval": round(sum(b for _, b in pairs) / len(pairs), 4)}
+        scores = [(to_float(rows[base][i].get("score")), to_float(rows[model][i].get("score"))) for i in shared]
+        result["score_lost"] = sum(1 for a, b in scores if a is not None and b is not None and b < a)
+        result["score_gained"] = sum(1 for a, b in scores if a is not None and b is not None and b > a)
+        comparison[base] = result
+    return comparison
+
+
+if __name__ == "__main__":
+    questions = load_questions(INPUT_FILE)
+    start = time.perf_counter()
+    retriever = Retriever(questions)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    report = {"created": time.strftime("%Y-%m-%d %H:%M:%S"),
+              "settings": {"top_k": TOP_K, "scope": SCOPE, "max_chunk_chars": MAX_CHUNK_CHARS,
+                           "k1": BM25_K1, "b": BM25_B},
+              "build_ms": round(build_ms, 1), "offline": offline_report(questions, retriever)}
+    offline = report["offline"]
+    print(f"[INFO] Index: {offline['chunks']} Abschnitte, {offline['vocabulary']} Begriffe, "
+          f"aufgebaut in {build_ms:.0f} ms, Suche {offline['lookup_us']:.0f} µs pro Frage")
+    print(f"[INFO] Top {TOP_K}, Bereich '{SCOPE}' (Tokens geschätzt, Treffer = Abschnitt aus source_ref gefunden):")
+    for category, stats in sorted(offline["categories"].items()):
+        print(f"   -> {category:<24} {stats['full_tokens'] / stats['questions']:>6.0f} -> "
+              f"{stats['retrieval_tokens'] / stats['questions']:>5.0f} Tokens ({stats['reduction'] * 100:.0f}% weniger), "
+              f"Treffer {stats['hits']}/{stats['questions']}")
+
+    if os.path.exists(EVALUATION_FILE):
+        report["scores"] = compare_scores(EVALUATION_FILE)
+        for model, result in report["scores"].items():
+            score = result.get("score", {})
+            tokens = result.get("input_tokens", {})
+            print(f"[INFO] {model} vs. {model}{MODEL_SUFFIX} ({result['pairs']} Fragen): "
+                  f"Score {score.get('full')} -> {score.get('retrieval')}, "
+                  f"input_tokens {tokens.get('full')} -> {tokens.get('retrieval')}, "
+                  f"schlechter {result['score_lost']}, besser {result['score_gained']}")
+        if not report["scores"]:
+            print(f"[INFO] {EVALUATION_FILE} enthält noch keine Retrieval-Läufe ({MODEL_SUFFIX}).")
+
+    with open(REPORT_FILE, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"[INFO] Bericht gespeichert in: {REPORT_FILE}")
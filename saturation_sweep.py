@@ -0,0 +1,216 @@
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import benchmark_runner
+from HTW_Ollama_API import OllamaApi
+from benchmark_engine import system_prompt_for
+from promptset_store import load_questions
+
+# --- KONFIGURATION ---
+# Sättigungstest: erhöht die Zahl gleichzeitiger Anfragen Stufe für Stufe und misst, ab wann der Durchsatz
+# (Output-Tokens/s über alle Anfragen) nicht mehr steigt, während die Latenz weiter wächst.
+# Das Ergebnis ist die Grundlage für MAX_IN_FLIGHT_PER_MODEL im Runner und OLLAMA_NUM_PARALLEL am Server.
+MODEL = "llama3.3:70b"
+OPTIONS = dict(benchmark_runner.CONFIG_OPTIONS)      # Gleiche Einstellungen wie im Benchmark
+CONCURRENCY_LEVELS = [1, 2, 4, 6, 8, 12, 16, 24, 32]
+ROUNDS_PER_LEVEL = 3            # Anfragen pro Stufe = Gleichzeitigkeit * ROUNDS_PER_LEVEL (mindestens MIN_REQUESTS)
+MIN_REQUESTS = 8
+INPUT_FILE = "promptset.json"   # Prompts reihum aus dem Promptset (System-Prompt mit Kontext plus Frage)
+
+# Knie: höchste Stufe, bis zu der jeder Schritt noch mindestens KNEE_EFFICIENCY des linearen Zuwachses bringt
+# (Verdopplung der Gleichzeitigkeit -> mindestens 25% des doppelten Durchsatzes zusätzlich)
+KNEE_EFFICIENCY = 0.25
+LATENCY_LIMIT = 3.0             # Empfehlung nur bis p95-Latenz <= LATENCY_LIMIT * p95 bei einer Anfrage
+MAX_ERROR_RATE = 0.05           # Abbruch der Rampe, wenn mehr Anfragen fehlschlagen (Server überlastet)
+
+# Gegen ollama_stub_server.py statt gegen OllamaApi.HOST:PORT (Test ohne GPU-Server)
+USE_STUB = False
+STUB_SETTINGS = {
+    "PREFILL_TPS": 50000.0,
+    "DECODE_TPS": 400.0,
+    "OUTPUT_TOKENS": 64,
+    "LOAD_DELAY": 0.0,
+    "NUM_PARALLEL": 8,
+}
+
+REPORT_FILE = "capacity_report.json"
+
+
+def percentile(values, q):
+    return OllamaApi.percentile(values, q)
+
+
+def build_prompts(filename=INPUT_FILE):
+    return [[{"role": "system", "content": system_prompt_for(entry)}, {"role": "user", "content": entry.get("question")}]
+            for entry in load_questions(filename)]
+
+
+def run_level(concurrency, prompts, offset=0):
+    """Schickt concurrency * ROUNDS_PER_LEVEL Anfragen mit concurrency Threads. Gibt die Kennzahlen der Stufe zurück."""
+    count = max(MIN_REQUESTS, concurrency * ROUNDS_PER_LEVEL)
+
+    def one_request(i):
+        start = time.perf_counter()
+        response = OllamaApi.chat(prompts[(offset + i) % len(prompts)], model=MODEL, options=OPTIONS,
+                                  stream=False, cache=False)
+        return time.perf_counter() - start, response
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one_request, range(count)))
+    wall_time = time.perf_counter() - wall_start
+
+    ok = [(t, r) for t, r in results if r and r.get("result") is not None]
+    latency = [t for t, _ in ok]
+    time_read = [float(r.get("time_read", 0)) for _, r in ok]
+    time_write = [float(r.get("time_write", 0)) for _, r in ok]
+    # Wartezeit außerhalb der Verarbeitung (Warteschlange am Server, Netzwerk)
+    queue = [max(0.0, t - float(r.get("time", 0))) for t, r in ok]
+    tokens = sum(int(r.get("token", 0)) for _, r in ok)
+    tps_write = [int(r.get("token", 0)) / write for (_, r), write in zip(ok, time_write) if write > 0]
+
+    def stats(values):
+        return {"mean": round(statistics.mean(values), 4) if values else None,
+                "p50": round(percentile(values, 50), 4), "p95": round(percentile(values, 95), 4),
+                "p99": round(percentile(values, 99), 4)}
+
+    return {
+        "concurrency": concurrency,
+        "requests": count,
+        "errors": count - len(ok),
+        "wall_time": round(wall_time, 3),
+        "tokens_per_s": round(tokens / wall_time, 2) if wall_time else 0.0,
+        "requests_per_s": round(len(ok) / wall_time, 3) if wall_time else 0.0,
+        "latency": stats(latency),
+        "time_read": stats(time_read),
+        "time_write": stats(time_write),
+        "queue": stats(queue),
+        # Decode-Geschwindigkeit einer einzelnen Anfrage: sinkt, wenn sich Anfragen die GPU teilen
+        "tps_write_per_request": round(statistics.median(tps_write), 2) if tps_write else None,
+    }
+
+
+def find_knee(levels):
+    """
+    Höchste Stufe, bis zu der jeder Schritt mindestens KNEE_EFFICIENCY des linearen Zuwachses bringt:
+    (tps_neu / tps_alt - 1) / (c_neu / c_alt - 1). Danach steigt nur noch die Latenz.
+    """
+    knee = levels[0]
+    for previous, current in zip(levels, levels[1:]):
+        if not previous["tokens_per_s"]:
+            break
+        gain = current["tokens_per_s"] / previous["tokens_per_s"] - 1
+        linear = current["concurrency"] / previous["concurrency"] - 1
+        current["efficiency"] = round(gain / linear, 3)
+        if current["efficiency"] < KNEE_EFFICIENCY:
+            break
+        knee = current
+    return knee
+
+
+def capacity_report(levels):
+    knee = find_knee(levels)
+    base_p95 = levels[0]["latency"]["p95"]
+    within_limit = [level for level in levels if level["latency"]["p95"] <= base_p95 * LATENCY_LIMIT
+                    and level["concurrency"] <= knee["concurrency"]]
+    recommended = within_limit[-1] if within_limit else levels[0]
+    best = max(levels, key=lambda level: level["tokens_per_s"])
+    return {
+        "knee_concurrency": knee["concurrency"],
+        "knee_tokens_per_s": knee["tokens_per_s"],
+        "max_tokens_per_s": best["tokens_per_s"],
+        "max_at_concurrency": best["concurrency"],
+        "recommended_concurrency": recommended["concurrency"],
+        "recommended_p95_latency": recommended["latency"]["p95"],
+        "single_request_p95_latency": base_p95,
+    }
+
+
+def print_table(levels):
+    print("-" * 104)
+    print(f"{'Parallel':>8} {'Anfr.':>6} {'Fehler':>6} {'Tok/s':>9} {'Tok/s/Anfr.':>11} {'Lat p50':>8} {'p95':>8} "
+          f"{'p99':>8} {'read p50':>9} {'write p50':>10} {'Warten p50':>11} {'Eff.':>6}")
+    for level in levels:
+        efficiency = level.get("efficiency")
+        print(f"{level['concurrency']:>8} {level['requests']:>6} {level['errors']:>6} {level['tokens_per_s']:>9.1f} "
+              f"{level['tps_write_per_request'] or 0:>11.1f} {level['latency']['p50']:>8.2f} "
+              f"{level['latency']['p95']:>8.2f} {level['latency']['p99']:>8.2f} {level['time_read']['p50']:>9.3f} "
+              f"{level['time_write']['p50']:>10.3f} {level['queue']['p50']:>11.3f} "
+              f"{'-' if efficiency is None else f'{efficiency:.2f}':>6}")
+    print("-" * 104)
+
+
+def run_sweep():
+    server = None
+    saved = (OllamaApi.HOST, OllamaApi.PORT, OllamaApi.ENDPOINTS)
+    if USE_STUB:
+        import ollama_stub_server
+        for name, value in STUB_SETTINGS.items():
+            setattr(ollama_stub_server, name, value)
+        server, url = ollama_stub_server.start_in_background()
+        host, port = url.rsplit(":", 1)
+        OllamaApi.HOST, OllamaApi.PORT, OllamaApi.ENDPOINTS = host, int(port), None
+        print(f"[INFO] Stub läuft auf {url}")
+
+    levels = []
+    # Eine Verbindung pro gleichzeitiger Anfrage, sonst baut der Pool ab POOL_SIZE ständig neue Verbindungen auf
+    saved_pool_size = OllamaApi.POOL_SIZE
+    OllamaApi.configure_pool(pool_size=max(CONCURRENCY_LEVELS))
+    try:
+        prompts = build_prompts()
+        print(f"[INFO] Sättigungstest {MODEL} an {', '.join(OllamaApi.endpoints())}: "
+              f"{len(prompts)} Prompts, Stufen {CONCURRENCY_LEVELS}")
+        # Modell vorab laden (mit num_ctx aus OPTIONS), damit die Ladezeit nicht in der ersten Stufe landet
+        if OllamaApi.load_model(MODEL, options=OPTIONS) is None:
+            print(f"[FEHLER] Konnte Modell {MODEL} nicht laden.")
+            return None
+
+        offset = 0
+        for concurrency in CONCURRENCY_LEVELS:
+            print(f"[STATUS] {concurrency} gleichzeitige Anfragen ...", flush=True)
+            level = run_level(concurrency, prompts, offset)
+            offset += level["requests"]
+            levels.append(level)
+            if level["errors"] > level["requests"] * MAX_ERROR_RATE:
+                print(f"[WARNUNG] {level['errors']}/{level['requests']} Anfragen fehlgeschlagen, Rampe abgebrochen.")
+                break
+    finally:
+        OllamaApi.HOST, OllamaApi.PORT, OllamaApi.ENDPOINTS = saved
+        OllamaApi.configure_pool(pool_size=saved_pool_size)
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    if not levels or not levels[0]["tokens_per_s"]:
+        print("[FEHLER] Keine verwertbaren Messungen.")
+        return None
+
+    capacity = capacity_report(levels)
+    print_table(levels)
+    print(f"[INFO] Knie bei {capacity['knee_concurrency']} gleichzeitigen Anfragen "
+          f"({capacity['knee_tokens_per_s']:.1f} Tok/s, Maximum {capacity['max_tokens_per_s']:.1f} Tok/s "
+          f"bei {capacity['max_at_concurrency']})")
+    print(f"[INFO] Empfehlung: MAX_IN_FLIGHT_PER_MODEL = {capacity['recommended_concurrency']} "
+          f"(p95 {capacity['recommended_p95_latency']:.2f}s, einzeln {capacity['single_request_p95_latency']:.2f}s)")
+
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "model": MODEL,
+        "endpoints": [url] if USE_STUB else OllamaApi.endpoints(),
+        "stub_settings": STUB_SETTINGS if USE_STUB else None,
+        "options": OPTIONS,
+        "settings": {"levels": CONCURRENCY_LEVELS, "rounds_per_level": ROUNDS_PER_LEVEL,
+                     "knee_efficiency": KNEE_EFFICIENCY, "latency_limit": LATENCY_LIMIT},
+        "capacity": capacity,
+        "levels": levels,
+    }
+    with open(REPORT_FILE, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[INFO] Bericht gespeichert in: {REPORT_FILE}")
+    return report
+
+
+if __name__ == "__main__":
+    run_sweep()
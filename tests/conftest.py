@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ollama_stub_server
+from HTW_Ollama_API import OllamaApi
+
+# Stub so schnell, dass ein Test nur Sekundenbruchteile braucht
+FAST_STUB = {
+    "PREFILL_TPS": 200000.0,
+    "DECODE_TPS": 5000.0,
+    "OUTPUT_TOKENS": 16,
+    "LOAD_DELAY": 0.2,
+    "NUM_PARALLEL": 4,
+    "TIME_SCALE": 0.05,
+    "ERROR_RATE": 0.0,
+}
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """Startet ollama_stub_server im Hintergrund und richtet OllamaApi darauf aus. Gibt die Basis-URL zurück."""
+    for name, value in FAST_STUB.items():
+        monkeypatch.setattr(ollama_stub_server, name, value)
+    server, url = ollama_stub_server.start_in_background()
+
+    host, port = url.rsplit(":", 1)
+    for name, value in (("HOST", host), ("PORT", int(port)), ("ENDPOINTS", None), ("CACHE_ENABLED", False),
+                        ("KEEP_ALIVE", OllamaApi.KEEP_ALIVE), ("USE_SESSION", True), ("POOL_SIZE", OllamaApi.POOL_SIZE),
+                        ("_endpoint_state", {})):
+        monkeypatch.setattr(OllamaApi, name, value)
+    OllamaApi.close()
+    yield url
+    OllamaApi.close()
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+import analyze_results
+from analyze_results import build_jobs, holm, run_resampling, summarize
+
+
+@pytest.fixture(autouse=True)
+def small_resampling(monkeypatch):
+    monkeypatch.setattr(analyze_results, "METRICS", {"time_total": "median"})
+    monkeypatch.setattr(analyze_results, "N_RESAMPLES", 500)
+    monkeypatch.setattr(analyze_results, "CHUNK_SIZE", 200)
+
+
+def sample_values():
+    fast = {(str(i), "fast"): 1.0 + i * 0.01 for i in range(30)}
+    slow = {(str(i), "slow"): 3.0 + i * 0.01 + (i * 7 % 5) * 0.1 for i in range(1, 31)}
+    categories = {str(i): "Regeln" if i % 2 else "Wissen" for i in range(31)}
+    return {"time_total": {**fast, **slow}}, categories
+
+
+def test_pairs_use_shared_ids_and_median():
+    groups, pairs = build_jobs(*sample_values())
+    assert [(g["model"], g["category"]) for g in groups] == [
+        ("fast", None), ("fast", "Regeln"), ("fast", "Wissen"), ("slow", None), ("slow", "Regeln"), ("slow", "Wissen")]
+    (pair,) = pairs
+    assert pair["statistic"] == "median" and len(pair["values"]) == 29
+    np.testing.assert_allclose(np.sort(pair["values"]), sorted(-2.0 - (i * 7 % 5) * 0.1 for i in range(1, 30)))
+
+
+def test_holm_adjusts_in_rank_order():
+    assert holm([0.01, 0.04, 0.03]) == pytest.approx([0.03, 0.06, 0.06])
+    assert holm([0.5, 0.9]) == pytest.approx([1.0, 1.0])
+
+
+def test_resampling_is_reproducible_and_significant(monkeypatch):
+    groups, pairs = build_jobs(*sample_values())
+    monkeypatch.setattr(analyze_results, "MAX_WORKERS", 1)
+    single = run_resampling(groups, pairs)
+    monkeypatch.setattr(analyze_results, "MAX_WORKERS", 3)
+    multi = run_resampling(groups, pairs)
+    # Das Ergebnis hängt nur von SEED ab, nicht von der Zahl der Prozesse
+    np.testing.assert_array_equal(single[0][0], multi[0][0])
+
+    summary, (comparison,) = summarize(groups, pairs, single[0], single[1])
+    assert comparison["diff"] == pytest.approx(-2.2)
+    assert comparison["significant"] and comparison["p_holm"] < 0.01
+    assert summary[0]["ci_low"] <= summary[0]["estimate"] <= summary[0]["ci_high"]
@@ -0,0 +1,23 @@
+from context_planner import OUTPUT_RESERVE, is_at_risk, is_truncated, plan_report
+
+
+def plan(num_ctx):
+    return {"num_ctx": num_ctx, "prompt_tokens": 0, "measured": True, "needed": 0, "at_risk": False}
+
+
+def test_truncated_only_at_window_limit():
+    # Über der Planungsgrenze, aber weit unter num_ctx: gefährdet, nicht abgeschnitten
+    count = 4096 - OUTPUT_RESERVE + 100
+    assert is_at_risk(plan(4096), count)
+    assert not is_truncated(plan(4096), count)
+    assert is_truncated(plan(4096), 4090) and is_at_risk(plan(4096), 4090)
+    assert not is_at_risk(plan(4096), 1000)
+
+
+def test_report_prefill_estimate():
+    questions = [{"id": 1, "prompt_tokens": {"llama3.1:8b": 1000}}, {"id": 2, "prompt_tokens": {"llama3.1:8b": 3000}}]
+    m = plan_report(questions, ["llama3.1:8b"], 2048)["models"]["llama3.1:8b"]
+    assert m["truncated_fixed"] == ["2"] and m["truncated_tokens_fixed"] == 952
+    # Geplant wird der volle Prompt verarbeitet, fest nur 2048 Tokens davon
+    assert m["prefill_s_planned"] > m["prefill_s_fixed"] > 0
+    assert m["num_ctx_reloads"] == 1
@@ -0,0 +1,41 @@
+import pytest
+
+import evaluation_store
+from evaluation_store import EvaluationStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    results = tmp_path / "results.csv"
+    results.write_text("id;model;category;model_answer\n1;gpt;Regeln;A\n2;gpt;Regeln;B\n", encoding="utf-8")
+    with EvaluationStore(str(tmp_path / "evaluation.db")) as store:
+        assert store.import_results(str(results)) == 2
+        yield store
+
+
+def test_claim_next_assigns_each_row_once(store):
+    first = store.claim_next("anna")
+    second = store.claim_next("ben")
+    assert {first["id"], second["id"]} == {"1", "2"}
+    assert store.claim_next("carl") is None
+    # Nach einem Absturz bekommt derselbe Bewerter seine offene Zeile zurück
+    assert store.claim_next("anna")["id"] == first["id"]
+
+    store.save_rating(first["id"], "gpt", 1, "anna")
+    assert store.remaining() == 1
+    assert store.claim_next("anna") is None
+
+
+def test_expired_claim_is_released(store, monkeypatch):
+    store.claim_next("anna")
+    store.claim_next("ben")
+    monkeypatch.setattr(evaluation_store, "CLAIM_TIMEOUT", -1)
+    assert store.claim_next("carl") is not None
+
+
+def test_export_writes_lf_line_endings(store, tmp_path):
+    store.save_rating("1", "gpt", 0.5, "anna")
+    target = tmp_path / "evaluation_completed.csv"
+    assert store.export_csv(str(target)) == 1
+    data = target.read_bytes()
+    assert b"\r\n" not in data and data.count(b"\n") == 2
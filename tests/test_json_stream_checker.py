@@ -0,0 +1,54 @@
+import pytest
+
+from HTW_Ollama_API import OllamaApi, JsonStreamChecker
+
+VALID = [
+    '{"score": 2, "reason": "ok"}',
+    '  {"nested": {"list": [1, 2.5, -3e2, true, false, null]}}',
+    '<think>erst nachdenken</think>\n{"score": 1}',
+    '```json\n{"score": 1}\n```',
+    'Hier ist die Bewertung:\n```json\n{"score": 0, "reason": "falsch"}\n```',
+    'Sure! {"score": 1} is not what I mean, see below.\n```json\n{"score": 2}\n```',
+]
+
+INVALID = [
+    '{"score": 1} danach noch Text',
+    '{"score": 1]',
+    '{"reason": "Zeile\nUmbruch"}',
+    '{"score": 1, "reason": ok}',
+]
+
+
+def stream(text, size=3):
+    checker = JsonStreamChecker()
+    return all(checker.feed(text[i:i + size]) for i in range(0, len(text), size)), checker
+
+
+@pytest.mark.parametrize("text", VALID)
+def test_checker_accepts_what_extract_json_parses(text):
+    # Darf nie früher abbrechen als extract_json: sonst gehen gültige Antworten verloren
+    assert OllamaApi.extract_json({"result": text})["result"] is not None
+    ok, checker = stream(text)
+    assert ok, checker.error
+
+
+@pytest.mark.parametrize("text", INVALID)
+def test_checker_rejects_what_extract_json_rejects(text):
+    assert OllamaApi.extract_json({"result": text})["result"] is None
+    ok, checker = stream(text)
+    assert not ok
+    assert checker.error
+
+
+def test_prose_before_fence_is_left_to_extract_json():
+    checker = JsonStreamChecker()
+    assert checker.feed("Here is the answer: ")
+    assert not checker.active
+    assert checker.feed("```json\n{]\n```")
+
+
+def test_streamed_schema_answer_passes_checker(stub):
+    schema = {"type": "object", "properties": {"score": {"type": "integer", "enum": [0, 1, 2]}}}
+    response = OllamaApi.chat([{"role": "user", "content": "Bewerte"}], model="llama3.1:8b", schema=schema,
+                              stream=True, cache=False)
+    assert response["result"] == {"score": 0}
@@ -0,0 +1,48 @@
+import csv
+
+import pytest
+
+import merge_csv
+
+HEADER = "id;model;model_answer;time_total\n"
+
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(merge_csv, "FILES_TO_MERGE", ["a.csv", "b.csv"])
+    (tmp_path / "a.csv").write_text(HEADER + "2;gpt;Antwort;1.5\n1;gpt;Antwort;1.0\n", encoding="utf-8")
+    (tmp_path / "b.csv").write_text(HEADER + "1;gemini;ERROR: 503 UNAVAILABLE;0\n", encoding="utf-8")
+    return tmp_path
+
+
+def read_merged():
+    with open(merge_csv.OUTPUT_FILE, "r", newline="", encoding="utf-8") as f:
+        return [(r["id"], r["model"], r["time_total"]) for r in csv.DictReader(f, delimiter=";")]
+
+
+def test_incremental_merge_appends_only_new_rows(sources):
+    merge_csv.merge_simple()
+    assert read_merged() == [("1", "gpt", "1.0"), ("2", "gpt", "1.5")]
+
+    # Nachgeholte Frage und ein Duplikat mit anderem Inhalt
+    with open("b.csv", "a", encoding="utf-8", newline="") as f:
+        f.write("1;gemini;Antwort;2.0\n")
+    with open("a.csv", "a", encoding="utf-8", newline="") as f:
+        f.write("1;gpt;Andere Antwort;9.9\n")
+    merge_csv.merge_simple()
+    assert read_merged() == [("1", "gpt", "1.0"), ("2", "gpt", "1.5"), ("1", "gemini", "2.0")]
+
+    with open(merge_csv.CONFLICTS_FILE, "r", encoding="utf-8") as f:
+        conflicts = list(csv.DictReader(f, delimiter=";"))
+    assert [(c["id"], c["model"], c["reason"]) for c in conflicts] == [("1", "gpt", "abweichend")]
+
+    with open(merge_csv.OUTPUT_FILE, "rb") as f:
+        assert b"\r\n" not in f.read()
+
+
+def test_rewritten_source_triggers_full_rebuild(sources):
+    merge_csv.merge_simple()
+    (sources / "a.csv").write_text(HEADER + "3;gpt;Antwort;3.0\n", encoding="utf-8")
+    merge_csv.merge_simple()
+    assert read_merged() == [("3", "gpt", "3.0")]
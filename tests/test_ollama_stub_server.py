@@ -0,0 +1,75 @@
+import csv
+
+import benchmark_runner
+import load_test
+import ollama_stub_server
+from HTW_Ollama_API import OllamaApi
+
+
+def test_chat_reports_server_timings(stub):
+    response = OllamaApi.chat([{"role": "user", "content": "Wann ist der Ball tot?"}], model="llama3.1:8b",
+                              stream=False, cache=False)
+    assert response["result"].startswith("The rule")
+    assert response["token"] == ollama_stub_server.OUTPUT_TOKENS
+    assert response["input_token"] > 0
+    assert response["time"] >= response["time_write"] > 0
+
+
+def test_stream_adds_latency_metrics(stub):
+    response = OllamaApi.chat([{"role": "user", "content": "Hi"}], model="llama3.1:8b", stream=True, cache=False)
+    assert response["token"] == ollama_stub_server.OUTPUT_TOKENS
+    for name in ("time_first_token", "itl_p50", "itl_p95", "itl_p99", "jitter"):
+        assert name in response
+
+
+def test_schema_answer_is_parsed(stub):
+    schema = {"type": "object", "properties": {"score": {"type": "integer"}, "reason": {"type": "string"}}}
+    for stream in (False, True):
+        response = OllamaApi.chat([{"role": "user", "content": "Bewerte"}], model="llama3.1:8b", schema=schema,
+                                  stream=stream, cache=False)
+        assert response["result"] == {"score": 1, "reason": "stub"}
+
+
+def test_load_and_unload_model(stub):
+    loaded = OllamaApi.load_model("llama3.3:70b", options={"num_ctx": 4096})
+    assert loaded["done_reason"] == "load"
+    assert loaded["time_load"] > 0
+    assert "llama3.3:70b" in {m["name"] for m in OllamaApi.running_models()}
+
+    # Bereits geladen: keine Ladezeit mehr
+    assert OllamaApi.load_model("llama3.3:70b")["time_load"] == 0
+
+    assert OllamaApi.unload_model("llama3.3:70b")["done_reason"] == "unload"
+    assert "llama3.3:70b" not in {m["name"] for m in OllamaApi.running_models()}
+
+
+def test_unknown_model_fails(stub):
+    response = OllamaApi.chat([{"role": "user", "content": "Hi"}], model="gibt-es-nicht", cache=False)
+    assert response["result"] is None
+
+
+def test_load_test_scenario(stub, monkeypatch):
+    monkeypatch.setattr(load_test, "REQUESTS", 12)
+    scenario = load_test.run_scenario(concurrency=4, stream=True, pooled=True)
+    assert scenario["errors"] == 0
+    assert scenario["requests_per_s"] > 0
+    assert set(scenario["phases_ms"]) == set(OllamaApi.CLIENT_TIMINGS)
+
+
+def test_load_test_runner(stub, monkeypatch, tmp_path):
+    # run_runner stellt benchmark_runner dauerhaft um, monkeypatch setzt die Werte danach zurück
+    for name in ("INPUT_FILE", "OUTPUT_FILE", "RUN_SUMMARY_FILE", "MODELS_TO_TEST", "PAUSE_BETWEEN_REQUESTS",
+                 "USE_RESPONSE_CACHE", "EXECUTION_MODE"):
+        monkeypatch.setattr(benchmark_runner, name, getattr(benchmark_runner, name))
+    monkeypatch.setattr(load_test, "RUNNER_QUESTIONS", 3)
+
+    reports = load_test.run_runner(str(tmp_path))
+    assert [r["execution_mode"] for r in reports] == ["sequential", "parallel"]
+    for report in reports:
+        assert [m["model"] for m in report["models"]] == benchmark_runner.MODELS_TO_TEST
+
+    # Die Ergebnisdatei des letzten (parallelen) Durchlaufs hat eine Zeile pro Frage und Modell
+    with open(benchmark_runner.OUTPUT_FILE, "r", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f, delimiter=";"))
+    assert len(rows) == 3 * len(benchmark_runner.MODELS_TO_TEST)
+    assert all(int(row["output_tokens"]) == ollama_stub_server.OUTPUT_TOKENS for row in rows)
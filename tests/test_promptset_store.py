@@ -0,0 +1,37 @@
+import json
+
+import promptset_store
+from promptset_store import CompiledPromptset, content_hash, template_hash
+
+HEADER = "id;model;question;model_answer;input_tokens;context_hash;template_hash\n"
+
+
+def result_line(question_id, model, tokens, question="Frage?", context="Regeltext"):
+    return f"{question_id};{model};{question};Antwort;{tokens};{content_hash(context)};{template_hash()}\n"
+
+
+def test_new_result_rows_do_not_recompile(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("promptset.json", "w", encoding="utf-8") as f:
+        json.dump([{"id": 1, "question": "Frage?", "context_text": "Regeltext"}], f)
+    with open("benchmark_results_a.csv", "w", encoding="utf-8", newline="") as f:
+        f.write(HEADER + result_line(1, "llama3.1:8b", 900))
+
+    store = CompiledPromptset("promptset.json")
+    assert store.prompt_tokens(1, "llama3.1:8b") == (900, True)
+
+    compiles = []
+    monkeypatch.setattr(promptset_store, "compile_promptset", lambda *args: compiles.append(args))
+    # Angehängte Zeilen werden gelesen, ohne neu zu übersetzen; fremde Kontexte zählen nicht
+    with open("benchmark_results_a.csv", "a", encoding="utf-8", newline="") as f:
+        f.write(result_line(1, "llama3.3:70b", 950) + result_line(1, "llama3.3:70b", 5000, context="anders"))
+    store = CompiledPromptset("promptset.json")
+    assert compiles == []
+    assert store.prompt_tokens(1, "llama3.3:70b") == (950, True)
+
+    # Neu geschriebene Datei (andere Bytes vor der gelesenen Position) wird ganz gelesen
+    with open("benchmark_results_a.csv", "w", encoding="utf-8", newline="") as f:
+        f.write(HEADER + result_line(1, "mistral", 800) + result_line(1, "llama3.3:70b", 960) + "x" * 200 + "\n")
+    store = CompiledPromptset("promptset.json")
+    assert store.prompt_tokens(1, "mistral") == (800, True)
+    assert store.prompt_tokens(1, "llama3.3:70b") == (960, True)
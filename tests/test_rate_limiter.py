@@ -0,0 +1,81 @@
+import time
+
+import pytest
+import requests
+
+import ollama_stub_server
+import rate_limiter
+from rate_limiter import RateLimiter, QuotaStub, ThrottleError, call_with_backoff
+
+
+@pytest.fixture(autouse=True)
+def short_backoff(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "BASE_DELAY", 0.001)
+
+
+def post_chat(url):
+    response = requests.post(f"{url}/api/chat", json={"model": "llama3.1:8b", "stream": False,
+                                                      "messages": [{"role": "user", "content": "Hi"}]}, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+def test_acquire_waits_when_bucket_is_empty():
+    limiter = RateLimiter(rpm=600, burst_seconds=0.1)    # Bucket fasst eine Anfrage, eine pro 0,1 s
+    assert limiter.acquire() == 0.0
+    start = time.monotonic()
+    waited = limiter.acquire()
+    assert waited > 0.05
+    assert time.monotonic() - start > 0.05
+
+
+def test_throttle_halves_rate_and_success_raises_it():
+    limiter = RateLimiter(rpm=100)
+    limiter.on_throttle()
+    assert limiter.rpm == 100 * rate_limiter.DECREASE_FACTOR
+    limiter.on_success()
+    assert limiter.rpm == 50 + 100 * rate_limiter.INCREASE_SHARE
+    assert limiter.stats()["throttles"] == 1
+
+
+def test_backoff_retries_quota_errors():
+    quota = QuotaStub(limit=2, window=0.2)
+    limiter = RateLimiter(rpm=6000)
+    results = [call_with_backoff(quota, limiter) for _ in range(4)]
+    assert results == ["ok"] * 4
+    assert quota.rejected > 0
+    assert limiter.throttles == quota.rejected
+
+
+def test_other_errors_are_not_retried():
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise ValueError("kaputt")
+
+    with pytest.raises(ValueError):
+        call_with_backoff(broken, RateLimiter(rpm=6000))
+    assert len(calls) == 1
+
+
+def test_backoff_against_stub_server(stub, monkeypatch):
+    monkeypatch.setattr(ollama_stub_server, "ERROR_RATE", 1.0)
+    monkeypatch.setattr(ollama_stub_server, "ERROR_STATUSES", [429])
+    monkeypatch.setattr(ollama_stub_server, "RETRY_AFTER", 0)
+
+    limiter = RateLimiter(rpm=6000)
+    with pytest.raises(requests.HTTPError) as error:
+        call_with_backoff(lambda: post_chat(stub), limiter, max_retries=2)
+    assert rate_limiter.status_code(error.value) == 429
+    assert limiter.throttles == 2
+
+    monkeypatch.setattr(ollama_stub_server, "ERROR_RATE", 0.0)
+    answer = call_with_backoff(lambda: post_chat(stub), limiter)
+    assert answer["eval_count"] == ollama_stub_server.OUTPUT_TOKENS
+
+
+def test_throttle_detection():
+    assert rate_limiter.is_throttle_error(ThrottleError(503))
+    assert rate_limiter.is_throttle_error(RuntimeError("RESOURCE_EXHAUSTED: quota"))
+    assert not rate_limiter.is_throttle_error(ThrottleError(400))
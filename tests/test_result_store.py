@@ -0,0 +1,39 @@
+import csv
+
+import analyze_results
+import result_store
+
+FIELDS = ["id", "category", "model", "time_total", "time_read", "time_write", "input_tokens", "output_tokens",
+          "tps_read", "tps_write", "question", "model_answer", "ground_truth", "context_snippet"]
+
+
+def write_results(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS, delimiter=";", restval="")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def row(question_id, answer, time_total, tps_write):
+    return {"id": question_id, "category": "Regeln", "model": "gemini", "time_total": time_total, "time_read": "0.1",
+            "time_write": "1.0", "input_tokens": 100, "output_tokens": 20, "tps_read": "1000", "tps_write": tps_write,
+            "question": f"Frage {question_id}", "model_answer": answer, "ground_truth": "A", "context_snippet": "EMPTY"}
+
+
+def test_error_row_never_replaces_valid_timing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_results("benchmark_results_a.csv", [row("1", "Antwort", "10.908", "20.00"), row("2", "Antwort", "5.000", "8.00")])
+    # Späterer Lauf: Frage 1 nur als Fehlerzeile, Frage 2 neu gemessen
+    write_results("benchmark_results_b.csv", [row("1", "ERROR: 503 UNAVAILABLE", "0.000", "0.00"),
+                                              row("2", "Antwort", "6.000", "9.00")])
+    assert result_store.import_csv("benchmark_results_a.csv")[1] == 2
+    assert result_store.import_csv("benchmark_results_b.csv")[1] == 1
+
+    values = {metric: {("1", "gemini"): 1.0} for metric in analyze_results.METRICS}
+    assert analyze_results.load_store_values(values) == ["time_total", "tps_write"]
+    assert values["time_total"][("1", "gemini")] == 10.908
+    assert values["tps_write"][("1", "gemini")] == 20.0
+    # Neuester gültiger Lauf gewinnt
+    assert values["time_total"][("2", "gemini")] == 6.0
+    # score kommt nicht aus dem Speicher
+    assert values["score"] == {("1", "gemini"): 1.0}
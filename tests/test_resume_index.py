@@ -0,0 +1,24 @@
+from resume_index import load_completed_pairs, pending_questions, repair_partial_write
+
+HEADER = "id;model;model_answer\n"
+
+
+def test_error_rows_are_not_completed(tmp_path):
+    results = tmp_path / "results.csv"
+    results.write_text(HEADER + '1;llama3.1:8b;"Antwort\nüber zwei Zeilen"\n2;llama3.1:8b;ERROR: 503\n'
+                       "3;llama3.1:8b;\n1;llama3.3:70b;Antwort\n", encoding="utf-8")
+    completed = load_completed_pairs(str(results), str(tmp_path / "fehlt.csv"))
+    assert completed == {("1", "llama3.1:8b"), ("1", "llama3.3:70b")}
+
+    questions = [{"id": 1}, {"id": 2}, {"id": 3}]
+    assert [e["id"] for e in pending_questions(questions, "llama3.1:8b", completed)] == [2, 3]
+
+
+def test_repair_removes_partial_last_record(tmp_path):
+    results = tmp_path / "results.csv"
+    complete = HEADER + "1;llama3.1:8b;Antwort\n"
+    results.write_text(complete + '2;llama3.1:8b;"abgebrochen', encoding="utf-8")
+    assert repair_partial_write(str(results))
+    assert results.read_text(encoding="utf-8") == complete
+    assert not repair_partial_write(str(results))
+    assert load_completed_pairs(str(results)) == {("1", "llama3.1:8b")}
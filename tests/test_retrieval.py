@@ -0,0 +1,14 @@
+from retrieval import query_terms
+
+
+def test_glossary_matches_whole_words_only():
+    # "feld" darf nicht in "Spielfeld" greifen, "punkt" nicht in "Startpunkt"
+    assert query_terms("Wie breit ist das Spielfeld?").count("field") == 1
+    assert "point" not in query_terms("Wo ist der Startpunkt?")
+    assert "field" in query_terms("Liegt der Ball im Feld?")
+
+
+def test_glossary_prefix_and_phrase_keys():
+    assert {"goal", "post"} <= set(query_terms("Wie hoch ist der Torpfostens?"))
+    assert {"out", "bound"} <= set(query_terms("Geht der Ball ins Aus?"))
+    assert "out" not in query_terms("Woraus besteht der Ball?")
@@ -0,0 +1,49 @@
+import ollama_stub_server
+import saturation_sweep
+from HTW_Ollama_API import OllamaApi
+
+
+def level(concurrency, tokens_per_s, p95):
+    return {"concurrency": concurrency, "tokens_per_s": tokens_per_s, "latency": {"p95": p95}}
+
+
+def test_find_knee_stops_when_throughput_flattens():
+    levels = [level(1, 100, 1.0), level(2, 190, 1.1), level(4, 360, 1.3), level(8, 380, 2.5)]
+    assert saturation_sweep.find_knee(levels)["concurrency"] == 4
+    assert levels[-1]["efficiency"] < saturation_sweep.KNEE_EFFICIENCY
+
+
+def test_capacity_report_respects_latency_limit(monkeypatch):
+    monkeypatch.setattr(saturation_sweep, "LATENCY_LIMIT", 1.2)
+    levels = [level(1, 100, 1.0), level(2, 190, 1.1), level(4, 360, 1.3)]
+    capacity = saturation_sweep.capacity_report(levels)
+    assert capacity["knee_concurrency"] == 4
+    assert capacity["recommended_concurrency"] == 2
+
+
+def test_sweep_against_stub(monkeypatch, tmp_path):
+    # 40 ms pro Anfrage, lang genug gegenüber dem Rauschen des Clients
+    settings = {"PREFILL_TPS": 200000.0, "DECODE_TPS": 400.0, "OUTPUT_TOKENS": 16, "LOAD_DELAY": 0.0,
+                "NUM_PARALLEL": 2, "TIME_SCALE": 1.0}
+    # run_sweep überträgt STUB_SETTINGS auf den Stub, monkeypatch setzt die Werte danach zurück
+    for name, value in settings.items():
+        monkeypatch.setattr(ollama_stub_server, name, value)
+    monkeypatch.setattr(saturation_sweep, "USE_STUB", True)
+    monkeypatch.setattr(saturation_sweep, "STUB_SETTINGS", settings)
+    monkeypatch.setattr(saturation_sweep, "CONCURRENCY_LEVELS", [1, 2, 4])
+    monkeypatch.setattr(saturation_sweep, "ROUNDS_PER_LEVEL", 2)
+    monkeypatch.setattr(saturation_sweep, "MIN_REQUESTS", 4)
+    monkeypatch.setattr(saturation_sweep, "MODEL", "llama3.1:8b")
+    monkeypatch.setattr(saturation_sweep, "REPORT_FILE", str(tmp_path / "capacity_report.json"))
+    saved = (OllamaApi.HOST, OllamaApi.PORT, OllamaApi.POOL_SIZE)
+
+    report = saturation_sweep.run_sweep()
+
+    assert (OllamaApi.HOST, OllamaApi.PORT, OllamaApi.POOL_SIZE) == saved
+    assert [l["concurrency"] for l in report["levels"]] == [1, 2, 4]
+    assert all(l["errors"] == 0 for l in report["levels"])
+    # Der Stub bearbeitet nur NUM_PARALLEL Anfragen gleichzeitig: darüber wächst nur noch die Wartezeit
+    assert report["levels"][1]["tokens_per_s"] > report["levels"][0]["tokens_per_s"]
+    assert report["levels"][2]["queue"]["p50"] > report["levels"][1]["queue"]["p50"]
+    assert report["capacity"]["recommended_concurrency"] <= 2
+    assert (tmp_path / "capacity_report.json").exists()
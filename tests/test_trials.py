@@ -0,0 +1,41 @@
+import csv
+
+import pytest
+
+from trials import TrialWriter, expand_trials, summarize_trials
+
+
+class ListWriter:
+    def __init__(self):
+        self.rows = []
+
+    def writerow(self, row):
+        self.rows.append(row)
+
+
+def test_expand_trials_is_shuffled_and_reproducible():
+    ordered = [{"id": 1}, {"id": 2}, {"id": 3}]
+    expanded = expand_trials(ordered, 4, seed=7)
+    assert sorted(e["id"] for e in expanded) == [1] * 4 + [2] * 4 + [3] * 4
+    assert expanded == expand_trials(ordered, 4, seed=7)
+    assert [e["id"] for e in expanded] != [1] * 4 + [2] * 4 + [3] * 4
+
+
+def test_trial_writer_keeps_first_answer_and_marks_cold(tmp_path):
+    results = ListWriter()
+    samples_file = tmp_path / "samples.csv"
+    writer = TrialWriter(results, str(samples_file), "run-1", load_threshold=0.5)
+    for time_total, time_load in ((5.0, 2.0), (1.0, 0.0), (1.2, 0.9), (1.1, 0.0)):
+        writer.writerow({"id": 1, "model": "llama3.1:8b", "time_total": time_total, "time_load": time_load})
+    writer.close()
+
+    assert [r["time_total"] for r in results.rows] == [5.0]
+    assert [(s["trial"], s["cold"]) for s in writer.samples] == [(0, 1), (1, 0), (2, 1), (3, 0)]
+    with open(samples_file, newline="", encoding="utf-8") as f:
+        assert len(list(csv.DictReader(f, delimiter=";"))) == 4
+
+    (summary,) = summarize_trials(writer.samples)
+    assert summary["samples"] == 4 and summary["warm_samples"] == 2
+    assert summary["cold_time_total"] == 5.0
+    assert summary["time_total_median"] == pytest.approx(1.05)
+    assert summary["time_total_iqr"] == pytest.approx(0.05)
@@ -0,0 +1,123 @@
+import csv
+import os
+import random
+import statistics
+
+# --- KONFIGURATION ---
+# Kennzahlen, für die pro (Frage, Modell) Median, Streuung und Variationskoeffizient berechnet werden
+TRIAL_METRICS = ["time_total", "time_read", "time_write", "tps_write"]
+SAMPLE_FIELDNAMES = ["run_id", "id", "model", "trial", "cold", "time_load", "time_total", "time_read", "time_write",
+                     "input_tokens", "output_tokens", "tps_read", "tps_write"]
+SUMMARY_FIELDNAMES = ["id", "model", "samples", "warm_samples", "cold_time_total"] + \
+    [f"{metric}_{stat}" for metric in TRIAL_METRICS for stat in ("median", "iqr", "stdev", "cv")]
+
+
+def expand_trials(ordered, trials, seed):
+    """
+    Wiederholt jede Frage trials-mal und mischt alle Wiederholungen, damit Server-Zustand und Cache
+    nicht immer dieselbe Frage treffen. ordered ist eine Liste von Fragen, Ergebnis ebenfalls.
+    """
+    expanded = [entry for entry in ordered for _ in range(trials)]
+    random.Random(seed).shuffle(expanded)
+    return expanded
+
+
+class TrialWriter:
+    """
+    Ersetzt den CSV-Writer des Runners im Wiederholungsmodus: jede Messung landet in der Stichproben-Datei,
+    in die Ergebnisdatei nur die erste Antwort pro (id, model), damit diese wie bisher eine Zeile pro Paar hat.
+    Die erste Messung eines Paares (und jede mit Modell-Ladezeit) gilt als kalt, alle weiteren als warm.
+    """
+
+    def __init__(self, writer, samples_file, run_id, load_threshold):
+        self.writer = writer
+        self.run_id = run_id
+        self.load_threshold = load_threshold
+        self.samples = []
+        self.first_rows = []
+        self._counts = {}
+
+        file_exists = os.path.exists(samples_file) and os.path.getsize(samples_file) > 0
+        self._file = open(samples_file, "a", newline="", encoding="utf-8")
+        self._samples_writer = csv.DictWriter(self._file, fieldnames=SAMPLE_FIELDNAMES, delimiter=';',
+                                              restval="", extrasaction="ignore")
+        if not file_exists:
+            self._samples_writer.writeheader()
+
+    def writerow(self, row):
+        key = (str(row.get("id")), row.get("model"))
+        trial = self._counts.get(key, 0)
+        self._counts[key] = trial + 1
+
+        sample = dict(row, run_id=self.run_id, trial=trial,
+                      cold=int(trial == 0 or float(row.get("time_load") or 0) > self.load_threshold))
+        self._samples_writer.writerow(sample)
+        self._file.flush()
+        self.samples.append(sample)
+
+        if trial == 0:
+            self.writer.writerow(row)
+            self.first_rows.append(row)
+
+    def close(self):
+        self._file.close()
+
+
+def spread(values):
+    """Median, Interquartilsabstand, Standardabweichung und Variationskoeffizient (stdev / mean)."""
+    if not values:
+        return {"median": None, "iqr": None, "stdev": None, "cv": None}
+    if len(values) == 1:
+        return {"median": values[0], "iqr": 0.0, "stdev": 0.0, "cv": 0.0}
+    q1, _, q3 = statistics.quantiles(values, n=4, method="inclusive")
+    mean = statistics.fmean(values)
+    stdev = statistics.stdev(values)
+    return {"median": statistics.median(values), "iqr": q3 - q1, "stdev": stdev, "cv": stdev / mean if mean else None}
+
+
+def summarize_trials(samples):
+    """Kennzahlen pro (id, model) aus den warmen Messungen, dazu die kalte Gesamtzeit."""
+    pairs = {}
+    for sample in samples:
+        pairs.setdefault((str(sample["id"]), sample["model"]), []).append(sample)
+
+    summary = []
+    for (question_id, model), pair_samples in pairs.items():
+        warm = [s for s in pair_samples if not s["cold"]]
+        cold = [s for s in pair_samples if s["trial"] == 0]
+        row = {"id": question_id, "model": model, "samples": len(pair_samples), "warm_samples": len(warm),
+               "cold_time_total": float(cold[0]["time_total"]) if cold else None}
+        for metric in TRIAL_METRICS:
+            values = [float(s[metric]) for s in warm if s.get(metric) not in (None, "")]
+            for stat, value in spread(values).items():
+                row[f"{metric}_{stat}"] = value
+        summary.append(row)
+    return summary
+
+
+def model_overview(summary):
+    """Pro Modell: Median der kalten und warmen Gesamtzeit sowie typischer Variationskoeffizient."""
+    overview = {}
+    for model in sorted({row["model"] for row in summary}):
+        rows = [row for row in summary if row["model"] == model]
+
+        def median_of(field):
+            values = [row[field] for row in rows if row[field] is not None]
+            return round(statistics.median(values), 4) if values else None
+
+        overview[model] = {
+            "pairs": len(rows),
+            "cold_time_total": median_of("cold_time_total"),
+            "warm_time_total": median_of("time_total_median"),
+            "time_total_cv": median_of("time_total_cv"),
+            "tps_write_cv": median_of("tps_write_cv"),
+        }
+    return overview
+
+
+def write_summary(filename, summary):
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDNAMES, delimiter=';', restval="")
+        writer.writeheader()
+        for row in summary:
+            writer.writerow({key: f"{value:.4f}" if isinstance(value, float) else value for key, value in row.items()})